@@ -0,0 +1,167 @@
+"""
+Alert store — bounded, deduplicating, indexed in-memory alert log.
+
+Every alert source (network sampler, Zeek ingest) adds through one store:
+
+  • Suppression: an alert whose (type, remote endpoint) key was seen less
+    than `window` seconds ago does not create a new entry. The existing
+    entry's `count` and `last_seen` are bumped instead, so one long SSH
+    session is one entry with a growing count, not one entry per tick.
+  • Bounded: entries live in a deque of at most `maxlen`; the oldest entry
+    is evicted in O(1) when a new one arrives.
+  • Indexed: each value of `threat` (severity), `type` and `source` has
+    its own deque of entries in arrival order. A filtered query walks only
+    the smallest matching index, newest first. Since every index deque is
+    in arrival order, the globally oldest entry is also at the left of each
+    index it belongs to, so eviction is O(1) there too.
+"""
+from __future__ import annotations
+
+import datetime
+import os
+import threading
+import time
+from collections import deque
+from typing import Iterable, Optional
+
+INDEXED = ("threat", "type", "source")
+
+MAX_ALERTS      = int(os.getenv("ALERT_STORE_SIZE", "10000"))
+SUPPRESS_WINDOW = float(os.getenv("ALERT_SUPPRESS_SECONDS", "60"))
+
+
+def alert_key(alert: dict) -> tuple:
+    """Suppression key: alert type and remote endpoint (ip:port when known)."""
+    remote = alert.get("dst_ip") or alert.get("remote") or ""
+    port   = alert.get("dst_port")
+    if port is not None and ":" not in str(remote):
+        remote = f"{remote}:{port}"
+    return alert.get("type"), remote
+
+
+class AlertStore:
+    """Thread-safe alert log; see module docstring."""
+
+    def __init__(self, maxlen: int = MAX_ALERTS, window: float = SUPPRESS_WINDOW) -> None:
+        self.maxlen = maxlen
+        self.window = window
+        self._entries: deque[dict] = deque()
+        self._index   = {field: {} for field in INDEXED}   # field → value → deque[entry]
+        self._active: dict[tuple, dict] = {}                # key → newest entry
+        self._lock    = threading.Lock()
+        self._seq     = 0
+
+        self.added      = 0
+        self.suppressed = 0
+        self.evicted    = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # ── writes ───────────────────────────────────────────────
+    def add(self, alert: dict) -> Optional[dict]:
+        """Store one alert; returns the new entry, or None when suppressed."""
+        return (self.add_many((alert,)) or [None])[0]
+
+    def add_many(self, alerts: Iterable[dict]) -> list[dict]:
+        """Store alerts under one lock; returns the entries that were not
+        suppressed (copies, safe to hand to other threads)."""
+        fresh = []
+        now   = time.time()
+        with self._lock:
+            for alert in alerts:
+                ts  = alert.get("ts", now)
+                key = alert_key(alert)
+                hit = self._active.get(key)
+                if hit is not None and ts - hit["last_seen"] < self.window:
+                    hit["count"]    += 1
+                    hit["last_seen"] = max(hit["last_seen"], ts)
+                    self.suppressed += 1
+                    continue
+
+                self._seq += 1
+                entry = {**alert, "id": self._seq, "ts": ts, "first_seen": ts, "last_seen": ts, "count": 1}
+                if "time" not in entry:
+                    entry["time"] = datetime.datetime.fromtimestamp(ts).strftime("%H:%M:%S")
+                if len(self._entries) >= self.maxlen:
+                    self._evict()
+                self._entries.append(entry)
+                for field in INDEXED:
+                    self._index[field].setdefault(entry.get(field), deque()).append(entry)
+                self._active[key] = entry
+                self.added += 1
+                fresh.append(dict(entry))
+        return fresh
+
+    def _evict(self) -> None:
+        old = self._entries.popleft()
+        for field in INDEXED:
+            bucket = self._index[field][old.get(field)]
+            bucket.popleft()
+            if not bucket:
+                del self._index[field][old.get(field)]
+        key = alert_key(old)
+        if self._active.get(key) is old:
+            del self._active[key]
+        self.evicted += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._active.clear()
+            for field in INDEXED:
+                self._index[field].clear()
+
+    # ── reads ────────────────────────────────────────────────
+    def query(
+        self,
+        limit: int = 20,
+        threat: Optional[str] = None,
+        type: Optional[str] = None,
+        source: Optional[str] = None,
+        since: Optional[float] = None,
+    ) -> list[dict]:
+        """Newest-first entries matching every given filter (copies)."""
+        filters = {f: v for f, v in (("threat", threat), ("type", type), ("source", source)) if v is not None}
+        with self._lock:
+            if filters:
+                buckets = [self._index[f].get(v) for f, v in filters.items()]
+                if any(b is None for b in buckets):
+                    return []
+                scan = min(buckets, key=len)
+            else:
+                scan = self._entries
+            out = []
+            for entry in reversed(scan):
+                if since is not None and entry["last_seen"] < since:
+                    continue
+                if all(entry.get(f) == v for f, v in filters.items()):
+                    out.append(dict(entry))
+                    if len(out) >= limit:
+                        break
+            return out
+
+    def counts(self) -> dict:
+        """Entry and occurrence totals per indexed field value."""
+        with self._lock:
+            return {
+                field: {
+                    str(value): {"entries": len(bucket), "occurrences": sum(e["count"] for e in bucket)}
+                    for value, bucket in values.items()
+                }
+                for field, values in self._index.items()
+            }
+
+    def stats(self) -> dict:
+        return {
+            "entries":     len(self._entries),
+            "maxlen":      self.maxlen,
+            "window":      self.window,
+            "added":       self.added,
+            "suppressed":  self.suppressed,
+            "evicted":     self.evicted,
+            "active_keys": len(self._active),
+        }
+
+
+store = AlertStore()
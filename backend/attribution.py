@@ -0,0 +1,399 @@
+"""
+Per-row feature attributions (SHAP values) for the served models.
+
+Tree ensembles (RandomForest / GradientBoosting) get exact path-dependent
+TreeSHAP. Each leaf's root path is precomputed once per fitted model as a
+table of unique split features with their interval (lo, hi] and cover
+fraction z. For a row x, let o_j = [lo_j < x_j <= hi_j]. The leaf then adds
+
+    φ_i += v · (o_i − z_i) · Σ_s w(s, d) · [t^s] Π_{j≠i} (z_j + o_j·t)
+
+to every path feature i, where w(s, d) = s!(d−s−1)!/d!. The product
+polynomial is built once per leaf and unwound per feature, all vectorized
+over (rows, leaves); leaves are grouped by path length so each group runs
+at its own depth, and the unwinding coefficients are precomputed per leaf.
+A sparse (feature, leaf slot) matrix scatters the terms into φ.
+
+LogisticRegression uses the closed form φ = coef · x on standardized inputs
+(training mean 0).
+
+Random forests are explained in probability space, the other models in
+margin space (softmax logits), so base_value + Σφ equals the model output.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from math import factorial
+from typing import AsyncIterator, Iterator
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+
+import inference
+import tree_compiler
+
+_BLOCK_ROWS  = 64         # rows per block at most
+_BLOCK_CELLS = 1 << 18    # leaves × rows per block: keeps work arrays cache-sized
+
+# Rows per batch-explain job; smaller chunks spread a file across more workers.
+EXPLAIN_CHUNK_ROWS = int(os.getenv("EXPLAIN_CHUNK_ROWS", "2000"))
+
+
+@dataclass
+class _PathGroup:
+    """Leaves [start, stop) whose root paths have exactly `depth` unique
+    features, as slot-major (depth, n_leaves) tables."""
+    start:   int
+    stop:    int
+    depth:   int
+    feature: np.ndarray
+    lo:      np.ndarray
+    hi:      np.ndarray
+    zero:    np.ndarray
+    weights: np.ndarray   # (depth, 1): w(s, depth), s < depth
+    unwind:  np.ndarray   # (depth, depth, n_leaves): U[m − 1, i], see _unwind()
+
+
+class TreeExplainer:
+    output = "probability"
+
+    def __init__(self, clf, trees: list, values: list[np.ndarray], n_features: int) -> None:
+        self.clf = clf
+        paths: list[dict[int, tuple[float, float, float]]] = []
+        leaf_values: list[np.ndarray] = []
+        for tree, value in zip(trees, values):
+            for path, leaf in _leaf_paths(tree):
+                paths.append(path)
+                leaf_values.append(value[leaf])
+
+        # Leaves sorted by path length, so each length is one contiguous group
+        # evaluated at its own depth (the polynomial work grows with depth²).
+        order = sorted(range(len(paths)), key=lambda l: len(paths[l]))
+        paths = [paths[l] for l in order]
+        depth = max(1, len(paths[-1]))
+        n     = len(paths)
+        self.feature = np.zeros((n, depth), dtype=np.intp)
+        self.lo      = np.full((n, depth), -np.inf)
+        self.hi      = np.full((n, depth), np.inf)
+        self.zero    = np.ones((n, depth))           # pads: z=1, o=0 → neutral factor
+        self.valid   = np.zeros((n, depth), dtype=bool)
+        for l, path in enumerate(paths):
+            for j, (f, (lo, hi, z)) in enumerate(sorted(path.items())):
+                self.feature[l, j] = f
+                self.lo[l, j], self.hi[l, j], self.zero[l, j] = lo, hi, z
+                self.valid[l, j] = True
+        self.value = np.asarray(leaf_values)[order]   # (n_leaves, n_outputs)
+        self.depth = depth
+
+        lengths = self.valid.sum(axis=1)
+        self._groups = []
+        for d in np.unique(lengths[lengths > 0]).tolist():
+            start, stop = np.searchsorted(lengths, [d, d + 1])
+            zero    = self.zero[start:stop, :d].T.copy()
+            weights = np.array([[factorial(s) * factorial(d - s - 1) / factorial(d)] for s in range(d)])
+            self._groups.append(_PathGroup(
+                start, stop, d,
+                feature = self.feature[start:stop, :d].T.copy(),
+                lo      = self.lo[start:stop, :d].T.copy(),
+                hi      = self.hi[start:stop, :d].T.copy(),
+                zero    = zero,
+                weights = weights,
+                unwind  = _unwind(zero, weights),
+            ))
+
+        # Sparse (feature·output, slot·leaf) projection holding each leaf's
+        # value in its path features' rows; only real path slots are stored.
+        n_outputs = self.value.shape[1]
+        slot, leaf = np.nonzero(self.valid.T)
+        self._project = sparse.csr_matrix(
+            (
+                self.value[leaf].ravel(),
+                ((self.feature[leaf, slot, None] * n_outputs + np.arange(n_outputs)).ravel(),
+                 np.repeat(slot * n + leaf, n_outputs)),
+            ),
+            shape=(n_features * n_outputs, depth * n),
+        )
+        self.n_features  = n_features
+        self._block_rows = max(1, min(_BLOCK_ROWS, _BLOCK_CELLS // n))
+
+        # Expected output: every feature absent, i.e. each leaf at its cover fraction.
+        self.base = (self.value * self.zero.prod(axis=1)[:, None]).sum(axis=0)
+
+    def explain(self, X: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """SHAP values (n_rows, n_features, n_outputs) and the base value."""
+        # Trees split float32 inputs against float64 thresholds.
+        X   = np.asarray(X, dtype=np.float32).astype(np.float64)
+        phi = np.empty((X.shape[0], self.n_features, self.value.shape[1]))
+        for start in range(0, X.shape[0], self._block_rows):
+            block = X[start:start + self._block_rows]
+            phi[start:start + len(block)] = self._explain_block(block)
+        return phi, self.base
+
+    def _explain_block(self, X: np.ndarray) -> np.ndarray:
+        R = X.shape[0]
+        # (rows, slot, leaf); pad slots are never read by the projection.
+        contrib = np.empty((R, self.depth, len(self.value)))
+        for g in self._groups:
+            _group_contrib(g, X, contrib[:, :g.depth, g.start:g.stop])
+        phi = self._project @ contrib.reshape(R, -1).T                 # (F·K, R)
+        return phi.reshape(self.n_features, -1, R).transpose(2, 0, 1)
+
+
+def _unwind(zero: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Unwinding factor i with o_i = 1 from P(t) = Σ_m P_m t^m is synthetic
+    division by (z_i + t), and the weighted quotient Σ_s w_s Q_s is linear in
+    the P_m: Σ_m U[m − 1, i] P_m with U[m − 1, i] = Σ_{s<m} w_s (−z_i)^(m−1−s).
+    U depends only on the leaf, so it is computed once per model."""
+    d = len(zero)
+    U = np.zeros((d, d, zero.shape[1]))
+    U[0] = weights[0]
+    for m in range(1, d):
+        U[m] = U[m - 1] * -zero + weights[m]
+    return U
+
+
+def _group_contrib(g: _PathGroup, X: np.ndarray, out: np.ndarray) -> None:
+    """Write φ terms (rows, slot, leaf) of one path group into `out`. Work
+    arrays are (rows, leaves), so vectorized loops run along leaves, and the
+    arithmetic is in place to avoid a fresh allocation per step."""
+    D = g.depth
+    o = np.empty((D, len(X), g.stop - g.start))
+    for j in range(D):
+        xj = X[:, g.feature[j]]
+        np.logical_and(xj > g.lo[j], xj <= g.hi[j], out=o[j], casting="unsafe")
+
+    # P(t) = Π_j (z_j + o_j t), one array per coefficient.
+    tmp  = np.empty_like(o[0])
+    poly = np.zeros((D + 1,) + tmp.shape)
+    poly[0] = 1.0
+    for j in range(D):
+        for s in range(j + 1, 0, -1):
+            poly[s] *= g.zero[j]
+            np.multiply(o[j], poly[s - 1], out=tmp)
+            poly[s] += tmp
+        poly[0] *= g.zero[j]
+
+    # o_i = 0: dividing out the factor leaves (Σ_s w_s P_s) / z_i.
+    weighted = np.zeros_like(tmp)
+    for s in range(D):
+        np.multiply(poly[s], g.weights[s], out=tmp)
+        weighted += tmp
+
+    hit = np.empty_like(tmp)
+    for i in range(D):
+        np.multiply(poly[1], g.unwind[0, i], out=hit)
+        for m in range(2, D + 1):
+            np.multiply(poly[m], g.unwind[m - 1, i], out=tmp)
+            hit += tmp
+        c = out[:, i]
+        np.divide(weighted, g.zero[i], out=c)
+        np.copyto(c, hit, where=o[i] > 0)
+        c *= o[i] - g.zero[i]
+
+
+class GradientBoostingExplainer(TreeExplainer):
+    output = "margin"
+
+    def __init__(self, clf: GradientBoostingClassifier) -> None:
+        n_stages, n_outputs = clf.estimators_.shape
+        trees, values = [], []
+        for k in range(n_outputs):
+            for est in clf.estimators_[:, k]:
+                v = np.zeros((est.tree_.node_count, n_outputs))
+                v[:, k] = clf.learning_rate * est.tree_.value[:, 0, 0]
+                trees.append(est.tree_)
+                values.append(v)
+        super().__init__(clf, trees, values, clf.n_features_in_)
+
+        # The init estimator's constant raw score: f(probe) minus the leaves it reaches.
+        probe  = np.zeros((1, clf.n_features_in_), dtype=np.float32)
+        xg     = probe.astype(np.float64)[:, self.feature][0]
+        reach  = ((xg > self.lo) & (xg <= self.hi) | ~self.valid).all(axis=1)
+        margin = np.asarray(clf.decision_function(probe)).reshape(-1)
+        self.base = self.base + margin - self.value[reach].sum(axis=0)
+
+
+class LinearExplainer:
+    output = "margin"
+
+    def __init__(self, clf: LogisticRegression) -> None:
+        self.clf       = clf
+        self.coef      = np.asarray(clf.coef_, dtype=np.float64)        # (K, F)
+        self.intercept = np.asarray(clf.intercept_, dtype=np.float64)
+
+    def explain(self, X: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        # Standardized features have training mean 0, so E[f] is the intercept.
+        X = np.asarray(X, dtype=np.float64)
+        return X[:, :, None] * self.coef.T[None], self.intercept
+
+
+def _leaf_paths(tree):
+    """Yield ({feature: (lo, hi, z)}, leaf_node) for every leaf of a sklearn Tree."""
+    left, right = tree.children_left, tree.children_right
+    cover       = tree.weighted_n_node_samples
+    stack: list[tuple[int, dict]] = [(0, {})]
+    while stack:
+        node, path = stack.pop()
+        if left[node] == -1:
+            yield path, node
+            continue
+        f, thr = int(tree.feature[node]), float(tree.threshold[node])
+        for child, is_left in ((left[node], True), (right[node], False)):
+            lo, hi, z = path.get(f, (-np.inf, np.inf, 1.0))
+            if is_left:
+                hi = min(hi, thr)
+            else:
+                lo = max(lo, thr)
+            frac = cover[child] / cover[node] if cover[node] else 0.0
+            stack.append((child, {**path, f: (lo, hi, z * frac)}))
+
+
+def explainable(clf) -> bool:
+    """True if build_explainer() supports `clf`."""
+    return isinstance(clf, (RandomForestClassifier, GradientBoostingClassifier, LogisticRegression))
+
+
+def build_explainer(clf):
+    """Explainer for a fitted classifier, or None when unsupported."""
+    if isinstance(clf, RandomForestClassifier):
+        trees, values = [], []
+        for e in clf.estimators_:
+            v   = e.tree_.value[:, 0, :]
+            tot = v.sum(axis=1, keepdims=True)
+            trees.append(e.tree_)
+            values.append(v / np.where(tot == 0, 1.0, tot) / len(clf.estimators_))
+        return TreeExplainer(clf, trees, values, clf.n_features_in_)
+    if isinstance(clf, GradientBoostingClassifier):
+        return GradientBoostingExplainer(clf)
+    if isinstance(clf, LogisticRegression):
+        return LinearExplainer(clf)
+    return None
+
+
+def explainer_for(state):
+    """Cached explainer for `state`, rebuilt whenever its classifier changes."""
+    cached = getattr(state, "explainer", None)
+    if cached is None or cached.clf is not state.clf:
+        cached = state.explainer = build_explainer(state.clf)
+    return cached
+
+
+def explain(state, X_scaled: np.ndarray) -> tuple[np.ndarray, np.ndarray, str]:
+    """Per-class SHAP values (n_rows, n_features, n_classes), base values and
+    output space. Single-output binary models are expanded to two classes."""
+    explainer = explainer_for(state)
+    if explainer is None:
+        raise ValueError(f"No explainer for {type(state.clf).__name__}")
+    phi, base = explainer.explain(X_scaled)
+    if phi.shape[2] == 1 and len(state.label_encoder.classes_) == 2:
+        phi, base = np.concatenate([-phi, phi], axis=2), np.concatenate([-base, base])
+    return phi, base, explainer.output
+
+
+def explain_rows_job(model: str, X_raw: np.ndarray) -> dict:
+    """Executor job: attributions for the predicted class of each raw row."""
+    state    = inference.worker_state(model)
+    X_scaled = state.scaler.transform(X_raw)
+    proba    = tree_compiler.predict_proba(state, X_scaled)
+    pred     = proba.argmax(axis=1)
+    phi, base, output = explain(state, X_scaled)
+    rows = np.arange(len(pred))
+    return {
+        "pred":   pred,
+        "proba":  proba[rows, pred],
+        "phi":    phi[rows, :, pred],
+        "base":   base[pred],
+        "output": output,
+    }
+
+
+# ─── Batch explanations ──────────────────────────────────────────────────────
+@dataclass
+class ExplainChunk:
+    """One explained chunk: counts plus NDJSON lines for its flagged rows."""
+    rows:    int
+    flagged: int
+    seconds: float
+    payload: str = ""
+
+
+def explain_chunk_job(model: str, df: pd.DataFrame, offset: int,
+                      display_labels: list[str], top_k: int) -> ExplainChunk:
+    """Executor job: score a chunk and explain its non-benign rows.
+
+    Each flagged row renders as one NDJSON line with the top_k contributions
+    (by magnitude) towards its predicted class.
+    """
+    t0       = time.perf_counter()
+    state    = inference.worker_state(model)
+    X        = state.vectorizer.transform(df)
+    X_scaled = state.scaler.transform(X)
+    proba    = tree_compiler.predict_proba(state, X_scaled)
+    pred     = proba.argmax(axis=1)
+    benign   = np.flatnonzero(state.label_encoder.classes_ == "benign")
+    flagged  = np.flatnonzero(~np.isin(pred, benign))
+
+    lines: list[str] = []
+    if len(flagged):
+        phi, base, output = explain(state, X_scaled[flagged])
+        cls  = pred[flagged]
+        phi  = phi[np.arange(len(flagged)), :, cls]
+        top  = np.argsort(-np.abs(phi), axis=1)[:, :top_k]
+        cols = state.feature_cols
+        for r, i in enumerate(flagged.tolist()):
+            lines.append(json.dumps({
+                "row_id":        offset + i,
+                "label":         display_labels[cls[r]],
+                "confidence":    round(float(proba[i, cls[r]]), 4),
+                "output":        output,
+                "base_value":    round(float(base[cls[r]]), 6),
+                "contributions": [
+                    {"feature": cols[j], "value": round(float(X[i, j]), 4),
+                     "contribution": round(float(phi[r, j]), 6)}
+                    for j in top[r].tolist()
+                ],
+            }) + "\n")
+
+    return ExplainChunk(
+        rows    = len(df),
+        flagged = len(flagged),
+        seconds = time.perf_counter() - t0,
+        payload = "".join(lines),
+    )
+
+
+async def explain_stream(
+    model: str,
+    chunks: Iterator[pd.DataFrame],
+    display_labels: list[str],
+    top_k: int,
+) -> AsyncIterator[ExplainChunk]:
+    """Fan chunks out over the explain executor, keeping one job per worker
+    in flight, and yield results in file order."""
+    pool = inference.explain_executor
+    pending: deque[asyncio.Future] = deque()
+    offset = 0
+    try:
+        while True:
+            df = await asyncio.to_thread(next, chunks, None)
+            if df is None:
+                break
+            pending.append(asyncio.ensure_future(
+                pool.run(model, explain_chunk_job, model, df, offset, display_labels, top_k)
+            ))
+            offset += len(df)
+            if len(pending) >= pool.workers:
+                yield await pending.popleft()
+        while pending:
+            yield await pending.popleft()
+    finally:
+        for fut in pending:
+            fut.cancel()
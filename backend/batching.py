@@ -0,0 +1,139 @@
+"""
+Micro-batching for single-row predictions (POST /api/predict).
+
+With PREDICT_BATCHING=1, concurrent requests for the same model are
+collected for up to PREDICT_BATCH_MAX_DELAY_MS or until
+PREDICT_BATCH_MAX_SIZE rows are waiting, scored with one vectorized
+predict_proba call on the inference executor, and each caller gets its own
+row back. A batch that fails on malformed row data is retried row by row;
+any other failure (queue full, broken worker pool) goes to every waiting
+caller at once.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+from typing import Any
+
+import numpy as np
+
+import inference
+import scoring
+
+ENABLED      = os.getenv("PREDICT_BATCHING", "0").strip().lower() in ("1", "true", "yes", "on")
+MAX_SIZE     = int(os.getenv("PREDICT_BATCH_MAX_SIZE", "64"))
+MAX_DELAY_MS = float(os.getenv("PREDICT_BATCH_MAX_DELAY_MS", "2"))
+
+# Errors a malformed row raises while being vectorized; only these make a
+# failed batch fall back to scoring its rows one at a time.
+ROW_ERRORS = (ValueError, TypeError, KeyError)
+
+
+class MicroBatcher:
+    def __init__(self, model: str, max_size: int = MAX_SIZE, max_delay_ms: float = MAX_DELAY_MS) -> None:
+        self.model     = model
+        self.max_size  = max(1, max_size)
+        self.max_delay = max(0.0, max_delay_ms) / 1000
+        self._pending: list[tuple[dict, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self.batches = 0
+        self.rows    = 0
+
+    async def submit(self, features: dict[str, Any]) -> np.ndarray:
+        """Queue one row and wait for its class probabilities."""
+        loop = asyncio.get_running_loop()
+        fut  = loop.create_future()
+        self._pending.append((features, fut))
+
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._flush)
+        return await fut
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._score(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _score(self, batch: list[tuple[dict, asyncio.Future]]) -> None:
+        rows = [features for features, _ in batch]
+        self.batches += 1
+        self.rows    += len(rows)
+        try:
+            proba = await inference.executor.run(
+                self.model, scoring.predict_rows_job, self.model, rows
+            )
+        except ROW_ERRORS as exc:
+            if len(batch) == 1:
+                _settle(batch[0][1], exc=exc)
+                return
+            # One bad row must not fail its neighbours: retry rows individually.
+            for k, (features, fut) in enumerate(batch):
+                try:
+                    row = await inference.executor.run(
+                        self.model, scoring.predict_rows_job, self.model, [features]
+                    )
+                    _settle(fut, result=row[0])
+                except ROW_ERRORS as row_exc:
+                    _settle(fut, exc=row_exc)
+                except Exception as row_exc:
+                    _fail(batch[k:], row_exc)
+                    return
+            return
+        except Exception as exc:
+            # Backpressure (503), a broken worker pool, ...: not caused by the
+            # rows, and retrying them one by one would only queue more jobs.
+            _fail(batch, exc)
+            return
+
+        for i, (_, fut) in enumerate(batch):
+            _settle(fut, result=proba[i])
+
+    def stats(self) -> dict:
+        return {
+            "max_size":        self.max_size,
+            "max_delay_ms":    self.max_delay * 1000,
+            "batches":         self.batches,
+            "rows":            self.rows,
+            "mean_batch_size": round(self.rows / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+def _fail(batch: list[tuple[dict, asyncio.Future]], exc: BaseException) -> None:
+    for _, fut in batch:
+        _settle(fut, exc=exc)
+
+
+def _settle(fut: asyncio.Future, result: Any = None, exc: BaseException | None = None) -> None:
+    if fut.done():          # caller went away
+        return
+    if exc is not None:
+        fut.set_exception(exc)
+    else:
+        fut.set_result(result)
+
+
+# ─── Per-model batchers ──────────────────────────────────────────────────────
+_batchers: dict[str, MicroBatcher] = {}
+
+
+def batcher(model: str) -> MicroBatcher:
+    if model not in _batchers:
+        _batchers[model] = MicroBatcher(model)
+    return _batchers[model]
+
+
+def reset() -> None:
+    """Drop batchers (their timers and futures belong to the old event loop)."""
+    _batchers.clear()
+
+
+def stats() -> dict:
+    return {"enabled": ENABLED, "models": {k: b.stats() for k, b in _batchers.items()}}
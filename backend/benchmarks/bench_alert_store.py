@@ -0,0 +1,67 @@
+"""
+Alert store benchmark — sustained add throughput and filtered query latency.
+
+  python -m benchmarks.bench_alert_store --alerts 1000000 --keys 5000
+
+Alerts cycle over `--keys` distinct (type, remote endpoint) pairs with
+timestamps advancing at `--rate` alerts/s, so the suppression window folds
+repeats the way a live feed would. The target is well above 50k alerts/s.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.common import timeit
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--alerts", type=int, default=1_000_000)
+    parser.add_argument("--keys", type=int, default=5_000, help="distinct (type, endpoint) pairs")
+    parser.add_argument("--rate", type=float, default=50_000, help="simulated alerts/s (timestamp spacing)")
+    parser.add_argument("--batch", type=int, default=1_000, help="alerts per add_many()")
+    parser.add_argument("--window", type=float, default=60.0)
+    args = parser.parse_args()
+
+    from alert_store import AlertStore
+
+    types   = [("Brute Force", "HIGH", "psutil"), ("Probe", "MED", "psutil"),
+               ("DDoS Attack", "HIGH", "zeek"), ("Port Scan", "MED", "zeek")]
+    rng     = np.random.default_rng(0)
+    key_ids = rng.integers(0, args.keys, args.alerts)
+    t0      = time.time()
+    alerts  = [
+        {"ts": t0 + i / args.rate, "type": types[k % 4][0], "threat": types[k % 4][1],
+         "source": types[k % 4][2], "dst_ip": f"10.{k >> 8 & 255}.{k & 255}.1:22"}
+        for i, k in enumerate(key_ids.tolist())
+    ]
+
+    store = AlertStore(maxlen=10_000, window=args.window)
+    start = time.perf_counter()
+    for i in range(0, len(alerts), args.batch):
+        store.add_many(alerts[i:i + args.batch])
+    secs = time.perf_counter() - start
+
+    stats = store.stats()
+    print(f"added       {args.alerts:,} alerts in {secs:.2f}s  →  {args.alerts / secs:,.0f} alerts/s")
+    print(f"entries     {stats['entries']:,} stored, {stats['suppressed']:,} suppressed, "
+          f"{stats['evicted']:,} evicted")
+
+    single = AlertStore(maxlen=10_000, window=args.window)
+    n      = min(200_000, args.alerts)
+    start  = time.perf_counter()
+    for a in alerts[:n]:
+        single.add(a)
+    print(f"add()       {n / (time.perf_counter() - start):,.0f} alerts/s one at a time")
+
+    for label, kwargs in [("latest 20", {}), ("threat=HIGH", {"threat": "HIGH"}),
+                          ("type+source", {"type": "Probe", "source": "psutil"}),
+                          ("no match", {"type": "Port Scan", "threat": "HIGH"})]:
+        print(f"query {label:<13} {timeit(lambda: store.query(20, **kwargs), repeat=50) * 1e6:8.1f}µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Model comparison benchmark — three /api/upload-csv calls vs one /api/compare.
+
+  python -m benchmarks.bench_compare --rows 200000
+
+Both paths parse the same CSV in SCORE_CHUNK_ROWS chunks on the inference
+executor. The three uploads parse, extract and scale the file once per
+model; /api/compare does it once and runs the models concurrently.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.common import make_flows
+
+MODELS = ("cnn", "lstm", "hybrid")
+
+
+async def _run(n_rows: int) -> None:
+    import httpx
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DB_PATH"] = str(Path(tmp) / "bench.db")
+        import db
+        import inference
+        import main
+
+        db.DB_PATH = os.environ["DB_PATH"]
+        main.train_models()
+        db.init_db()
+        db.writer.start()
+        inference.executor.start()
+
+        csv = make_flows(n_rows).drop(columns=["label"]).to_csv(index=False).encode()
+        print(f"{n_rows:,} rows, {len(csv) / 1e6:.1f} MB CSV")
+
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            t0 = time.perf_counter()
+            for model in MODELS:
+                r = await client.post(f"/api/upload-csv?model={model}", files={"file": ("f.csv", csv)})
+                r.raise_for_status()
+            uploads = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            r = await client.post("/api/compare?detail=none", files={"file": ("f.csv", csv)})
+            r.raise_for_status()
+            compare = time.perf_counter() - t0
+            body = r.json()
+
+        db.writer.stop()
+
+    print(f"  3 × upload-csv  {uploads:7.2f}s")
+    print(f"  1 × compare     {compare:7.2f}s   ({uploads / compare:.2f}× faster)")
+    print(f"  features {body['latency']['features']}s, "
+          + ", ".join(f"{m} {body['latency'][m]}s" for m in MODELS))
+    print(f"  unanimous {body['agreement']['unanimous_rate']:.2%}, pairwise {body['agreement']['pairwise']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args()
+    asyncio.run(_run(args.rows))
+
+
+if __name__ == "__main__":
+    main()
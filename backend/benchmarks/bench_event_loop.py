@@ -0,0 +1,83 @@
+"""
+Event-loop load test — latency of a light endpoint while heavy uploads run.
+
+Drives the app in-process over ASGI, so any CPU work left on the event loop
+shows up directly as /health latency.
+
+  python -m benchmarks.bench_event_loop --rows 100000 --uploads 4
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+from benchmarks.common import make_flows
+
+
+async def _probe(client, stop: asyncio.Event, samples: list[float]) -> None:
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await client.get("/health")
+        samples.append(time.perf_counter() - t0)
+        await asyncio.sleep(0.01)
+
+
+def _report(name: str, samples: list[float]) -> None:
+    ms = np.array(samples) * 1e3
+    print(f"{name:>8}  n={len(ms):<5} p50={np.percentile(ms, 50):7.2f}ms  "
+          f"p99={np.percentile(ms, 99):7.2f}ms  max={ms.max():7.2f}ms")
+
+
+async def _run(rows: int, uploads: int, idle_secs: float) -> None:
+    import httpx
+    import inference
+    import main
+
+    main.train_models()
+    inference.executor.start()
+    body = make_flows(rows).to_csv(index=False).encode()
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        idle, loaded = [], []
+
+        stop = asyncio.Event()
+        probe = asyncio.create_task(_probe(client, stop, idle))
+        await asyncio.sleep(idle_secs)
+        stop.set()
+        await probe
+
+        stop = asyncio.Event()
+        probe = asyncio.create_task(_probe(client, stop, loaded))
+        t0 = time.perf_counter()
+        responses = await asyncio.gather(*[
+            client.post("/api/upload-csv", files={"file": ("flows.csv", body)},
+                        params={"stream": "true"})
+            for _ in range(uploads)
+        ])
+        elapsed = time.perf_counter() - t0
+        stop.set()
+        await probe
+
+    print(f"{uploads} uploads x {rows} rows in {elapsed:.2f}s "
+          f"(status {sorted({r.status_code for r in responses})}, "
+          f"executor={inference.executor.stats()['kind']})")
+    _report("idle", idle)
+    _report("loaded", loaded)
+    inference.executor.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--uploads", type=int, default=4)
+    parser.add_argument("--idle-secs", type=float, default=2.0)
+    args = parser.parse_args()
+    asyncio.run(_run(args.rows, args.uploads, args.idle_secs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Attribution benchmark — per-row SHAP cost and local-accuracy check.
+
+  python -m benchmarks.bench_explain --rows 1 10 100
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.common import make_flows, timeit
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1, 10, 100])
+    args = parser.parse_args()
+
+    import attribution
+    import main as app
+
+    app.train_models()
+    print(f"{'model':>7} {'build':>9} {'rows':>6} {'total':>10} {'per row':>9} {'max |err|':>10}")
+    for name in ("hybrid", "cnn", "lstm"):
+        state = app._registry[name]
+        start = time.perf_counter()
+        attribution.build_explainer(state.clf)
+        build = time.perf_counter() - start
+        for n in args.rows:
+            X = state.scaler.transform(state.vectorizer.transform(make_flows(n)))
+            secs = timeit(lambda: attribution.explain(state, X), 10 if n <= 10 else 3)
+            phi, base, output = attribution.explain(state, X)
+            expected = state.clf.predict_proba(X) if output == "probability" else state.clf.decision_function(X)
+            err = np.abs(phi.sum(axis=1) + base - expected.reshape(len(X), -1)).max()
+            print(f"{name:>7} {build * 1e3:>7.1f}ms {n:>6} {secs * 1e3:>8.2f}ms "
+                  f"{secs / n * 1e3:>7.2f}ms {err:>10.1e}")
+
+
+if __name__ == "__main__":
+    main()
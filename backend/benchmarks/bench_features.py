@@ -0,0 +1,34 @@
+"""
+Feature extraction benchmark — legacy `extract_features` vs FeatureVectorizer.
+
+  python -m benchmarks.bench_features --rows 1 1000 1000000
+"""
+from __future__ import annotations
+
+import argparse
+
+from benchmarks.common import make_flows, timeit
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1, 1_000, 1_000_000])
+    args = parser.parse_args()
+
+    from features import FeatureVectorizer
+    from main import extract_features, generate_training_data
+
+    vectorizer = FeatureVectorizer.fit(generate_training_data())
+    cols       = vectorizer.feature_cols
+
+    print(f"{'rows':>10} {'extract_features':>17} {'vectorizer':>11} {'speedup':>8}")
+    for n in args.rows:
+        df     = make_flows(n)
+        repeat = 20 if n <= 1_000 else 3
+        legacy = timeit(lambda: extract_features(df, expected_cols=cols), repeat)
+        frozen = timeit(lambda: vectorizer.transform(df), repeat)
+        print(f"{n:>10} {legacy * 1e3:>15.3f}ms {frozen * 1e3:>9.3f}ms {legacy / frozen:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
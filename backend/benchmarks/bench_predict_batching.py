@@ -0,0 +1,69 @@
+"""
+Single-row /api/predict throughput — direct path vs micro-batching.
+
+  python -m benchmarks.bench_predict_batching --requests 2000 --concurrency 64
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import make_flows
+
+
+async def _fire(client, rows: list[dict], concurrency: int) -> float:
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(row: dict) -> None:
+        async with sem:
+            r = await client.post("/api/predict", json=row)
+            r.raise_for_status()
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*[one(r) for r in rows])
+    return time.perf_counter() - t0
+
+
+async def _run(n: int, concurrency: int, max_size: int, max_delay_ms: float) -> None:
+    import httpx
+    import batching
+    import inference
+    import main
+
+    main.train_models()
+    inference.executor.start()
+    rows = make_flows(n).drop(columns=["label"]).to_dict(orient="records")
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        batching.ENABLED = False
+        direct = await _fire(client, rows, concurrency)
+
+        batching.ENABLED = True
+        batching.reset()
+        b = batching.batcher("hybrid")
+        b.max_size, b.max_delay = max_size, max_delay_ms / 1000
+        batched = await _fire(client, rows, concurrency)
+        stats = b.stats()
+
+    print(f"{n} requests, concurrency {concurrency}")
+    print(f"  direct : {n / direct:8.0f} req/s")
+    print(f"  batched: {n / batched:8.0f} req/s  "
+          f"(mean batch {stats['mean_batch_size']}, max {max_size}, window {max_delay_ms}ms)")
+    print(f"  speedup: {direct / batched:.2f}x")
+    inference.executor.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--max-size", type=int, default=64)
+    parser.add_argument("--max-delay-ms", type=float, default=2.0)
+    args = parser.parse_args()
+    asyncio.run(_run(args.requests, args.concurrency, args.max_size, args.max_delay_ms))
+
+
+if __name__ == "__main__":
+    main()
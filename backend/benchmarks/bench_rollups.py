@@ -0,0 +1,74 @@
+"""
+Chart rollup benchmark — /api/charts query latency over months of history.
+
+  python -m benchmarks.bench_rollups --days 180 --models 3
+
+Fills a temporary database with minute/hour/day detection rollups for every
+model and label over `--days` of history (through the same UPSERT_ROLLUP
+path the writer uses), then times db.chart_series for typical chart
+windows. Every query is a primary-key or index range scan over rollups.
+"""
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.common import timeit
+
+LABELS = ["Normal Traffic", "DDoS Attack", "Port Scan", "Brute Force"]
+MODELS = ["hybrid", "cnn", "lstm"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--models", type=int, default=3, choices=range(1, 4))
+    args = parser.parse_args()
+
+    import db
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = str(Path(tmp) / "bench.db")
+        db.init_db()
+
+        now    = time.time()
+        start  = now - args.days * 86400
+        rng    = np.random.default_rng(0)
+        minute = np.arange(int(start // 60), int(now // 60)) * 60
+        t0     = time.perf_counter()
+        conn   = db.connect()
+        for model in MODELS[:args.models]:
+            counts = rng.integers(0, 50, (len(minute), len(LABELS)))
+            rows   = db.rollup_rows("detection", (
+                (t, model, label, int(n))
+                for t, row in zip(minute.tolist(), counts.tolist())
+                for label, n in zip(LABELS, row)
+            ))
+            with conn:
+                conn.executemany(db.UPSERT_ROLLUP, rows)
+        stored = conn.execute("SELECT COUNT(*) FROM rollups").fetchone()[0]
+        conn.close()
+        print(f"rollup rows {stored:,} for {args.days} days × {args.models} models "
+              f"(filled in {time.perf_counter() - t0:.1f}s)")
+
+        windows = [
+            ("last hour, minute",  "minute", now - 3600),
+            ("last 24 h, minute",  "minute", now - 86400),
+            ("last 30 d, hour",    "hour",   now - 30 * 86400),
+            (f"last {args.days} d, day", "day", start),
+        ]
+        print(f"{'window':<22} {'model':>7} {'points':>7} {'latency':>10}")
+        for label, grain, since in windows:
+            for model in ("hybrid", None):
+                rows = db.chart_series(grain, "detection", model, since, now)
+                secs = timeit(lambda: db.chart_series(grain, "detection", model, since, now), repeat=20)
+                print(f"{label:<22} {model or 'all':>7} {len({r[0] for r in rows}):>7} {secs * 1e3:>8.2f}ms")
+        db.readers.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+Training benchmark — sequential vs parallel `training.fit_parallel`.
+
+  python -m benchmarks.bench_training --rows 20000 100000 --workers 4
+"""
+from __future__ import annotations
+
+import argparse
+import os
+
+from benchmarks.common import make_flows, timeit
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[20_000, 100_000])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    import training
+    from sklearn.preprocessing import LabelEncoder, StandardScaler
+    from main import extract_features, model_definitions
+
+    print(f"{'rows':>10} {'sequential':>11} {'parallel':>10} {'speedup':>8}")
+    for n in args.rows:
+        df   = make_flows(n)
+        X, _ = extract_features(df)
+        X    = StandardScaler().fit_transform(X)
+        y    = LabelEncoder().fit_transform(df["label"].values)
+
+        seq = timeit(lambda: training.fit_parallel(model_definitions(), X, y, workers=1), repeat=1)
+        par = timeit(lambda: training.fit_parallel(model_definitions(), X, y, workers=args.workers), repeat=1)
+        print(f"{n:>10} {seq:>10.2f}s {par:>9.2f}s {seq / par:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Tree ensemble benchmark — sklearn predict_proba vs tree_compiler.
+
+  python -m benchmarks.bench_tree_compiler --rows 1 32 100 1000 10000
+
+Use the crossover row count to tune COMPILED_MAX_ROWS.
+"""
+from __future__ import annotations
+
+import argparse
+
+import numpy as np
+
+from benchmarks.common import make_flows, timeit
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1, 32, 100, 1000, 10_000])
+    args = parser.parse_args()
+
+    import main as app
+    import tree_compiler
+
+    app.train_models()
+    print(f"{'model':>7} {'rows':>7} {'sklearn':>10} {'compiled':>10} {'speedup':>8} {'max |Δp|':>10}")
+    for name in ("hybrid", "cnn"):
+        state    = app._registry[name]
+        compiled = tree_compiler.compile_ensemble(state.clf)
+        for n in args.rows:
+            X      = state.scaler.transform(state.vectorizer.transform(make_flows(n)))
+            repeat = 20 if n <= 100 else 3
+            ref    = timeit(lambda: state.clf.predict_proba(X), repeat)
+            fast   = timeit(lambda: compiled.predict_proba(X), repeat)
+            diff   = np.abs(compiled.predict_proba(X) - state.clf.predict_proba(X)).max()
+            print(f"{name:>7} {n:>7} {ref * 1e3:>8.2f}ms {fast * 1e3:>8.2f}ms {ref / fast:>7.1f}x {diff:>10.1e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Zeek ingest benchmark — conn.log conversion and convert+score throughput.
+
+  python -m benchmarks.bench_zeek_ingest --rows 10000 100000 --model hybrid
+"""
+from __future__ import annotations
+
+import argparse
+import tempfile
+from pathlib import Path
+
+from benchmarks.common import timeit, write_conn_log
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--model", default="hybrid")
+    args = parser.parse_args()
+
+    import main as app
+    import zeek_ingest
+
+    app.train_models()
+    print(f"{'rows':>8} {'convert':>10} {'convert+score':>14} {'rows/s':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "conn.log"
+        for n in args.rows:
+            write_conn_log(path, n)
+            batch    = next(zeek_ingest.ZeekTailer(path, batch_rows=n).poll())
+            ingestor = zeek_ingest.ZeekIngestor(
+                path, args.model, get_state=app._registry.__getitem__, emit=lambda alerts: None
+            )
+            convert = timeit(lambda: zeek_ingest.conn_to_features(batch))
+            total   = timeit(lambda: ingestor.process(batch))
+            print(f"{n:>8} {convert * 1e3:>8.1f}ms {total * 1e3:>12.1f}ms {n / total:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Zeek tailer benchmark — catch-up throughput on a large conn.log and the cost
+of an incremental poll at its end.
+
+  python -m benchmarks.bench_zeek_tail --size-mb 4096
+  python -m benchmarks.bench_zeek_tail --path /data/conn.log   # reuse a file
+
+An incremental poll should cost the same at the end of a multi-GB log as at
+the end of a small one: only appended bytes are read.
+"""
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.common import conn_log_header, conn_log_rows, write_conn_log
+
+_BYTES_PER_ROW = 150   # rough size of a synthetic conn.log line
+
+
+def _poll_cost(tailer, path: Path, rows: int, repeat: int = 5) -> float:
+    """Best time to poll `rows` freshly appended rows."""
+    best = float("inf")
+    for i in range(repeat):
+        with open(path, "ab") as fh:
+            fh.write(conn_log_rows(rows, seed=1000 + i))
+        t0 = time.perf_counter()
+        got = sum(len(b) for b in tailer.poll())
+        best = min(best, time.perf_counter() - t0)
+        assert got == rows, (got, rows)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=int, default=2048)
+    parser.add_argument("--path", type=Path, help="existing conn.log (appended to!)")
+    parser.add_argument("--batch-rows", type=int, default=10_000)
+    parser.add_argument("--append-rows", type=int, default=10_000)
+    args = parser.parse_args()
+
+    from zeek_ingest import ZeekTailer
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.path or Path(tmp) / "conn.log"
+        if args.path is None:
+            t0   = time.perf_counter()
+            size = write_conn_log(path, args.size_mb * 1024 * 1024 // _BYTES_PER_ROW)
+            print(f"wrote {size / 2**20:,.0f} MB in {time.perf_counter() - t0:.1f}s")
+        size = path.stat().st_size
+
+        tailer = ZeekTailer(path, batch_rows=args.batch_rows)
+        t0     = time.perf_counter()
+        rows   = sum(len(b) for b in tailer.poll())
+        secs   = time.perf_counter() - t0
+        print(f"catch-up   {rows:>12,} rows  {secs:8.2f}s  "
+              f"{rows / secs:>12,.0f} rows/s  {size / 2**20 / secs:8.1f} MB/s")
+
+        big = _poll_cost(tailer, path, args.append_rows)
+        tailer.close()
+
+        small_path = Path(tmp) / "small.log"
+        small_path.write_bytes(conn_log_header() + conn_log_rows(1_000))
+        small = ZeekTailer(small_path, batch_rows=args.batch_rows)
+        list(small.poll())
+        base = _poll_cost(small, small_path, args.append_rows)
+        small.close()
+
+        print(f"poll +{args.append_rows:,} rows at end of {size / 2**20:,.0f} MB log: {big * 1e3:8.2f}ms")
+        print(f"poll +{args.append_rows:,} rows at end of small log:{'':>7}{base * 1e3:8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Run any benchmark from the backend directory, e.g.:
+  python -m benchmarks.bench_training --rows 20000 100000
+"""
+from __future__ import annotations
+
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+
+def make_flows(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """Deterministic synthetic flows, equal parts of the four trained classes."""
+    import synthetic
+
+    return synthetic.generate_flows(n_rows, seed=seed)
+
+
+def timeit(fn: Callable[[], object], repeat: int = 3) -> float:
+    """Best wall-clock time of `repeat` calls, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+# ─── Zeek conn.log fixtures ──────────────────────────────────────────────────
+CONN_FIELDS = ("ts uid id.orig_h id.orig_p id.resp_h id.resp_p proto service duration "
+               "orig_bytes resp_bytes conn_state local_orig local_resp missed_bytes history "
+               "orig_pkts orig_ip_bytes resp_pkts resp_ip_bytes tunnel_parents").split()
+CONN_TYPES  = ("time string addr port addr port enum string interval count count string "
+               "bool bool count string count count count count set[string]").split()
+
+
+def conn_log_header() -> bytes:
+    return (
+        "#separator \\x09\n#set_separator\t,\n#empty_field\t(empty)\n#unset_field\t-\n"
+        "#path\tconn\n#open\t2024-01-01-00-00-00\n"
+        "#fields\t" + "\t".join(CONN_FIELDS) + "\n"
+        "#types\t" + "\t".join(CONN_TYPES) + "\n"
+    ).encode()
+
+
+def conn_log_rows(n_rows: int, seed: int = 0, t0: float = 1.7e9) -> bytes:
+    """`n_rows` synthetic conn.log data lines (TSV, newline-terminated)."""
+    rng = np.random.default_rng(seed)
+    df  = pd.DataFrame({
+        "ts":             np.round(t0 + np.arange(n_rows) * 0.001, 6),
+        "uid":            [f"C{i:017x}" for i in rng.integers(0, 2**63, n_rows)],
+        "id.orig_h":      "10.0.0." + pd.Series(rng.integers(1, 255, n_rows)).astype(str),
+        "id.orig_p":      rng.integers(1024, 65535, n_rows),
+        "id.resp_h":      "192.168.1." + pd.Series(rng.integers(1, 255, n_rows)).astype(str),
+        "id.resp_p":      rng.choice([22, 53, 80, 443, 3389], n_rows),
+        "proto":          rng.choice(["tcp", "udp", "icmp"], n_rows, p=[0.7, 0.25, 0.05]),
+        "service":        rng.choice(["-", "http", "ssl", "dns", "ssh"], n_rows),
+        "duration":       np.round(rng.exponential(2.0, n_rows), 6),
+        "orig_bytes":     rng.integers(0, 50_000, n_rows),
+        "resp_bytes":     rng.integers(0, 500_000, n_rows),
+        "conn_state":     rng.choice(["SF", "S0", "REJ", "RSTO", "S1"], n_rows),
+        "local_orig":     "T",
+        "local_resp":     "F",
+        "missed_bytes":   0,
+        "history":        rng.choice(["ShADadFf", "S", "ShR", "Dd", "ShADadR"], n_rows),
+        "orig_pkts":      rng.integers(1, 200, n_rows),
+        "orig_ip_bytes":  rng.integers(40, 60_000, n_rows),
+        "resp_pkts":      rng.integers(0, 400, n_rows),
+        "resp_ip_bytes":  rng.integers(0, 600_000, n_rows),
+        "tunnel_parents": "(empty)",
+    })
+    return df.to_csv(sep="\t", header=False, index=False).encode()
+
+
+def write_conn_log(path: Path, n_rows: int, block_rows: int = 200_000, seed: int = 0) -> int:
+    """Write a Zeek conn.log of `n_rows` rows; returns its size in bytes."""
+    with open(path, "wb") as fh:
+        fh.write(conn_log_header())
+        for i, start in enumerate(range(0, n_rows, block_rows)):
+            fh.write(conn_log_rows(min(block_rows, n_rows - start), seed + i, 1.7e9 + start * 0.001))
+    return Path(path).stat().st_size
@@ -0,0 +1,280 @@
+"""
+Scoring benchmark suite — per-stage timings with JSON baselines.
+
+  python -m benchmarks.suite                          # compare with the baseline
+  python -m benchmarks.suite --save                   # record a new baseline
+  python -m benchmarks.suite --rows 1 1000 --skip-training --threshold 0.3
+
+Metrics (seconds, best of several runs, deterministic data from
+benchmarks.common.make_flows):
+
+  upload/parse/<rows>             /api/upload-csv CSV parsing (scoring.open_chunks)
+  upload/<model>/<rows>/<stage>   the per-model stages: features (vectorizer),
+                                  scale, predict, results (scoring.build_chunk)
+  predict/job                     one-row scoring.predict_rows_job, in-process
+  predict/endpoint_p50, _p95      one-row POST /api/predict through the app
+  train/<model>, train/all        training.fit_parallel on --train-rows rows
+
+With a baseline (default benchmarks/baselines/<host>.json), a metric fails
+when it is more than --threshold slower in relative terms AND more than
+--min-delta-ms slower in absolute terms (so sub-millisecond timer noise on
+tiny inputs cannot fail a run). Suspected regressions are re-measured
+--confirm times, keeping the best time, and the process exits 1 only if a
+regression persists.
+Baselines are machine-specific: record one per machine (or CI runner) with
+--save before comparing.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import functools
+import io
+import json
+import logging
+import os
+import platform
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+from benchmarks.common import BACKEND_DIR, make_flows
+
+BASELINE_DIR = BACKEND_DIR / "benchmarks" / "baselines"
+DEFAULT_ROWS = (1, 1_000, 100_000, 1_000_000)
+MODELS       = ("cnn", "lstm", "hybrid")
+
+
+def measure(fn: Callable[[], object], rows: int, min_run: float = 0.05) -> float:
+    """Best per-call time over several runs. Like timeit's autorange, each
+    run loops `fn` until it lasts at least `min_run` seconds, so clock
+    resolution and one-off stalls do not dominate small inputs; inputs of
+    over 100k rows get fewer runs."""
+    number = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - t0
+        if elapsed >= min_run:
+            break
+        number *= 2
+    best   = elapsed / number
+    repeat = 5 if rows <= 100_000 else 2
+    for _ in range(repeat - 1):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - t0) / number)
+    return best
+
+
+# ─── Cases ───────────────────────────────────────────────────────────────────
+# Each case is (label, run) where run() measures and returns {metric: seconds};
+# cases are re-run individually to confirm a suspected regression.
+Case = tuple[str, Callable[[], dict]]
+
+
+def upload_cases(rows_list: list[int]) -> list[Case]:
+    cases: list[Case] = []
+    for n in rows_list:
+        cases.append((f"upload/parse/{n}", functools.partial(_parse_case, n)))
+        cases += [(f"upload/{model}/{n}", functools.partial(_stages_case, model, n)) for model in MODELS]
+    return cases
+
+
+# Upload cases build their inputs when run and drop them on return, so only
+# one size's data is resident while anything is being timed.
+def _upload_frame(n: int):
+    return make_flows(n, seed=n).drop(columns=["label"])
+
+
+def _parse_case(n: int) -> dict:
+    import scoring
+
+    csv = _upload_frame(n).to_csv(index=False).encode()
+    return {f"upload/parse/{n}": measure(lambda: list(scoring.open_chunks(io.BytesIO(csv))), n)}
+
+
+def _stages_case(model: str, n: int) -> dict:
+    import scoring
+    import tree_compiler
+    from main import _registry, friendly_label
+
+    state  = _registry[model]
+    labels = [friendly_label(str(c)) for c in state.label_encoder.classes_]
+    df     = _upload_frame(n)
+    X      = state.vectorizer.transform(df)
+    Xs     = state.scaler.transform(X)
+    proba  = tree_compiler.predict_proba(state, Xs)
+    prefix = f"upload/{model}/{n}"
+    return {
+        f"{prefix}/features": measure(lambda: state.vectorizer.transform(df), n),
+        f"{prefix}/scale":    measure(lambda: state.scaler.transform(X), n),
+        f"{prefix}/predict":  measure(lambda: tree_compiler.predict_proba(state, Xs), n),
+        f"{prefix}/results":  measure(lambda: scoring.build_chunk(state, df, proba, 0.0, 0, labels, "json", 1), n),
+    }
+
+
+def single_row_cases(requests: int) -> list[Case]:
+    import httpx
+    import main
+    import scoring
+
+    row = make_flows(1, seed=1).drop(columns=["label"]).to_dict(orient="records")[0]
+
+    async def fire() -> np.ndarray:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for _ in range(20):   # warm up
+                (await client.post("/api/predict", json=row)).raise_for_status()
+            times = []
+            for _ in range(requests):
+                t0 = time.perf_counter()
+                (await client.post("/api/predict", json=row)).raise_for_status()
+                times.append(time.perf_counter() - t0)
+            return np.array(times)
+
+    def endpoint() -> dict:
+        times = asyncio.run(fire())
+        return {
+            "predict/endpoint_p50": float(np.percentile(times, 50)),
+            "predict/endpoint_p95": float(np.percentile(times, 95)),
+        }
+
+    return [
+        ("predict/job",      lambda: {"predict/job": measure(lambda: scoring.predict_rows_job("hybrid", [row]), 1)}),
+        ("predict/endpoint", endpoint),
+    ]
+
+
+def training_cases(n_rows: int) -> list[Case]:
+    import training
+    from sklearn.preprocessing import LabelEncoder, StandardScaler
+    from features import FeatureVectorizer
+    from main import model_definitions
+
+    def train() -> dict:
+        df = make_flows(n_rows, seed=7)
+        X  = StandardScaler().fit_transform(FeatureVectorizer.fit(df).transform(df))
+        le = LabelEncoder()
+        y  = le.fit_transform(df["label"].values)
+
+        t0     = time.perf_counter()
+        fitted = training.fit_parallel(model_definitions(), X, y, class_names=list(le.classes_))
+        out    = {"train/all": time.perf_counter() - t0}
+        out.update({f"train/{name}": secs for name, (_, secs, _) in fitted.items()})
+        return out
+
+    return [(f"train/{n_rows}", train)]
+
+
+def run_cases(cases: list[Case], metrics: dict, owner: dict) -> None:
+    """Run every case, keeping the best time per metric; `owner` maps each
+    metric to the case that measures it."""
+    for label, run in cases:
+        for key, secs in run().items():
+            metrics[key] = min(secs, metrics.get(key, float("inf")))
+            owner[key]   = (label, run)
+            print(f"  {key:40s} {metrics[key] * 1e3:12.3f}ms")
+
+
+# ─── Baselines ───────────────────────────────────────────────────────────────
+def environment() -> dict:
+    import pandas as pd
+    import sklearn
+    return {
+        "host":     platform.node(),
+        "platform": platform.platform(),
+        "python":   platform.python_version(),
+        "numpy":    np.__version__,
+        "pandas":   pd.__version__,
+        "sklearn":  sklearn.__version__,
+        "cpus":     os.cpu_count(),
+        "time":     time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def regressions(baseline: dict, metrics: dict, threshold: float, min_delta: float) -> list[str]:
+    """Metrics slower than baseline by more than `threshold` and `min_delta`."""
+    return [
+        key for key in sorted(set(baseline) & set(metrics))
+        if metrics[key] > baseline[key] * (1 + threshold) and metrics[key] - baseline[key] > min_delta
+    ]
+
+
+def report(baseline: dict, metrics: dict, failed: list[str]) -> None:
+    print(f"\n{'metric':40s} {'baseline':>12s} {'current':>12s} {'change':>8s}")
+    for key in sorted(set(baseline) & set(metrics)):
+        base, cur = baseline[key], metrics[key]
+        change    = cur / base - 1 if base > 0 else 0.0
+        print(f"{key:40s} {base * 1e3:10.3f}ms {cur * 1e3:10.3f}ms {change:+7.1%}{'  FAIL' if key in failed else ''}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=list(DEFAULT_ROWS))
+    parser.add_argument("--requests", type=int, default=500, help="single-row endpoint calls")
+    parser.add_argument("--train-rows", type=int, default=20_000)
+    parser.add_argument("--skip-training", action="store_true")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_DIR / f"{platform.node() or 'local'}.json")
+    parser.add_argument("--save", action="store_true", help="write results as the new baseline")
+    parser.add_argument("--output", type=Path, help="also write this run's results here")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative slowdown")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="ignore slowdowns below this")
+    parser.add_argument("--confirm", type=int, default=2, help="re-measure suspected regressions this often")
+    args = parser.parse_args()
+    # httpx logs one INFO line per request; the single-row cases make hundreds.
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    import inference
+    import main as app
+
+    app.train_models()
+    inference.executor.start()
+
+    cases = upload_cases(args.rows) + single_row_cases(args.requests)
+    if not args.skip_training:
+        cases += training_cases(args.train_rows)
+    metrics: dict[str, float] = {}
+    owner:   dict[str, Case]  = {}
+    run_cases(cases, metrics, owner)
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() and not args.save else None
+    failed   = []
+    if baseline is not None:
+        failed = regressions(baseline["metrics"], metrics, args.threshold, args.min_delta_ms / 1e3)
+        for attempt in range(args.confirm):
+            if not failed:
+                break
+            print(f"\nRe-measuring {len(failed)} suspected regression(s) ({attempt + 1}/{args.confirm})")
+            rerun = {owner[key][0]: owner[key] for key in failed}
+            run_cases(list(rerun.values()), metrics, owner)
+            failed = regressions(baseline["metrics"], metrics, args.threshold, args.min_delta_ms / 1e3)
+    inference.executor.shutdown()
+
+    result = {"environment": environment(), "metrics": metrics}
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(result, indent=2, sort_keys=True))
+    if args.save:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(result, indent=2, sort_keys=True))
+        print(f"\nSaved baseline → {args.baseline}")
+        return
+    if baseline is None:
+        print(f"\nNo baseline at {args.baseline}; run with --save to record one.")
+        return
+
+    report(baseline["metrics"], metrics, failed)
+    if failed:
+        print(f"\n{len(failed)} metric(s) regressed more than {args.threshold:.0%}: {', '.join(failed)}")
+        sys.exit(1)
+    print(f"\nNo regressions beyond {args.threshold:.0%} (baseline {baseline['environment'].get('time')}).")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,116 @@
-import sqlite3
+"""
+SQLite persistence for upload runs, their per-row results and alerts.
+
+All writes go through one background DBWriter thread: callers enqueue rows
+(never blocking, never touching the database on the request path) and the
+writer commits them in executemany batches, one transaction per batch. The
+database runs in WAL mode, so readers — served from a small connection
+pool — never wait for the writer.
+
+Run ids are time-ordered (milliseconds << 10 | sequence, worker), so listing
+runs newest-first, keyset pagination and time-range filters all walk the
+primary key; per-row results are keyed (run_id, row_id) for the same reason.
+Runs and results use plain INSERT: a duplicate id fails its write instead of
+silently replacing another run.
+
+Detection and alert counts are also rolled up per minute, hour and day for
+each model and label as they are written (UPSERT_ROLLUP adds to the
+bucket's count). Charts read those rollups and never scan results.
+"""
+import json
+import logging
 import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Iterable, Iterator, Optional, Sequence
+
+log = logging.getLogger("cyber-ids")
+
+
+def _db_path() -> str:
+    """DB_PATH (plain path or sqlite:/// URL, relative to this directory)."""
+    raw = os.getenv("DB_PATH", "").strip()
+    if raw.startswith("sqlite:///"):
+        raw = raw[len("sqlite:///"):]
+    base = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base, raw or "cyberids.db")
+
 
 # Use absolute path so the DB is always found regardless of working directory
-DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cyberids.db')
+DB_PATH = _db_path()
 
-def get_db():
-    conn = sqlite3.connect(DB_PATH)
+WRITER_QUEUE_SIZE = int(os.getenv("DB_WRITER_QUEUE_SIZE", "10000"))   # queued batches
+WRITER_BATCH_ROWS = int(os.getenv("DB_WRITER_BATCH_ROWS", "50000"))   # rows per transaction
+READ_POOL_SIZE    = int(os.getenv("DB_READ_POOL_SIZE", "4"))
+
+INSERT_RUN = ("INSERT INTO runs (id, model, timestamp, label, total_rows, counts, summary) "
+              "VALUES (?, ?, ?, ?, ?, ?, ?)")
+INSERT_RESULT = ("INSERT INTO results (run_id, row_id, prediction, label, confidence) "
+                 "VALUES (?, ?, ?, ?, ?)")
+INSERT_ALERT = ("INSERT INTO alerts (run_id, event, threat_level, confidence, timestamp) "
+                "VALUES (?, ?, ?, ?, ?)")
+UPSERT_ROLLUP = ("INSERT INTO rollups (grain, kind, model, bucket, label, count) VALUES (?, ?, ?, ?, ?, ?) "
+                 "ON CONFLICT (grain, kind, model, bucket, label) DO UPDATE SET count = count + excluded.count")
+
+# Rollup grains: name → bucket width in seconds (buckets are epoch-aligned, i.e. UTC days).
+GRAINS = {"minute": 60, "hour": 3600, "day": 86400}
+
+
+# ─── Run ids ─────────────────────────────────────────────────────────────────
+_SEQ_BITS    = 10   # low bits below the millisecond: sequence, then worker
+_WORKER_BITS = 4
+_id_lock     = threading.Lock()
+_last_ms     = 0
+_last_seq    = 0
+
+
+def new_run_id() -> int:
+    """Unique, increasing run id: epoch ms << 10 | sequence << 4 | worker.
+
+    The worker slot comes from the process id, so uvicorn/gunicorn workers
+    sharing one database do not hand out the same id in the same
+    millisecond; each process issues up to 64 ids per millisecond before
+    borrowing from the next. Stays below 2**53, so JavaScript clients read
+    it exactly.
+    """
+    global _last_ms, _last_seq
+    worker = os.getpid() & ((1 << _WORKER_BITS) - 1)
+    with _id_lock:
+        ms = int(time.time() * 1000)
+        if ms > _last_ms:
+            _last_ms, _last_seq = ms, 0
+        elif _last_seq + 1 < 1 << (_SEQ_BITS - _WORKER_BITS):
+            _last_seq += 1
+        else:
+            _last_ms, _last_seq = _last_ms + 1, 0
+        return (_last_ms << _SEQ_BITS) | (_last_seq << _WORKER_BITS) | worker
+
+
+def run_id_at(epoch_seconds: float) -> int:
+    """Smallest run id issued at or after `epoch_seconds`."""
+    return int(epoch_seconds * 1000) << _SEQ_BITS
+
+
+def connect(path: Optional[str] = None) -> sqlite3.Connection:
+    conn = sqlite3.connect(path or DB_PATH, check_same_thread=False, timeout=30)
     conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")   # durable at checkpoints; safe with WAL
+    conn.execute("PRAGMA busy_timeout=30000")
     return conn
 
-def init_db():
-    conn = sqlite3.connect(DB_PATH)
+
+def get_db():
+    """A new connection; the caller closes it. Prefer `readers.connection()`."""
+    return connect()
+
+
+def init_db(path: Optional[str] = None):
+    conn = connect(path)
     c = conn.cursor()
     c.execute('''CREATE TABLE IF NOT EXISTS runs (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -27,5 +127,354 @@ def init_db():
         confidence REAL,
         timestamp TEXT
     )''')
+    c.execute('''CREATE TABLE IF NOT EXISTS results (
+        run_id INTEGER NOT NULL,
+        row_id INTEGER NOT NULL,
+        prediction INTEGER,
+        label TEXT,
+        confidence REAL,
+        PRIMARY KEY (run_id, row_id)
+    ) WITHOUT ROWID''')
+    # Columns added after the first schema version.
+    run_cols = {row[1] for row in c.execute("PRAGMA table_info(runs)")}
+    for col, decl in (("label", "TEXT"), ("total_rows", "INTEGER")):
+        if col not in run_cols:
+            c.execute(f"ALTER TABLE runs ADD COLUMN {col} {decl}")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_runs_timestamp ON runs (timestamp)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_runs_model ON runs (model, id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_runs_label ON runs (label, id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_alerts_timestamp ON alerts (timestamp)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_alerts_run_id ON alerts (run_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_alerts_threat_level ON alerts (threat_level)")
+    c.execute('''CREATE TABLE IF NOT EXISTS rollups (
+        grain TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        model TEXT NOT NULL,
+        bucket INTEGER NOT NULL,
+        label TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (grain, kind, model, bucket, label)
+    ) WITHOUT ROWID''')
+    # Covering, in (bucket, label) order: all-model charts never touch the table.
+    c.execute("CREATE INDEX IF NOT EXISTS idx_rollups_all ON rollups (grain, kind, bucket, label, count)")
+    if c.execute("SELECT 1 FROM rollups LIMIT 1").fetchone() is None:
+        _backfill_rollups(c)
     conn.commit()
     conn.close()
+
+
+def _backfill_rollups(c: sqlite3.Cursor) -> None:
+    """One-off: roll up results and alerts stored before the rollups table existed."""
+    for grain, step in GRAINS.items():
+        bucket = f"(CAST(strftime('%s', {{ts}}, 'utc') AS INTEGER) / {step}) * {step}"
+        c.execute(f'''INSERT INTO rollups (grain, kind, model, bucket, label, count)
+            SELECT ?, 'detection', r.model, {bucket.format(ts="r.timestamp")} AS b, res.label, COUNT(*)
+            FROM results res JOIN runs r ON r.id = res.run_id
+            WHERE r.timestamp IS NOT NULL AND res.label IS NOT NULL AND r.model IS NOT NULL
+            GROUP BY r.model, b, res.label''', (grain,))
+        c.execute(f'''INSERT INTO rollups (grain, kind, model, bucket, label, count)
+            SELECT ?, 'alert', COALESCE(r.model, 'live'), {bucket.format(ts="a.timestamp")} AS b, a.event, COUNT(*)
+            FROM alerts a LEFT JOIN runs r ON r.id = a.run_id
+            WHERE a.timestamp IS NOT NULL AND a.event IS NOT NULL
+            GROUP BY COALESCE(r.model, 'live'), b, a.event''', (grain,))
+
+
+def rollup_rows(kind: str, events: Iterable[tuple]) -> list[tuple]:
+    """UPSERT_ROLLUP rows for (epoch_ts, model, label, count) events,
+    pre-summed per grain / bucket so each batch adds to a bucket once."""
+    totals: Counter = Counter()
+    for ts, model, label, count in events:
+        for grain, step in GRAINS.items():
+            totals[grain, model, int(ts // step) * step, label] += count
+    return [(grain, kind, model, bucket, label, n) for (grain, model, bucket, label), n in totals.items() if n]
+
+
+# ─── Read pool ───────────────────────────────────────────────────────────────
+class ReadPool:
+    """A few long-lived read connections, handed out one caller at a time."""
+
+    def __init__(self, size: int = READ_POOL_SIZE, path: Optional[str] = None) -> None:
+        self.path  = path
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._sem  = threading.BoundedSemaphore(max(1, size))
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        with self._sem:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = connect(self.path)
+            try:
+                yield conn
+            finally:
+                conn.rollback()            # end any read transaction before reuse
+                self._idle.put(conn)
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+readers = ReadPool()
+
+
+# ─── Background writer ───────────────────────────────────────────────────────
+class DBWriter:
+    """Single writer thread draining a bounded queue of (sql, rows) batches.
+
+    submit() never blocks: when the queue is full the batch is dropped and
+    counted, so a slow disk degrades persistence rather than scoring latency.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        queue_size: int = WRITER_QUEUE_SIZE,
+        batch_rows: int = WRITER_BATCH_ROWS,
+    ) -> None:
+        self.path       = path
+        self.batch_rows = max(1, batch_rows)
+        self._queue: "queue.Queue[Optional[tuple[str, Sequence[tuple]]]]" = queue.Queue(max(1, queue_size))
+        self._thread: Optional[threading.Thread] = None
+        self._idle   = threading.Condition()
+        self._inflight = 0                   # submitted batches not yet committed
+
+        self.rows_written = 0
+        self.commits      = 0
+        self.dropped_rows = 0
+        self.last_error: Optional[str] = None
+
+    # ── producer side ────────────────────────────────────────
+    def submit(self, sql: str, rows: Sequence[tuple]) -> bool:
+        if not rows:
+            return True
+        with self._idle:
+            self._inflight += 1
+        try:
+            self._queue.put_nowait((sql, rows))
+            return True
+        except queue.Full:
+            with self._idle:
+                self._inflight    -= 1
+                self.dropped_rows += len(rows)
+                self._idle.notify_all()
+            return False
+
+    def add_run(self, run_id: int, model: str, timestamp: str, label: str,
+                total_rows: int, counts: str, summary: str) -> bool:
+        return self.submit(INSERT_RUN, [(run_id, model, timestamp, label, total_rows, counts, summary)])
+
+    def add_results(self, rows: Sequence[tuple]) -> bool:
+        """rows: (run_id, row_id, prediction, label, confidence) tuples."""
+        return self.submit(INSERT_RESULT, rows)
+
+    def add_alerts(self, rows: Sequence[tuple]) -> bool:
+        """rows: (run_id, event, threat_level, confidence, timestamp) tuples."""
+        return self.submit(INSERT_ALERT, rows)
+
+    def add_rollups(self, rows: Sequence[tuple]) -> bool:
+        """rows: from rollup_rows()."""
+        return self.submit(UPSERT_ROLLUP, rows)
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until everything submitted so far is committed."""
+        deadline = time.monotonic() + timeout
+        with self._idle:
+            while self._inflight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    # ── lifecycle ────────────────────────────────────────────
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Commit what is queued, then stop the thread."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self) -> None:
+        conn = connect(self.path)
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    return
+                batch, stop = [item], False
+                rows = len(item[1])
+                # Coalesce whatever else is already queued into one transaction.
+                while rows < self.batch_rows:
+                    try:
+                        nxt = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if nxt is None:
+                        stop = True
+                        break
+                    batch.append(nxt)
+                    rows += len(nxt[1])
+                self._commit(conn, batch)
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    def _commit(self, conn: sqlite3.Connection, batch: list) -> None:
+        try:
+            self._execute(conn, batch)
+        except sqlite3.IntegrityError as exc:
+            if len(batch) == 1:
+                self._dropped(exc, batch)
+            else:
+                # A duplicate key must not take the unrelated writes it was
+                # coalesced with down too: retry them one by one.
+                for item in batch:
+                    try:
+                        self._execute(conn, [item])
+                    except sqlite3.Error as item_exc:
+                        self._dropped(item_exc, [item])
+        except sqlite3.Error as exc:
+            self._dropped(exc, batch)
+        finally:
+            with self._idle:
+                self._inflight -= len(batch)
+                self._idle.notify_all()
+
+    def _execute(self, conn: sqlite3.Connection, batch: list) -> None:
+        grouped: dict[str, list] = {}
+        for sql, rows in batch:
+            grouped.setdefault(sql, []).extend(rows)
+        with conn:                                      # one transaction
+            for sql, rows in grouped.items():
+                conn.executemany(sql, rows)
+        self.rows_written += sum(len(r) for r in grouped.values())
+        self.commits      += 1
+
+    def _dropped(self, exc: sqlite3.Error, batch: list) -> None:
+        self.last_error    = f"{type(exc).__name__}: {exc}"
+        self.dropped_rows += sum(len(rows) for _, rows in batch)
+        log.warning(f"DB writer: {self.last_error}")
+
+    def stats(self) -> dict:
+        return {
+            "running":      self._thread is not None and self._thread.is_alive(),
+            "queue_depth":  self._queue.qsize(),
+            "rows_written": self.rows_written,
+            "commits":      self.commits,
+            "dropped_rows": self.dropped_rows,
+            "last_error":   self.last_error,
+        }
+
+
+writer = DBWriter()
+
+
+# ─── Queries ─────────────────────────────────────────────────────────────────
+RUN_COLUMNS = "id, model, timestamp, label, total_rows, counts"
+
+
+def list_runs(
+    limit: int,
+    before: Optional[int] = None,
+    model: Optional[str] = None,
+    label: Optional[str] = None,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    with_summary: bool = False,
+) -> tuple[list[dict], Optional[int]]:
+    """Newest-first page of runs strictly older than run id `before`.
+
+    Returns (runs, next_cursor); next_cursor is None on the last page. The
+    time range maps onto run-id bounds, so every filter is an index range.
+    """
+    where, args = ["id < ?"], [before if before is not None else 1 << 62]
+    if since is not None:
+        where.append("id >= ?")
+        args.append(run_id_at(since))
+    if until is not None:
+        where.append("id < ?")
+        args.append(run_id_at(until))
+    if model:
+        where.append("model = ?")
+        args.append(model)
+    if label:
+        where.append("label = ?")
+        args.append(label)
+    cols = RUN_COLUMNS + (", summary" if with_summary else "")
+    sql  = f"SELECT {cols} FROM runs WHERE {' AND '.join(where)} ORDER BY id DESC LIMIT ?"
+    with readers.connection() as conn:
+        rows = conn.execute(sql, [*args, limit + 1]).fetchall()
+    page = [_run_dict(r) for r in rows[:limit]]
+    return page, (page[-1]["run_id"] if len(rows) > limit else None)
+
+
+def get_run(run_id: int) -> Optional[dict]:
+    with readers.connection() as conn:
+        row = conn.execute(f"SELECT {RUN_COLUMNS}, summary FROM runs WHERE id = ?", (run_id,)).fetchone()
+    return _run_dict(row) if row else None
+
+
+def run_results(run_id: int, after: int, limit: int) -> tuple[list[dict], Optional[int]]:
+    """Rows of one run with row_id > `after`, by primary key."""
+    with readers.connection() as conn:
+        rows = conn.execute(
+            "SELECT row_id, prediction, label, confidence FROM results "
+            "WHERE run_id = ? AND row_id > ? ORDER BY row_id LIMIT ?",
+            (run_id, after, limit + 1),
+        ).fetchall()
+    page = [dict(r) for r in rows[:limit]]
+    return page, (page[-1]["row_id"] if len(rows) > limit else None)
+
+
+def _run_dict(row: sqlite3.Row) -> dict:
+    out = {
+        "run_id":     row["id"],
+        "model":      row["model"],
+        "timestamp":  row["timestamp"],
+        "label":      row["label"],
+        "total_rows": row["total_rows"],
+        "counts":     json.loads(row["counts"]) if row["counts"] else None,
+    }
+    if "summary" in row.keys():
+        out["summary"] = json.loads(row["summary"]) if row["summary"] else None
+    return out
+
+
+def chart_series(
+    grain: str,
+    kind: str = "detection",
+    model: Optional[str] = None,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+) -> list[tuple[int, str, int]]:
+    """(bucket, label, count) rollup rows in [since, until), by bucket.
+    With model=None counts are summed over all models."""
+    where, args = ["grain = ?", "kind = ?"], [grain, kind]
+    if model:
+        where.append("model = ?")
+        args.append(model)
+    if since is not None:
+        where.append("bucket >= ?")
+        args.append(int(since // GRAINS[grain]) * GRAINS[grain])
+    if until is not None:
+        where.append("bucket < ?")
+        args.append(until)
+    sql = (f"SELECT bucket, label, SUM(count) FROM rollups WHERE {' AND '.join(where)} "
+           "GROUP BY bucket, label ORDER BY bucket")
+    with readers.connection() as conn:
+        cur = conn.cursor()
+        cur.row_factory = None   # plain tuples
+        return cur.execute(sql, args).fetchall()
@@ -0,0 +1,103 @@
+"""
+Feature vectorizer — schema frozen at training time.
+
+FeatureVectorizer.fit() records the numeric feature columns, the protocol
+vocabulary and the training-set medians once. transform() then writes a
+contiguous float32 matrix in `feature_cols` order straight from the input
+columns, so a single-row request and a large batch are filled identically.
+"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_numeric_dtype
+
+NON_FEATURE_COLUMNS = {"timestamp", "label", "src_ip", "dst_ip",
+                       "class", "attack_type", "target", "category"}
+
+PROTOCOL_COLUMN = "protocol"
+PROTOCOL_PREFIX = "proto_"
+
+NO_FEATURES_MSG = (
+    "CSV contains no usable numeric features after preprocessing. "
+    "Ensure it has columns like: packets, bytes, duration_ms, src_port, dst_port, protocol, flag_syn …"
+)
+
+
+class FeatureVectorizer:
+    def __init__(
+        self,
+        numeric_cols: list[str],
+        protocols: list[str],
+        medians: np.ndarray,
+    ) -> None:
+        self.numeric_cols = list(numeric_cols)
+        self.protocols    = list(protocols)
+        self.medians      = np.asarray(medians, dtype=np.float32)
+        self.feature_cols = self.numeric_cols + [PROTOCOL_PREFIX + p for p in self.protocols]
+        self._proto_index = {p: i for i, p in enumerate(self.protocols)}
+
+    @classmethod
+    def fit(cls, df: pd.DataFrame) -> "FeatureVectorizer":
+        """Freeze the schema of a training frame."""
+        numeric = [
+            c for c in df.columns
+            if c != PROTOCOL_COLUMN
+            and c.lower() not in NON_FEATURE_COLUMNS
+            and is_numeric_dtype(df[c]) and not is_bool_dtype(df[c])
+        ]
+        if not numeric and PROTOCOL_COLUMN not in df.columns:
+            raise ValueError(NO_FEATURES_MSG)
+
+        medians = df[numeric].median().fillna(0.0).to_numpy() if numeric else np.zeros(0)
+        protocols: list[str] = []
+        if PROTOCOL_COLUMN in df.columns:
+            protocols = sorted(df[PROTOCOL_COLUMN].dropna().astype(str).str.upper().unique())
+        return cls(numeric, protocols, medians)
+
+    def has_features(self, columns) -> bool:
+        """True if `columns` holds at least one feature transform() can use."""
+        if self.protocols and PROTOCOL_COLUMN in columns:
+            return True
+        return any(c in columns for c in self.numeric_cols)
+
+    def transform(self, df: pd.DataFrame) -> np.ndarray:
+        """Return an (n_rows, n_features) C-contiguous float32 matrix.
+
+        Missing columns and NaNs take the training median; unknown protocols
+        leave every proto_* column at 0.
+        """
+        n_num = len(self.numeric_cols)
+        has_proto = PROTOCOL_COLUMN in df.columns and bool(self.protocols)
+        if not self.has_features(df.columns):
+            raise ValueError(NO_FEATURES_MSG)
+
+        out = np.empty((len(df), len(self.feature_cols)), dtype=np.float32)
+
+        for j, col in enumerate(self.numeric_cols):
+            if col not in df.columns:
+                out[:, j] = self.medians[j]
+                continue
+            values = df[col]
+            if not is_numeric_dtype(values):
+                values = pd.to_numeric(values, errors="coerce")
+            out[:, j] = values.to_numpy(dtype=np.float32, na_value=np.nan)
+
+        if n_num:
+            block = out[:, :n_num]
+            nan   = np.isnan(block)
+            if nan.any():
+                block[nan] = np.broadcast_to(self.medians, block.shape)[nan]
+
+        out[:, n_num:] = 0.0
+        if has_proto:
+            codes, uniques = pd.factorize(df[PROTOCOL_COLUMN])
+            lut = np.array(
+                [self._proto_index.get(str(u).upper(), -1) for u in uniques] + [-1],
+                dtype=np.intp,
+            )
+            idx  = lut[codes]          # code -1 (NaN) hits the trailing -1
+            rows = np.flatnonzero(idx >= 0)
+            out[rows, n_num + idx[rows]] = 1.0
+
+        return out
@@ -0,0 +1,390 @@
+"""
+Flow graph — incremental in-memory graph of hosts (nodes) and directed
+host pairs (edges), behind /api/network/graph and /api/network/node/{id}.
+
+Feeds (scored uploads, Zeek ingest, live connections) never hand raw rows
+to the graph. They call aggregate() on a frame of flows, which groups it
+with pandas into a compact FlowBatch:
+
+  • edges:  flows / bytes / threat rows per (src, dst, time bucket)
+  • nodes:  per-host totals, so apply() touches each host once
+  • ports:  flow counts per (dst host, dst port)
+  • alerts: the newest threat rows per host
+
+aggregate() is pure, so it can run on the inference executor next to
+scoring. Only the small batch comes back to be applied under the graph
+lock. Queries read these counters and never rescan raw data:
+a `from`/`to` window sums the edge buckets that overlap it.
+
+Memory stays bounded: nodes are kept in least-recently-updated order and
+the oldest are evicted once there are more than `max_nodes` or when
+they have not been updated for `idle_seconds`, together with their edges.
+Each edge keeps at most `max_buckets` buckets, and each node keeps a
+capped port counter and alert list.
+"""
+from __future__ import annotations
+
+import gc
+import heapq
+import os
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+BUCKET_SECONDS = int(os.getenv("FLOW_GRAPH_BUCKET_SECONDS", "60"))
+MAX_BUCKETS    = int(os.getenv("FLOW_GRAPH_MAX_BUCKETS", "1440"))     # per edge: 24 h of 1-min buckets
+MAX_NODES      = int(os.getenv("FLOW_GRAPH_MAX_NODES", "50000"))
+IDLE_SECONDS   = float(os.getenv("FLOW_GRAPH_IDLE_SECONDS", "3600"))
+
+ALERTS_PER_NODE = 10
+PORTS_PER_NODE  = 1024   # a port counter above this is pruned to its top half
+
+
+@dataclass
+class FlowBatch:
+    """Aggregated flows, ready for FlowGraph.apply(). Plain tuples so it
+    pickles cheaply back from a worker process."""
+    edges:  list = field(default_factory=list)   # (src, dst, bucket, flows, bytes, threats)
+    nodes:  list = field(default_factory=list)   # (ip, flows_out, flows_in, bytes_out, bytes_in, threats, first, last)
+    ports:  list = field(default_factory=list)   # (dst, port, flows)
+    alerts: list = field(default_factory=list)   # (host, ts, type, peer, port)
+    source: str  = ""
+
+    def __bool__(self) -> bool:
+        return bool(self.edges)
+
+
+def _epoch(values: pd.Series, default: float) -> np.ndarray:
+    """Timestamps (epoch numbers or date strings) → float epoch seconds."""
+    if pd.api.types.is_numeric_dtype(values):
+        ts = values.to_numpy(dtype=np.float64)
+    else:
+        parsed = pd.to_datetime(values, errors="coerce")
+        ts     = parsed.to_numpy(dtype="datetime64[ns]").astype(np.int64) / 1e9
+        ts[parsed.isna().to_numpy()] = np.nan
+    return np.where(np.isnan(ts), default, ts)
+
+
+def aggregate(
+    df: pd.DataFrame,
+    threat: Optional[np.ndarray] = None,
+    source: str = "",
+    step: int = BUCKET_SECONDS,
+) -> FlowBatch:
+    """Group flow rows (src_ip, dst_ip, optional dst_port / bytes / timestamp)
+    into a FlowBatch. `threat` holds a label per row, or None / "" for benign.
+    Returns an empty batch if the frame has no host columns."""
+    if "src_ip" not in df.columns or "dst_ip" not in df.columns or not len(df):
+        return FlowBatch(source=source)
+
+    n     = len(df)
+    now   = time.time()
+    ts    = _epoch(df["timestamp"], now) if "timestamp" in df.columns else np.full(n, now)
+    nbyte = pd.to_numeric(df["bytes"], errors="coerce").fillna(0).to_numpy() if "bytes" in df.columns else np.zeros(n)
+    port  = pd.to_numeric(df["dst_port"], errors="coerce").to_numpy() if "dst_port" in df.columns else np.full(n, np.nan)
+    bad   = np.zeros(n, dtype=bool) if threat is None else pd.notna(threat) & (np.asarray(threat, dtype=object) != "")
+
+    flows = pd.DataFrame({
+        "src":    df["src_ip"].astype(str).to_numpy(),
+        "dst":    df["dst_ip"].astype(str).to_numpy(),
+        "bucket": (ts // step).astype(np.int64),
+        "bytes":  nbyte,
+        "threat": bad.astype(np.int64),
+        "port":   port,
+    })
+
+    edges = flows.groupby(["src", "dst", "bucket"], sort=False).agg(
+        flows=("bytes", "size"), bytes=("bytes", "sum"), threats=("threat", "sum"),
+    ).reset_index()
+    ports = flows.dropna(subset=["port"]).groupby(["dst", "port"], sort=False).size().reset_index()
+
+    out = edges.groupby("src", sort=False).agg(flows=("flows", "sum"), bytes=("bytes", "sum"),
+                                               threats=("threats", "sum"), first=("bucket", "min"),
+                                               last=("bucket", "max"))
+    inc = edges.groupby("dst", sort=False).agg(flows=("flows", "sum"), bytes=("bytes", "sum"),
+                                               threats=("threats", "sum"), first=("bucket", "min"),
+                                               last=("bucket", "max"))
+    hosts = out.join(inc, how="outer", lsuffix="_out", rsuffix="_in").fillna(
+        {"flows_out": 0, "flows_in": 0, "bytes_out": 0.0, "bytes_in": 0.0, "threats_out": 0, "threats_in": 0}
+    )
+    first = hosts[["first_out", "first_in"]].min(axis=1) * step
+    last  = (hosts[["last_out", "last_in"]].max(axis=1) + 1) * step
+    # a self-loop counts its threat rows once
+    threats = hosts["threats_out"] + hosts["threats_in"]
+    loops   = edges[edges["src"] == edges["dst"]].groupby("src")["threats"].sum()
+    threats = threats.sub(loops.reindex(hosts.index, fill_value=0))
+
+    alerts = []
+    hits   = np.flatnonzero(bad)
+    if len(hits):
+        # newest ALERTS_PER_NODE threat rows per destination host, recorded on both ends
+        order  = hits[np.argsort(ts[hits], kind="stable")]
+        dst    = flows["dst"].to_numpy()
+        tail   = pd.Series(order).groupby(dst[order]).tail(ALERTS_PER_NODE).to_numpy()
+        src    = flows["src"].to_numpy()[tail].tolist()
+        labels = np.asarray(threat, dtype=object)[tail].astype(str).tolist()
+        ports_ = [None if np.isnan(p) else int(p) for p in port[tail].tolist()]
+        for s, d, t, l, p in zip(src, dst[tail].tolist(), ts[tail].tolist(), labels, ports_):
+            alerts.append((d, t, l, s, p))
+            alerts.append((s, t, l, d, p))
+
+    return FlowBatch(
+        edges  = list(zip(edges["src"].tolist(), edges["dst"].tolist(), edges["bucket"].tolist(),
+                          edges["flows"].tolist(), edges["bytes"].astype(float).tolist(),
+                          edges["threats"].tolist())),
+        nodes  = list(zip(hosts.index.tolist(), hosts["flows_out"].astype(int).tolist(),
+                          hosts["flows_in"].astype(int).tolist(), hosts["bytes_out"].astype(float).tolist(),
+                          hosts["bytes_in"].astype(float).tolist(), threats.astype(int).tolist(),
+                          first.tolist(), last.tolist())),
+        ports  = list(zip(ports["dst"].tolist(), ports["port"].astype(int).tolist(), ports[0].tolist())),
+        alerts = alerts,
+        source = source,
+    )
+
+
+class Node:
+    __slots__ = ("id", "ip", "first_seen", "last_seen", "touched", "flows_out", "flows_in",
+                 "bytes_out", "bytes_in", "threats", "ports", "alerts", "edges", "sources")
+
+    def __init__(self, node_id: int, ip: str, now: float) -> None:
+        self.id         = node_id
+        self.ip         = ip
+        self.first_seen = None      # flow time (epoch) of the earliest/latest flow
+        self.last_seen  = None
+        self.touched    = now       # wall clock of the last update (drives eviction)
+        self.flows_out  = self.flows_in = 0
+        self.bytes_out  = self.bytes_in = 0.0
+        self.threats    = 0
+        self.ports: Counter = Counter()
+        self.alerts: deque  = deque(maxlen=ALERTS_PER_NODE)
+        self.edges: set     = set()
+        self.sources: set   = set()
+
+    def seen(self, first: float, last: float) -> None:
+        self.first_seen = first if self.first_seen is None else min(self.first_seen, first)
+        self.last_seen  = last if self.last_seen is None else max(self.last_seen, last)
+
+    def to_dict(self) -> dict:
+        return {
+            "id":         self.id,
+            "ip":         self.ip,
+            "flows_out":  self.flows_out,
+            "flows_in":   self.flows_in,
+            "bytes_out":  self.bytes_out,
+            "bytes_in":   self.bytes_in,
+            "threats":    self.threats,
+            "degree":     len(self.edges),
+            "first_seen": self.first_seen,
+            "last_seen":  self.last_seen,
+            "sources":    sorted(self.sources),
+        }
+
+
+class FlowGraph:
+    """Thread-safe incremental host graph; see module docstring."""
+
+    def __init__(
+        self,
+        step: int = BUCKET_SECONDS,
+        max_buckets: int = MAX_BUCKETS,
+        max_nodes: int = MAX_NODES,
+        idle_seconds: float = IDLE_SECONDS,
+    ) -> None:
+        self.step         = step
+        self.max_buckets  = max_buckets
+        self.max_nodes    = max_nodes
+        self.idle_seconds = idle_seconds
+
+        self._nodes: OrderedDict[str, Node] = OrderedDict()   # ip → node, least recently touched first
+        self._by_id: dict[int, Node]        = {}
+        self._edges: dict[tuple, dict]      = {}               # (src ip, dst ip) → {bucket: (flows, bytes, threats)}
+        self._lock   = threading.Lock()
+        self._next_id = 1
+
+        self.batches = 0
+        self.evicted = 0
+
+    # ── writes ───────────────────────────────────────────────
+    def apply(self, batch: FlowBatch) -> None:
+        if not batch:
+            return
+        # A large batch allocates tens of thousands of small containers; left
+        # on, the cyclic GC re-traverses the whole heap several times per batch
+        # and triples its cost. Nothing here creates reference cycles.
+        paused = gc.isenabled()
+        gc.disable()
+        try:
+            self._apply(batch)
+        finally:
+            if paused:
+                gc.enable()
+
+    def _apply(self, batch: FlowBatch) -> None:
+        now = time.time()
+        with self._lock:
+            nodes = self._nodes
+            for ip, f_out, f_in, b_out, b_in, threats, first, last in batch.nodes:
+                node = self._node(ip, now, batch.source)
+                node.flows_out += f_out
+                node.flows_in  += f_in
+                node.bytes_out += b_out
+                node.bytes_in  += b_in
+                node.threats   += threats
+                node.seen(first, last)
+
+            edges = self._edges
+            for src, dst, bucket, flows, nbytes, threats in batch.edges:
+                key     = (src, dst)
+                buckets = edges.get(key)
+                if buckets is None:
+                    buckets = edges[key] = {}
+                    nodes[src].edges.add(key)
+                    nodes[dst].edges.add(key)
+                counts = buckets.get(bucket)
+                if counts is None:
+                    buckets[bucket] = (flows, nbytes, threats)
+                    if len(buckets) > self.max_buckets:
+                        del buckets[min(buckets)]
+                else:
+                    buckets[bucket] = (counts[0] + flows, counts[1] + nbytes, counts[2] + threats)
+
+            for dst, port, flows in batch.ports:
+                node = self._nodes.get(dst)
+                if node is None:
+                    continue
+                node.ports[port] += flows
+                if len(node.ports) > PORTS_PER_NODE:
+                    node.ports = Counter(dict(node.ports.most_common(PORTS_PER_NODE // 2)))
+
+            for host, ts, label, peer, port in sorted(batch.alerts, key=lambda a: a[1]):
+                node = self._nodes.get(host)
+                if node is not None:
+                    node.alerts.append({"ts": ts, "type": label, "peer": peer, "port": port,
+                                        "source": batch.source})
+
+            self.batches += 1
+            self._evict(now)
+
+    def _node(self, ip: str, now: float, source: str) -> Node:
+        node = self._nodes.get(ip)
+        if node is None:
+            node = self._nodes[ip] = Node(self._next_id, ip, now)
+            self._by_id[node.id] = node
+            self._next_id += 1
+        else:
+            self._nodes.move_to_end(ip)
+            node.touched = now
+        if source:
+            node.sources.add(source)
+        return node
+
+    def _evict(self, now: float) -> None:
+        cutoff = now - self.idle_seconds
+        while self._nodes:
+            ip, node = next(iter(self._nodes.items()))
+            if len(self._nodes) <= self.max_nodes and node.touched >= cutoff:
+                break
+            self._drop(ip, node)
+
+    def _drop(self, ip: str, node: Node) -> None:
+        del self._nodes[ip]
+        del self._by_id[node.id]
+        for key in node.edges:
+            if self._edges.pop(key, None) is not None:
+                other = self._nodes.get(key[1] if key[0] == ip else key[0])
+                if other is not None:
+                    other.edges.discard(key)
+        self.evicted += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._nodes.clear()
+            self._by_id.clear()
+            self._edges.clear()
+
+    # ── reads ────────────────────────────────────────────────
+    def _range(self, since: Optional[float], until: Optional[float]) -> tuple[float, float]:
+        lo = -np.inf if since is None else since // self.step
+        hi = np.inf if until is None else -(-until // self.step)   # exclusive, rounded up
+        return lo, hi
+
+    def _edge_totals(self, buckets: dict, lo: float, hi: float) -> Optional[tuple]:
+        if lo == -np.inf and hi == np.inf:
+            counts = buckets.values()
+        else:
+            counts = [c for bucket, c in buckets.items() if lo <= bucket < hi]
+            if not counts:
+                return None
+        if len(counts) == 1:
+            return next(iter(counts))
+        flows, nbytes, threats = zip(*counts)
+        return sum(flows), sum(nbytes), sum(threats)
+
+    def graph(self, since: Optional[float] = None, until: Optional[float] = None, limit: int = 500) -> dict:
+        """Nodes and edges with traffic in [since, until), the `limit`
+        heaviest edges (threat rows first, then flows)."""
+        lo, hi = self._range(since, until)
+        with self._lock:
+            edges = []
+            for (src, dst), buckets in self._edges.items():
+                totals = self._edge_totals(buckets, lo, hi)
+                if totals is not None:
+                    edges.append((src, dst, *totals))
+            truncated = len(edges) > limit
+            edges = heapq.nlargest(limit, edges, key=lambda e: (e[4], e[2]))
+            ips   = {ip for e in edges for ip in e[:2]}
+            nodes = [self._nodes[ip].to_dict() for ip in ips]
+            ids   = {ip: self._nodes[ip].id for ip in ips}
+        return {
+            "nodes": sorted(nodes, key=lambda n: n["id"]),
+            "edges": [
+                {"source": ids[s], "target": ids[d], "src_ip": s, "dst_ip": d,
+                 "flows": f, "bytes": b, "threats": t}
+                for s, d, f, b, t in edges
+            ],
+            "truncated": truncated,
+            "bucket_seconds": self.step,
+        }
+
+    def node(self, node_id: int, since: Optional[float] = None, until: Optional[float] = None,
+             top: int = 10) -> Optional[dict]:
+        """One host: totals, top destination ports, last alerts and busiest peers
+        in [since, until). None if unknown or evicted."""
+        lo, hi = self._range(since, until)
+        with self._lock:
+            node = self._by_id.get(node_id)
+            if node is None:
+                return None
+            peers = []
+            for key in node.edges:
+                totals = self._edge_totals(self._edges[key], lo, hi)
+                if totals is not None:
+                    peer = key[1] if key[0] == node.ip else key[0]
+                    peers.append({"ip": peer, "id": self._nodes[peer].id,
+                                  "direction": "out" if key[0] == node.ip else "in",
+                                  "flows": totals[0], "bytes": totals[1], "threats": totals[2]})
+            peers.sort(key=lambda p: (p["threats"], p["flows"]), reverse=True)
+            return {
+                **node.to_dict(),
+                "top_ports":   [{"port": p, "flows": c} for p, c in node.ports.most_common(top)],
+                "last_alerts": list(reversed(node.alerts)),
+                "peers":       peers[:top],
+            }
+
+    def stats(self) -> dict:
+        return {
+            "nodes":          len(self._nodes),
+            "edges":          len(self._edges),
+            "batches":        self.batches,
+            "evicted_nodes":  self.evicted,
+            "max_nodes":      self.max_nodes,
+            "bucket_seconds": self.step,
+        }
+
+
+graph = FlowGraph()
@@ -0,0 +1,241 @@
+"""
+Inference executor — keeps CPU-bound scoring off the event loop.
+
+Async endpoints submit jobs with `await executor.run(model, fn, *args)`. Jobs
+run on a thread or process pool (INFERENCE_EXECUTOR=thread|process) behind a
+bounded queue (INFERENCE_QUEUE_SIZE; a full queue answers 503) and a
+per-model concurrency limit (INFERENCE_MODEL_CONCURRENCY).
+
+`explain_executor` is a second instance (EXPLAIN_* variables, process mode by
+default) for batch explanation jobs.
+
+Jobs look models up with `worker_state(name)`: in thread mode that is the
+registry version pinned by the submitting request (jobs run in a copy of
+its context), in process mode each worker loads the model bundle from
+MODELS_DIR once at start-up, so no model is pickled per call. reload()
+starts process workers for a newly published model version; the previous
+pool keeps serving requests pinned to its version until release().
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import types
+from collections import defaultdict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable
+
+from fastapi import HTTPException
+
+import ml_infer
+import model_registry
+import model_store
+import tree_compiler
+
+log = logging.getLogger("cyber-ids")
+
+# ─── Worker-side model lookup ────────────────────────────────────────────────
+_worker_states: dict[str, Any] | None = None   # set only inside process workers
+
+
+def _init_worker(directory: str, key: str, names: list[str], compiled: list[str]) -> None:
+    """Process-pool initializer: load the model bundle once per worker.
+    Only the models in `compiled` (verified against sklearn by the parent
+    process) are served from compiled tree evaluators."""
+    global _worker_states
+    states = {n: types.SimpleNamespace(trained=False) for n in names}
+    if not model_store.load_bundle(Path(directory), states, key):
+        raise RuntimeError(f"Model bundle not found in {directory}")
+    for name, state in states.items():
+        state.compiled = None
+        if name in compiled:
+            tree_compiler.attach(state, name)
+        ml_infer.attach(state, name, Path(directory).parent)
+    _worker_states = states
+
+
+def worker_state(name: str):
+    """ModelState for `name` as seen by the current job."""
+    if _worker_states is not None:
+        return _worker_states[name]
+    from main import _registry
+    return _registry[name]
+
+
+# ─── Executor ────────────────────────────────────────────────────────────────
+# (directory, key, model names, names with a verified compiled evaluator)
+Bundle = tuple[Path, str, list[str], list[str]]
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name, "")
+    return int(value) if value.strip().isdigit() else default
+
+
+class InferenceExecutor:
+    def __init__(
+        self,
+        kind: str = "thread",
+        workers: int | None = None,
+        queue_size: int = 64,
+        model_concurrency: int = 2,
+    ) -> None:
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown executor kind {kind!r} (thread | process)")
+        self.kind              = kind
+        self.workers           = max(1, workers or os.cpu_count() or 1)
+        self.queue_size        = max(1, queue_size)
+        self.model_concurrency = max(1, model_concurrency)
+
+        self._pool: Executor | None = None
+        self._version: int | None = None             # model version `_pool` serves
+        self._retired: dict[int, Executor] = {}      # older versions' pools, see release()
+        self._limits: dict[str, asyncio.Semaphore] = {}
+        # Counters are only touched from the event loop thread.
+        self._pending   = 0
+        self._running: dict[str, int] = defaultdict(int)
+        self._completed = 0
+        self._rejected  = 0
+
+    @classmethod
+    def from_env(cls, prefix: str = "INFERENCE", kind: str = "thread",
+                 model_concurrency: int = 2) -> "InferenceExecutor":
+        """Build from <prefix>_EXECUTOR / _WORKERS / _QUEUE_SIZE / _MODEL_CONCURRENCY."""
+        return cls(
+            kind              = os.getenv(f"{prefix}_EXECUTOR", kind).strip().lower(),
+            workers           = _env_int(f"{prefix}_WORKERS", 0) or None,
+            queue_size        = _env_int(f"{prefix}_QUEUE_SIZE", 64),
+            model_concurrency = _env_int(f"{prefix}_MODEL_CONCURRENCY", model_concurrency),
+        )
+
+    # ── lifecycle ────────────────────────────────────────────
+    def start(self, bundle: Bundle | None = None, version: int | None = None) -> None:
+        """Create the pool for model `version`. Process mode needs a saved
+        `bundle` (see Bundle) and falls back to threads when it is unavailable.
+        A previous pool is retired only once the new one exists. In process
+        mode it is kept for requests pinned to its version until release();
+        otherwise it is shut down, and its queued jobs still run."""
+        pool = self._make_pool(bundle)
+        retired, retired_version = self._pool, self._version
+        self._pool, self._version = pool, version
+        self._limits = {}   # semaphores bind to the running event loop
+        if retired is None:
+            return
+        if self.kind == "process" and retired_version is not None and retired_version != version:
+            self._retired[retired_version] = retired
+        else:
+            retired.shutdown(wait=False)
+
+    def reload(self, bundle: Bundle | None, version: int | None = None) -> None:
+        """Load a newly published model bundle. Only process workers hold
+        their own model copies; thread pools read the registry directly."""
+        if self.kind == "process":
+            self.start(bundle, version)
+
+    def release(self, version: int) -> None:
+        """Shut down the retired pool of `version` once no request pins it."""
+        pool = self._retired.pop(version, None)
+        if pool is not None:
+            pool.shutdown(wait=False)
+            log.info(f"Inference executor: retired pool for model version {version} shut down")
+
+    def _make_pool(self, bundle) -> Executor:
+        if self.kind == "process" and bundle is not None:
+            directory, key, names, compiled = bundle
+            try:
+                pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    initializer=_init_worker,
+                    initargs=(str(directory), key, list(names), list(compiled)),
+                )
+                log.info(f"Inference executor: {self.workers} processes")
+                return pool
+            except (OSError, RuntimeError) as exc:
+                log.warning(f"Process executor unavailable ({exc}); using threads")
+        elif self.kind == "process":
+            log.warning("Process executor needs a saved model bundle; using threads")
+        log.info(f"Inference executor: {self.workers} threads")
+        return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+
+    def shutdown(self) -> None:
+        for pool in [self._pool, *self._retired.values()]:
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._pool, self._version = None, None
+        self._retired = {}
+
+    def _pool_for_request(self) -> Executor:
+        """The retired pool of the pinned model version, if it has one, else
+        the current pool."""
+        version = model_registry.pinned.get()
+        if version is not None and self._retired:
+            pool = self._retired.get(version.version)
+            if pool is not None:
+                return pool
+        return self._pool
+
+    # ── submission ───────────────────────────────────────────
+    async def run(self, model: str, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run `fn(*args)` on the pool under `model`'s concurrency limit.
+
+        Raises HTTPException(503) when INFERENCE_QUEUE_SIZE jobs are already
+        queued or running.
+        """
+        if self._pool is None:
+            self.start()
+        if self._pending >= self.queue_size:
+            self._rejected += 1
+            raise HTTPException(503, "Inference queue is full — please retry shortly.")
+
+        limit = self._limits.get(model)
+        if limit is None:
+            limit = self._limits[model] = asyncio.Semaphore(self.model_concurrency)
+
+        self._pending += 1
+        try:
+            async with limit:
+                self._running[model] += 1
+                try:
+                    loop = asyncio.get_running_loop()
+                    pool = self._pool_for_request()
+                    if isinstance(pool, ThreadPoolExecutor):   # keep the request's model version
+                        return await loop.run_in_executor(
+                            pool, functools.partial(contextvars.copy_context().run, fn, *args)
+                        )
+                    return await loop.run_in_executor(pool, fn, *args)
+                finally:
+                    self._running[model] -= 1
+                    self._completed += 1
+        finally:
+            self._pending -= 1
+
+    # ── reporting ────────────────────────────────────────────
+    def stats(self) -> dict:
+        running = sum(self._running.values())
+        return {
+            "kind":              "process" if isinstance(self._pool, ProcessPoolExecutor) else "thread",
+            "workers":           self.workers,
+            "model_version":     self._version,
+            "retired_versions":  sorted(self._retired),
+            "queue_size":        self.queue_size,
+            "queue_depth":       self._pending - running,
+            "running":           running,
+            "model_concurrency": self.model_concurrency,
+            "running_by_model":  {k: v for k, v in self._running.items() if v},
+            "completed":         self._completed,
+            "rejected":          self._rejected,
+        }
+
+
+executor = InferenceExecutor.from_env()
+
+# Batch explanations are long CPU-bound jobs: by default they get their own
+# process pool, so they neither hold the GIL against the event loop nor
+# queue ahead of latency-sensitive scoring.
+explain_executor = InferenceExecutor.from_env(
+    "EXPLAIN", kind="process", model_concurrency=os.cpu_count() or 1
+)
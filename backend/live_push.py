@@ -0,0 +1,130 @@
+"""
+Live push — Server-Sent Events fan-out for the live dashboard.
+
+Producers (the network sampler thread, alert sources) call
+`broadcaster.publish(event, data)`. The event is JSON-encoded once, in the
+producer's thread, and the same bytes are handed to every subscriber's
+bounded queue on the event loop, so the cost of a tick is one encode plus
+one queue put per subscriber, whatever the number of open dashboards.
+
+A subscriber whose queue is full (it is not reading fast enough) is
+disconnected rather than buffered without limit; the browser's EventSource
+reconnects on its own and receives a fresh full state.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import threading
+from typing import AsyncIterator, Callable, Iterable, Optional
+
+QUEUE_SIZE = int(os.getenv("LIVE_PUSH_QUEUE_SIZE", "64"))
+KEEPALIVE  = float(os.getenv("LIVE_PUSH_KEEPALIVE", "15"))
+
+_CLOSE = None   # sentinel queued to end a dropped subscriber's stream
+
+
+def encode(event: str, data, event_id: Optional[int] = None) -> bytes:
+    """One SSE message."""
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    body = json.dumps(data, separators=(",", ":"), default=str)
+    return f"{head}event: {event}\ndata: {body}\n\n".encode()
+
+
+class Broadcaster:
+    """Fan encoded SSE messages out to per-subscriber bounded queues."""
+
+    def __init__(self, queue_size: int = QUEUE_SIZE, keepalive: float = KEEPALIVE) -> None:
+        self.queue_size = queue_size
+        self.keepalive  = keepalive
+        self._subs: set[asyncio.Queue] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+        self._seq  = 0
+
+        self.published  = 0
+        self.delivered  = 0
+        self.dropped    = 0   # subscribers disconnected for falling behind
+        self.subscribed = 0
+
+    # ── producers (any thread) ───────────────────────────────
+    def publish(self, event: str, data) -> None:
+        if not self._subs or self._loop is None:
+            return
+        with self._lock:
+            self._seq += 1
+            message = encode(event, data, self._seq)
+        self.published += 1
+        try:
+            self._loop.call_soon_threadsafe(self._fanout, message)
+        except RuntimeError:   # loop closed during shutdown
+            pass
+
+    def _fanout(self, message: bytes) -> None:
+        for q in list(self._subs):
+            try:
+                q.put_nowait(message)
+                self.delivered += 1
+            except asyncio.QueueFull:
+                self._drop(q)
+
+    def _drop(self, q: asyncio.Queue) -> None:
+        self._subs.discard(q)
+        self.dropped += 1
+        while not q.empty():
+            q.get_nowait()
+        q.put_nowait(_CLOSE)
+
+    # ── subscribers (event loop) ─────────────────────────────
+    async def stream(self, initial: Callable[[], Iterable[bytes]] = tuple) -> AsyncIterator[bytes]:
+        """Yield the messages `initial()` returns, then every published message
+        until the client disconnects or is dropped. Sends a comment line as
+        keepalive.
+
+        `initial` runs only after the subscriber is registered, so nothing
+        published while the starting state is built is lost (it is queued and
+        arrives after it)."""
+        self._loop = asyncio.get_running_loop()
+        q: asyncio.Queue = asyncio.Queue(self.queue_size)
+        self._subs.add(q)
+        self.subscribed += 1
+        try:
+            for message in initial():
+                yield message
+            while True:
+                try:
+                    message = await asyncio.wait_for(q.get(), self.keepalive)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                if message is _CLOSE:
+                    break
+                yield message
+        finally:
+            self._subs.discard(q)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subs),
+            "subscribed":  self.subscribed,
+            "published":   self.published,
+            "delivered":   self.delivered,
+            "dropped":     self.dropped,
+            "queue_size":  self.queue_size,
+        }
+
+
+def diff_rows(prev: dict, rows: Iterable[dict], key) -> tuple[dict, dict, list]:
+    """Compare keyed rows against the previous tick.
+
+    Returns (current mapping, upserted {key: row}, removed keys): a row is
+    upserted when it is new or any of its fields changed.
+    """
+    current  = {key(r): r for r in rows}
+    upserted = {k: r for k, r in current.items() if prev.get(k) != r}
+    removed  = [k for k in prev if k not in current]
+    return current, upserted, removed
+
+
+broadcaster = Broadcaster()
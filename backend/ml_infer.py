@@ -1,6 +1,285 @@
+"""
+ML inference sessions — CPU serving of exported TorchScript / ONNX models.
+
+open_session() loads a `.pt` (TorchScript) or `.onnx` (ONNX Runtime) file
+once and returns an InferenceSession that:
+
+  • configures the runtime's intra-op / inter-op thread pools
+    (ML_INFER_INTRA_THREADS / ML_INFER_INTER_THREADS, 0 = runtime default);
+  • runs ML_INFER_WARMUP_RUNS forward passes at load time, so the first
+    request does not pay for graph optimisation and allocator warm-up;
+  • takes the input as a C-contiguous float32 array without copying it
+    when it already is one (torch.from_numpy / ORT CPU input binding);
+  • avoids output copies: ONNX Runtime binds its output to a preallocated
+    per-thread buffer that only grows, TorchScript results are read
+    through the output tensor's own memory, and the softmax is computed in
+    place in the single float64 result array handed back to the caller.
+
+attach() plugs a session into one of the cnn / lstm / hybrid registry
+slots when an exported model file exists in MODELS_DIR: the slot keeps its
+scaler, vectorizer and label encoder, and `state.clf` becomes a
+SessionClassifier, so every path that calls tree_compiler.predict_proba
+serves the exported model. The slot's cross-validated evaluation described
+the sklearn model and is dropped, and the exported model has no per-row
+attributions (see backend_of()). The model must take the scaled feature matrix
+(n_rows, n_features) and return one logit or probability per label encoder
+class, in class order.
+
+torch and onnxruntime are optional: they are imported only when a matching
+file is found, and a slot whose file cannot be loaded keeps its sklearn model.
+"""
+from __future__ import annotations
+
+import logging
 import os
+import threading
+from pathlib import Path
+from typing import Optional
+
 import numpy as np
 
+log = logging.getLogger("cyber-ids")
+
+INTRA_THREADS = int(os.getenv("ML_INFER_INTRA_THREADS", "0"))
+INTER_THREADS = int(os.getenv("ML_INFER_INTER_THREADS", "0"))
+WARMUP_RUNS   = int(os.getenv("ML_INFER_WARMUP_RUNS", "3"))
+OUTPUT        = os.getenv("ML_INFER_OUTPUT", "auto").strip().lower()   # auto | logits | proba
+
+# Registry slot → environment variable naming its exported model file.
+MODEL_PATH_ENV = {
+    "cnn":    "MODEL_PATH",
+    "lstm":   "LSTM_MODEL_PATH",
+    "hybrid": "HYBRID_MODEL_PATH",
+}
+
+TORCH_SUFFIXES = (".pt", ".pth", ".ts")
+ONNX_SUFFIXES  = (".onnx",)
+
+_WARMUP_ROWS = (1, 64)   # single-row and micro-batch shapes
+
+
+# ─── Sessions ────────────────────────────────────────────────────────────────
+class InferenceSession:
+    """One loaded model. predict_proba() is safe to call from several threads."""
+
+    backend = ""
+
+    def __init__(self, path: Path, n_features: Optional[int], output: str = OUTPUT) -> None:
+        self.path         = Path(path)
+        self.n_features   = n_features
+        self.output       = output
+        self.n_outputs    = 0
+        self.calls        = 0
+        self._settle_lock = threading.Lock()
+
+    def _run(self, x: np.ndarray) -> np.ndarray:
+        """Raw model output (n_rows, n_outputs) for contiguous float32 `x`."""
+        raise NotImplementedError
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        x   = np.ascontiguousarray(X, dtype=np.float32)   # no copy when already float32 C-order
+        raw = self._run(x)
+        self.calls += 1
+        if not self.n_outputs:   # not warmed up (input width unknown at load)
+            self._settle_output(raw)
+        if self.output == "proba":
+            return raw.astype(np.float64)
+        out = np.empty(raw.shape, dtype=np.float64)       # the one allocation per call, dtype as sklearn
+        np.subtract(raw, raw.max(axis=1, keepdims=True), out=out)
+        np.exp(out, out=out)
+        out /= out.sum(axis=1, keepdims=True)
+        return out
+
+    def warmup(self, runs: int = WARMUP_RUNS) -> None:
+        """Run the model on random inputs so graph optimisation and
+        allocation happen before the first request; settles the output."""
+        rng = np.random.default_rng(0)
+        for rows in _WARMUP_ROWS:
+            x   = rng.standard_normal((rows, self.n_features)).astype(np.float32)
+            raw = self._run(x)
+            for _ in range(max(0, runs - 1)):
+                self._run(x)
+        self._settle_output(raw)
+
+    def _settle_output(self, raw: np.ndarray) -> None:
+        """Record the output width and, for output="auto", decide from `raw`
+        whether the model emits logits or probabilities. Runs once, on the
+        warmup output or else on the first real call's."""
+        with self._settle_lock:
+            if self.n_outputs:
+                return
+            if raw.ndim != 2:
+                raise ValueError(f"{self.path.name}: expected 2-D output, got shape {raw.shape}")
+            if self.output == "auto":
+                sums = raw.sum(axis=1)
+                is_proba = bool((raw >= 0).all() and (raw <= 1).all() and np.allclose(sums, 1.0, atol=1e-3))
+                self.output = "proba" if is_proba else "logits"
+            self.n_outputs = raw.shape[1]
+
+    def stats(self) -> dict:
+        return {
+            "backend":  self.backend,
+            "path":     self.path.name,
+            "features": self.n_features,
+            "outputs":  self.n_outputs,
+            "output":   self.output,
+            "calls":    self.calls,
+        }
+
+
+class TorchScriptSession(InferenceSession):
+    backend = "torchscript"
+
+    def __init__(self, path: Path, n_features: Optional[int], output: str = OUTPUT,
+                 intra_threads: int = INTRA_THREADS, inter_threads: int = INTER_THREADS) -> None:
+        super().__init__(path, n_features, output)
+        import torch
+
+        self._torch = torch
+        if intra_threads > 0:
+            torch.set_num_threads(intra_threads)
+        if inter_threads > 0:
+            try:
+                torch.set_num_interop_threads(inter_threads)
+            except RuntimeError:   # only settable before the first parallel op in the process
+                pass
+
+        model = torch.jit.load(str(path), map_location="cpu").eval()
+        try:
+            model = torch.jit.optimize_for_inference(torch.jit.freeze(model))
+        except Exception as exc:   # not freezable (e.g. traced with attributes); serve as loaded
+            log.debug(f"{self.path.name}: serving unfrozen TorchScript ({exc})")
+        self._model = model
+
+    def _run(self, x: np.ndarray) -> np.ndarray:
+        torch = self._torch
+        with torch.inference_mode():
+            out = self._model(torch.from_numpy(x))
+        if isinstance(out, (tuple, list)):
+            out = out[0]
+        return out.float().numpy()   # shares the output tensor's memory
+
+
+class OnnxSession(InferenceSession):
+    backend = "onnxruntime"
+
+    def __init__(self, path: Path, n_features: Optional[int], output: str = OUTPUT,
+                 intra_threads: int = INTRA_THREADS, inter_threads: int = INTER_THREADS) -> None:
+        super().__init__(path, n_features, output)
+        import onnxruntime as ort
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_threads > 0:
+            opts.intra_op_num_threads = intra_threads
+        if inter_threads > 0:
+            opts.inter_op_num_threads = inter_threads
+            opts.execution_mode       = ort.ExecutionMode.ORT_PARALLEL
+        self._session = ort.InferenceSession(str(path), sess_options=opts,
+                                             providers=["CPUExecutionProvider"])
+        self._input = self._session.get_inputs()[0].name
+        # skl2onnx-style graphs emit a label tensor first; serve the float scores.
+        outputs = self._session.get_outputs()
+        self._output = next((o.name for o in outputs if o.type == "tensor(float)"), outputs[0].name)
+        self._local  = threading.local()   # IO binding and output buffer per calling thread
+
+    def _buffers(self, rows: int):
+        local = self._local
+        if getattr(local, "binding", None) is None:
+            local.binding = self._session.io_binding()
+            local.buffer  = np.empty((0, 0), dtype=np.float32)
+        if self.n_outputs and (len(local.buffer) < rows or local.buffer.shape[1] != self.n_outputs):
+            local.buffer = np.empty((max(rows, 2 * len(local.buffer)), self.n_outputs), dtype=np.float32)
+        return local.binding, local.buffer
+
+    def _run(self, x: np.ndarray) -> np.ndarray:
+        if not self.n_outputs:   # output width unknown until the first (warmup) run
+            return np.asarray(self._session.run([self._output], {self._input: x})[0])
+        binding, buffer = self._buffers(len(x))
+        out = buffer[: len(x)]
+        binding.bind_cpu_input(self._input, x)
+        binding.bind_output(self._output, "cpu", 0, np.float32, out.shape, out.ctypes.data)
+        self._session.run_with_iobinding(binding)
+        return out
+
+
+def open_session(path: Path, n_features: Optional[int], **options) -> InferenceSession:
+    """Load `path` and, when the input width is known, warm it up (otherwise
+    the output kind is settled on the first call); the backend is chosen by
+    file suffix."""
+    path   = Path(path)
+    suffix = path.suffix.lower()
+    if suffix in TORCH_SUFFIXES:
+        session: InferenceSession = TorchScriptSession(path, n_features, **options)
+    elif suffix in ONNX_SUFFIXES:
+        session = OnnxSession(path, n_features, **options)
+    else:
+        raise ValueError(f"Unsupported model file {path.name!r} (.pt / .onnx)")
+    if n_features:
+        session.warmup()
+    return session
+
+
+# ─── Registry integration ────────────────────────────────────────────────────
+class SessionClassifier:
+    """sklearn-style classifier facade over an InferenceSession."""
+
+    def __init__(self, session: InferenceSession, classes: np.ndarray) -> None:
+        self.session        = session
+        self.classes_       = np.arange(len(classes))   # label-encoded, like the sklearn models
+        self.n_features_in_ = session.n_features
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        return self.session.predict_proba(X)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self.predict_proba(X).argmax(axis=1)
+
+
+def backend_of(clf) -> str:
+    """Runtime serving a slot's classifier: the session backend, or "sklearn"."""
+    return clf.session.backend if isinstance(clf, SessionClassifier) else "sklearn"
+
+
+def model_path(name: str, models_dir: Path) -> Optional[Path]:
+    """Exported model file for slot `name`, or None. <NAME>_MODEL_PATH (see
+    MODEL_PATH_ENV) wins; otherwise <name>_model.pt / .onnx. Relative paths
+    resolve against `models_dir`."""
+    env = MODEL_PATH_ENV.get(name)
+    if env and os.getenv(env):
+        candidates = [os.getenv(env)]
+    else:
+        candidates = [f"{name}_model{s}" for s in TORCH_SUFFIXES + ONNX_SUFFIXES]
+    for candidate in candidates:
+        path = Path(candidate)
+        if not path.is_absolute():
+            path = Path(models_dir) / path
+        if path.is_file():
+            return path
+    return None
+
+
+def attach(state, name: str, models_dir: Path) -> None:
+    """Serve slot `name` from its exported model when one exists. Leaves the
+    trained sklearn model in place when there is none or it fails to load."""
+    path = model_path(name, models_dir)
+    if path is None or not getattr(state, "trained", False):
+        return
+    n_classes = len(state.label_encoder.classes_)
+    try:
+        session = open_session(path, len(state.feature_cols))
+        if session.n_outputs != n_classes:
+            raise ValueError(f"model has {session.n_outputs} outputs, label encoder has {n_classes} classes")
+    except Exception as exc:
+        log.warning(f"Could not serve {name} from {path.name} ({type(exc).__name__}: {exc}); using sklearn")
+        return
+    state.clf        = SessionClassifier(session, state.label_encoder.classes_)
+    state.compiled   = None
+    state.evaluation = None
+    log.info(f"  ⚙ {name:6s} — {session.backend} session from {path.name}")
+
+
+# ─── Standalone loader ───────────────────────────────────────────────────────
 class DummyModel:
     def predict(self, X):
         # Heuristic: random but logical demo predictions
@@ -8,31 +287,31 @@ class DummyModel:
         confs = np.random.uniform(0.7, 0.99, size=(X.shape[0],))
         return preds, confs
 
+
+_DUMMY = DummyModel()
+
+
 class ModelLoader:
-    def __init__(self, model_path):
+    """(predictions, confidences) from one model file, or demo output when
+    the file is missing or cannot be served."""
+
+    def __init__(self, model_path, n_features: Optional[int] = None):
         self.model_path = model_path
-        self.model = None
+        self.session: Optional[InferenceSession] = None
         self.demo_mode = not os.path.exists(model_path)
         if not self.demo_mode:
             try:
-                import torch
-                self.model = torch.jit.load(model_path)
-                self.model.eval()
+                self.session = open_session(Path(model_path), n_features)
             except Exception as e:
-                print(f"[ModelLoader] Failed to load model '{model_path}': {e}")
+                log.warning(f"[ModelLoader] Failed to load model '{model_path}': {e}")
                 self.demo_mode = True
 
     def predict(self, X):
-        if self.demo_mode or self.model is None:
-            return DummyModel().predict(X)
+        if self.demo_mode or self.session is None:
+            return _DUMMY.predict(X)
         try:
-            import torch
-            with torch.no_grad():
-                tensor = torch.tensor(X, dtype=torch.float32)
-                out = self.model(tensor)
-                preds = out.argmax(dim=1).numpy()
-                confs = out.max(dim=1)[0].numpy()
-                return preds, confs
+            proba = self.session.predict_proba(X)
+            return proba.argmax(axis=1), proba.max(axis=1)
         except Exception as e:
-            print(f"[ModelLoader] Inference error: {e}")
-            return DummyModel().predict(X)
+            log.warning(f"[ModelLoader] Inference error: {e}")
+            return _DUMMY.predict(X)
@@ -0,0 +1,379 @@
+"""
+Model registry — versioned model sets, atomic hot swap and shadow scoring.
+
+A ModelVersion is one complete {model name → ModelState} mapping. The
+registry serves `current` and may hold a `candidate`. A new version is
+built off to the side, on a background thread (load_in_background), and
+published by reassigning one attribute, so the swap is atomic and nothing
+ever sees a half-loaded set.
+
+In-flight requests keep the version they started on. PinVersionMiddleware
+stores `registry.current` in a ContextVar when a request arrives, and
+RegistryView (main._registry) resolves names through the pinned version.
+Thread-pool inference jobs run in a copy of the request's context (see
+inference.InferenceExecutor.run), so every chunk of a long upload is
+scored by the same version even when a swap lands halfway through.
+Process-pool workers hold one bundle each, so a swap starts a new pool and
+keeps the old one for requests still pinned to the old version; the
+registry counts pinned requests per version and calls its on_release hooks
+once a retired version's last one ends, which shuts that pool down.
+
+Shadow mode: while a candidate is loaded, ShadowScorer takes a random
+sample of scored rows (SHADOW_SAMPLE_RATE) from the request path. It
+queues them without blocking (SHADOW_QUEUE_SIZE, dropped when full) and,
+on its own thread, scores each sample with both the pinned production
+version and the candidate. It records per-row latency for both, label
+agreement and the production→candidate confusion counts.
+"""
+from __future__ import annotations
+
+import contextvars
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from collections import Counter, deque
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+import tree_compiler
+
+log = logging.getLogger("cyber-ids")
+
+HISTORY            = int(os.getenv("MODEL_REGISTRY_HISTORY", "10"))
+SHADOW_SAMPLE_RATE = float(os.getenv("SHADOW_SAMPLE_RATE", "0.05"))
+SHADOW_QUEUE_SIZE  = int(os.getenv("SHADOW_QUEUE_SIZE", "64"))
+SHADOW_MAX_ROWS    = int(os.getenv("SHADOW_MAX_ROWS", "2000"))   # per sampled batch
+
+
+@dataclass
+class ModelVersion:
+    """One immutable set of model states; `meta` describes where it came
+    from (bundle key / path, cache hit)."""
+    version:   int
+    states:    dict
+    source:    str
+    loaded_at: float = field(default_factory=time.time)
+    meta:      dict  = field(default_factory=dict)
+
+    def info(self) -> dict:
+        return {
+            "version":   self.version,
+            "source":    self.source,
+            "loaded_at": round(self.loaded_at, 3),
+            "models":    {name: state.trained for name, state in self.states.items()},
+            **{k: self.meta.get(k) for k in ("key", "path", "hit")},
+        }
+
+
+# Version a request (and the jobs it submits) resolves models against.
+pinned: contextvars.ContextVar[Optional[ModelVersion]] = contextvars.ContextVar("model_version", default=None)
+
+
+class ModelRegistry:
+    """Serves `current`; swaps and candidate changes are single assignments."""
+
+    def __init__(self, history: int = HISTORY) -> None:
+        self.current   = ModelVersion(0, {}, "empty")
+        self.candidate: Optional[ModelVersion] = None
+        self.history: deque[dict] = deque(maxlen=history)   # info() of retired versions
+        self.on_swap: list[Callable[[ModelVersion], None]] = []
+        self.on_release: list[Callable[[int], None]] = []    # retired version no request pins any more
+        self._pins: Counter[int] = Counter()                 # version → requests pinned to it
+        self._lock = threading.Lock()
+        self._seq  = 0
+        self._loader: Optional[threading.Thread] = None
+        self.load_status: dict = {"state": "idle"}
+
+    def new_version(self, states: dict, source: str, meta: Optional[dict] = None) -> ModelVersion:
+        with self._lock:
+            self._seq += 1
+            return ModelVersion(self._seq, states, source, meta=dict(meta or {}))
+
+    def states(self) -> dict:
+        """States of the pinned version, or of `current` outside a request."""
+        version = pinned.get()
+        return (version if version is not None else self.current).states
+
+    # ── swaps ────────────────────────────────────────────────
+    def publish(self, version: ModelVersion) -> None:
+        """Make `version` current. Requests already running keep their pin."""
+        with self._lock:
+            retired, self.current = self.current, version
+            if retired.version:
+                self.history.appendleft(retired.info())
+        log.info(f"Model registry: serving version {version.version} ({version.source})")
+        for hook in self.on_swap:
+            try:
+                hook(version)
+            except Exception as exc:
+                log.warning(f"Model swap hook failed: {type(exc).__name__}: {exc}")
+        if retired.version and not self._pins[retired.version]:
+            self._release(retired.version)
+
+    # ── request pins ─────────────────────────────────────────
+    def pin(self) -> ModelVersion:
+        """`current`, counted as in use until unpin()."""
+        with self._lock:
+            version = self.current
+            self._pins[version.version] += 1
+        return version
+
+    def unpin(self, version: ModelVersion) -> None:
+        with self._lock:
+            self._pins[version.version] -= 1
+            if self._pins[version.version] > 0:
+                return
+            del self._pins[version.version]
+            released = version is not self.current
+        if released:
+            self._release(version.version)
+
+    def _release(self, number: int) -> None:
+        for hook in self.on_release:
+            try:
+                hook(number)
+            except Exception as exc:
+                log.warning(f"Model release hook failed: {type(exc).__name__}: {exc}")
+
+    def set_candidate(self, version: Optional[ModelVersion]) -> None:
+        self.candidate = version
+        shadow.reset()
+
+    def promote(self) -> ModelVersion:
+        """Publish the candidate. Raises LookupError when there is none."""
+        candidate = self.candidate
+        if candidate is None:
+            raise LookupError("No candidate version loaded")
+        self.set_candidate(None)
+        self.publish(candidate)
+        return candidate
+
+    # ── background loading ───────────────────────────────────
+    def load_in_background(self, build: Callable[[], tuple[dict, dict]], source: str,
+                           target: str = "production") -> bool:
+        """Run `build()` → (states, meta) on a thread, then publish the result
+        (target="production") or load it as the candidate. Returns False when
+        a load is already running."""
+        with self._lock:
+            if self._loader is not None and self._loader.is_alive():
+                return False
+            self.load_status = {"state": "loading", "source": source, "target": target, "started": time.time()}
+            self._loader = threading.Thread(
+                target=self._load, args=(build, source, target), name="model-loader", daemon=True
+            )
+            self._loader.start()
+        return True
+
+    def _load(self, build, source: str, target: str) -> None:
+        t0 = time.perf_counter()
+        try:
+            states, meta = build()
+            version = self.new_version(states, source, meta)
+            if target == "candidate":
+                self.set_candidate(version)
+            else:
+                self.publish(version)
+        except Exception as exc:
+            log.warning(f"Model load ({source}) failed: {type(exc).__name__}: {exc}")
+            self.load_status = {**self.load_status, "state": "failed", "error": f"{type(exc).__name__}: {exc}"}
+            return
+        self.load_status = {**self.load_status, "state": "done", "version": version.version,
+                            "seconds": round(time.perf_counter() - t0, 3)}
+
+    def stats(self) -> dict:
+        return {
+            "current":   self.current.info(),
+            "candidate": self.candidate.info() if self.candidate is not None else None,
+            "history":   list(self.history),
+            "load":      self.load_status,
+        }
+
+
+class RegistryView(Mapping):
+    """Read-only {name → ModelState} mapping over the pinned/current version."""
+
+    def __init__(self, registry: ModelRegistry) -> None:
+        self._registry = registry
+
+    def __getitem__(self, name: str):
+        return self._registry.states()[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._registry.states())
+
+    def __len__(self) -> int:
+        return len(self._registry.states())
+
+
+class PinVersionMiddleware:
+    """ASGI middleware pinning the current version for the whole request,
+    including streamed response bodies and tasks the request starts."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        version = registry.pin()
+        token   = pinned.set(version)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            pinned.reset(token)
+            registry.unpin(version)
+
+
+# ─── Shadow scoring ──────────────────────────────────────────────────────────
+class ShadowStats:
+    """Production vs candidate comparison for one model name."""
+
+    def __init__(self) -> None:
+        self.batches      = 0
+        self.rows         = 0
+        self.agree        = 0
+        self.prod_seconds = 0.0
+        self.cand_seconds = 0.0
+        self.conf_delta   = 0.0                # Σ candidate − production confidence
+        self.confusion: Counter = Counter()    # (production label, candidate label) → rows
+
+    def add(self, prod_labels: np.ndarray, prod_conf: np.ndarray, prod_secs: float,
+            cand_labels: np.ndarray, cand_conf: np.ndarray, cand_secs: float) -> None:
+        self.batches      += 1
+        self.rows         += len(prod_labels)
+        self.agree        += int((prod_labels == cand_labels).sum())
+        self.prod_seconds += prod_secs
+        self.cand_seconds += cand_secs
+        self.conf_delta   += float(cand_conf.sum() - prod_conf.sum())
+        self.confusion.update(zip(prod_labels.tolist(), cand_labels.tolist()))
+
+    def summary(self) -> dict:
+        n = max(self.rows, 1)
+        return {
+            "batches":               self.batches,
+            "rows":                  self.rows,
+            "agreement":             round(self.agree / n, 4),
+            "production_us_per_row": round(self.prod_seconds / n * 1e6, 2),
+            "candidate_us_per_row":  round(self.cand_seconds / n * 1e6, 2),
+            "latency_ratio":         round(self.cand_seconds / self.prod_seconds, 3) if self.prod_seconds else None,
+            "mean_confidence_delta": round(self.conf_delta / n, 4),
+            "disagreements":         [
+                {"production": p, "candidate": c, "rows": k}
+                for (p, c), k in self.confusion.most_common() if p != c
+            ],
+        }
+
+
+class ShadowScorer:
+    """Scores sampled traffic with the candidate on a daemon thread."""
+
+    def __init__(self, rate: float = SHADOW_SAMPLE_RATE, queue_size: int = SHADOW_QUEUE_SIZE,
+                 max_rows: int = SHADOW_MAX_ROWS) -> None:
+        self.rate     = rate
+        self.max_rows = max_rows
+        self._queue: queue.Queue = queue.Queue(queue_size)
+        self._stats: dict[str, ShadowStats] = {}
+        self._lock   = threading.Lock()
+        self._rng    = random.Random()
+        self._thread: Optional[threading.Thread] = None
+        self.offered = 0
+        self.dropped = 0
+        self.errors  = 0
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(5.0)
+            self._thread = None
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+            self.offered = self.dropped = self.errors = 0
+
+    def offer(self, model: str, rows: pd.DataFrame | list[dict]) -> None:
+        """Sample `rows` (a frame or feature dicts, already scored by
+        production) for shadow scoring. Returns immediately; a no-op
+        without a candidate."""
+        candidate = registry.candidate
+        if candidate is None or self.rate <= 0 or model not in candidate.states or self._thread is None:
+            return
+        n = len(rows)
+        with self._lock:
+            if n == 1:
+                take = [0] if self._rng.random() < self.rate else []
+            else:
+                k    = min(self.max_rows, int(np.random.binomial(n, self.rate)))
+                take = sorted(self._rng.sample(range(n), k)) if k else []
+        if not take:
+            return
+        production = pinned.get() or registry.current
+        if isinstance(rows, pd.DataFrame):
+            sample = rows.iloc[take].copy()
+        else:
+            sample = pd.DataFrame([rows[i] for i in take])
+        try:
+            self._queue.put_nowait((model, production, candidate, sample))
+            self.offered += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            model, production, candidate, sample = item
+            if registry.candidate is not candidate:   # candidate replaced while queued
+                continue
+            try:
+                prod_labels, prod_conf, prod_secs = _score(production.states[model], sample)
+                cand_labels, cand_conf, cand_secs = _score(candidate.states[model], sample)
+            except Exception as exc:
+                self.errors += 1
+                log.warning(f"Shadow scoring ({model}) failed: {type(exc).__name__}: {exc}")
+                continue
+            with self._lock:
+                self._stats.setdefault(model, ShadowStats()).add(
+                    prod_labels, prod_conf, prod_secs, cand_labels, cand_conf, cand_secs
+                )
+
+    def stats(self) -> dict:
+        with self._lock:
+            models = {name: s.summary() for name, s in self._stats.items()}
+        return {
+            "enabled":     registry.candidate is not None and self.rate > 0,
+            "sample_rate": self.rate,
+            "offered":     self.offered,
+            "dropped":     self.dropped,
+            "errors":      self.errors,
+            "queued":      self._queue.qsize(),
+            "models":      models,
+        }
+
+
+def _score(state, df: pd.DataFrame) -> tuple[np.ndarray, np.ndarray, float]:
+    """(label names, confidences, seconds) for `df` with one model state.
+    Labels are compared by name, so versions may order classes differently."""
+    X     = state.vectorizer.transform(df)
+    t0    = time.perf_counter()
+    proba = tree_compiler.predict_proba(state, state.scaler.transform(X))
+    secs  = time.perf_counter() - t0
+    pred  = proba.argmax(axis=1)
+    return np.asarray(state.label_encoder.classes_)[pred], proba[np.arange(len(pred)), pred], secs
+
+
+registry = ModelRegistry()
+shadow   = ShadowScorer()
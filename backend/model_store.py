@@ -0,0 +1,113 @@
+"""
+Model artifact store — content-addressed cache of fitted ModelState bundles.
+
+A bundle holds everything a ModelState needs to serve (classifier, scaler,
+label encoder, feature columns, vectorizer, cached evaluation). Bundles live in
+MODELS_DIR/bundle-<key>/, where <key> hashes the training data, the model
+hyperparameters and the library versions, so a key match means the fitted
+models can be loaded instead of retrained.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+import joblib
+import numpy as np
+import sklearn
+
+# Bump when the bundle layout or the fields below change.
+BUNDLE_VERSION = 3
+BUNDLE_FIELDS  = ("clf", "scaler", "label_encoder", "feature_cols", "vectorizer", "evaluation")
+MANIFEST       = "manifest.json"
+
+
+def bundle_key(data: bytes, params: dict[str, Any]) -> str:
+    """SHA-256 over training data bytes, hyperparameters and library versions."""
+    h = hashlib.sha256()
+    h.update(data)
+    h.update(json.dumps(params, sort_keys=True, default=str).encode())
+    h.update(json.dumps({
+        "bundle":  BUNDLE_VERSION,
+        "sklearn": sklearn.__version__,
+        "numpy":   np.__version__,
+    }, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+def bundle_dir(models_dir: Path, key: str) -> Path:
+    return Path(models_dir) / f"bundle-{key[:16]}"
+
+
+def save_bundle(directory: Path, states: dict[str, Any], key: str) -> None:
+    """Write one file per model, then the manifest. Every file is written to a
+    temp name and renamed, so concurrent workers never see a partial bundle."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    suffix = f".tmp-{os.getpid()}"
+
+    for name, state in states.items():
+        path = directory / f"{name}.joblib"
+        tmp  = path.with_name(path.name + suffix)
+        joblib.dump({f: getattr(state, f) for f in BUNDLE_FIELDS}, tmp)
+        os.replace(tmp, path)
+
+    manifest = directory / MANIFEST
+    tmp      = manifest.with_name(manifest.name + suffix)
+    tmp.write_text(json.dumps({"key": key, "models": sorted(states)}))
+    os.replace(tmp, manifest)
+
+
+def load_bundle(directory: Path, states: dict[str, Any], key: str) -> bool:
+    """Fill `states` from a stored bundle. Returns False on any miss or error,
+    leaving `states` untouched."""
+    directory = Path(directory)
+    try:
+        manifest = json.loads((directory / MANIFEST).read_text())
+    except (OSError, ValueError):
+        return False
+    if manifest.get("key") != key or not set(states) <= set(manifest.get("models", [])):
+        return False
+
+    loaded: dict[str, dict] = {}
+    try:
+        for name in states:
+            # mmap_mode keeps large numpy arrays on disk, shared across workers.
+            loaded[name] = joblib.load(directory / f"{name}.joblib", mmap_mode="r")
+    except Exception:
+        return False
+
+    for name, fields in loaded.items():
+        state = states[name]
+        for f in BUNDLE_FIELDS:
+            setattr(state, f, fields[f])
+        state.trained = True
+    return True
+
+
+def manifest_key(directory: Path) -> str | None:
+    """Key recorded in a bundle's manifest, or None when there is no manifest."""
+    try:
+        return json.loads((Path(directory) / MANIFEST).read_text()).get("key")
+    except (OSError, ValueError):
+        return None
+
+
+def list_bundles(models_dir: Path) -> list[dict]:
+    """Complete bundles in `models_dir`, newest first."""
+    bundles = []
+    for manifest in Path(models_dir).glob(f"bundle-*/{MANIFEST}"):
+        try:
+            info = json.loads(manifest.read_text())
+        except (OSError, ValueError):
+            continue
+        bundles.append({
+            "name":     manifest.parent.name,
+            "key":      info.get("key"),
+            "models":   info.get("models", []),
+            "modified": round(manifest.stat().st_mtime, 3),
+        })
+    return sorted(bundles, key=lambda b: b["modified"], reverse=True)
@@ -0,0 +1,252 @@
+"""
+Network sampler — one background thread that reads host network state via
+psutil at a fixed interval and publishes it as an immutable NetSnapshot.
+
+Walking the kernel connection table (psutil.net_connections) is by far the
+most expensive call behind the live endpoints. Doing it once per interval
+here, instead of once per request, makes every /api/live/* and
+/api/network/summary request a dictionary read: serving cost no longer
+grows with the number of polling dashboards.
+
+A snapshot is never mutated after publication, so readers need no lock:
+`sampler.snapshot()` returns whichever snapshot was current when it was
+called, and the next tick swaps in a new object.
+"""
+from __future__ import annotations
+
+import datetime
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+import psutil
+
+import traffic_history
+
+log = logging.getLogger("cyber-ids")
+
+MAX_CONNECTIONS = 50   # rows kept for /api/live/connections
+
+# Remote ports that flag a connection (see classify_connection).
+BRUTE_FORCE_PORTS = frozenset((22, 23, 3389, 21, 445, 139))
+
+
+def classify_connection(conn) -> str | None:
+    """Return threat label for a connection, or None if benign."""
+    try:
+        raddr = conn.raddr
+        if not raddr:
+            return None
+        port = raddr.port
+        if port in BRUTE_FORCE_PORTS:
+            return "Brute Force"
+        if port == 53 and conn.type and conn.type.name == "SOCK_DGRAM":
+            return "Probe"
+    except Exception:
+        pass
+    return None
+
+
+def threat_level(threat: str | None) -> str:
+    return "HIGH" if threat == "Brute Force" else ("MED" if threat else "LOW")
+
+
+@dataclass(frozen=True)
+class NetSnapshot:
+    """Host network state at `taken_at`. Treat every field as read-only."""
+    taken_at:           float = 0.0
+    packets_per_sec:    float = 0.0
+    bytes_sent_per_sec: float = 0.0
+    bytes_recv_per_sec: float = 0.0
+    bytes_sent:         int   = 0
+    bytes_recv:         int   = 0
+    total_connections:  int   = 0
+    active_connections: int   = 0
+    connections:        tuple = ()                # first MAX_CONNECTIONS remote rows
+    flagged:            tuple = ()                # (threat, remote "ip:port") per flagged connection
+    interfaces:         tuple = ()
+    errors:             dict  = field(default_factory=dict)
+
+
+class NetworkSampler:
+    """Sample psutil every `interval` seconds on a daemon thread.
+
+    `emit(alerts)` is called with one alert dict per flagged connection on
+    every tick; deduplication is the alert store's job (alert_store).
+    Every snapshot is also appended to `history` (a TrafficHistory) and
+    passed to `on_snapshot`, if set.
+    """
+
+    def __init__(
+        self,
+        interval: float = 1.0,
+        emit: Optional[Callable[[list[dict]], None]] = None,
+        history: Optional[traffic_history.TrafficHistory] = None,
+        on_snapshot: Optional[Callable[[NetSnapshot], None]] = None,
+    ) -> None:
+        self.interval    = interval
+        self.emit        = emit
+        self.on_snapshot = on_snapshot
+        self.history     = history if history is not None else traffic_history.TrafficHistory()
+
+        self._snapshot = NetSnapshot()
+        self._stop     = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._last_io: tuple | None = None   # (time, packets, bytes_sent, bytes_recv) at previous tick
+
+        self.samples      = 0
+        self.last_seconds = 0.0
+        self.last_error: str | None = None
+
+    @classmethod
+    def from_env(cls, emit=None) -> "NetworkSampler":
+        return cls(interval=float(os.getenv("NET_SAMPLE_INTERVAL", "1.0")), emit=emit)
+
+    def snapshot(self) -> NetSnapshot:
+        return self._snapshot
+
+    # ── lifecycle ────────────────────────────────────────────
+    def start(self) -> None:
+        """Take a first sample synchronously, then keep sampling in the background."""
+        self.sample()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="net-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as exc:           # keep the previous snapshot, keep sampling
+                self.last_error = f"{type(exc).__name__}: {exc}"
+                log.warning(f"Network sampler error: {self.last_error}")
+
+    # ── per tick ─────────────────────────────────────────────
+    def sample(self) -> NetSnapshot:
+        """Read psutil once, publish and return the new snapshot."""
+        t0     = time.perf_counter()
+        now    = time.time()
+        errors = {}
+
+        try:
+            io = psutil.net_io_counters()
+            counters = (now, io.packets_sent + io.packets_recv, io.bytes_sent, io.bytes_recv)
+        except Exception as exc:
+            errors["io"] = str(exc)
+            counters = None
+
+        rates = (0.0, 0.0, 0.0)   # packets, bytes sent, bytes received per second
+        if counters is not None:
+            prev = self._last_io
+            if prev is not None and now - prev[0] > 0.05:
+                rates = tuple(round((c - p) / (now - prev[0]), 1) for c, p in zip(counters[1:], prev[1:]))
+            self._last_io = counters
+
+        try:
+            conns = psutil.net_connections(kind="inet")
+        except Exception as exc:
+            errors["connections"] = str(exc)
+            conns = []
+
+        rows, flagged, active = [], [], 0
+        for c in conns:
+            if c.status == "ESTABLISHED":
+                active += 1
+            if not c.raddr:
+                continue
+            threat = classify_connection(c)
+            if threat:
+                flagged.append((threat, f"{c.raddr.ip}:{c.raddr.port}"))
+            if len(rows) < MAX_CONNECTIONS:
+                rows.append({
+                    "src_ip":   f"{c.laddr.ip}:{c.laddr.port}" if c.laddr else "-",
+                    "dst_ip":   f"{c.raddr.ip}:{c.raddr.port}",
+                    "protocol": "TCP" if (c.type and "STREAM" in c.type.name) else "UDP",
+                    "status":   c.status or "NONE",
+                    "threat":   threat_level(threat),
+                })
+
+        try:
+            interfaces = _interfaces()
+        except Exception as exc:
+            errors["interfaces"] = str(exc)
+            interfaces = ()
+
+        snap = NetSnapshot(
+            taken_at           = now,
+            packets_per_sec    = rates[0],
+            bytes_sent_per_sec = rates[1],
+            bytes_recv_per_sec = rates[2],
+            bytes_sent         = counters[2] if counters else 0,
+            bytes_recv         = counters[3] if counters else 0,
+            total_connections  = len(conns),
+            active_connections = active,
+            connections        = tuple(rows),
+            flagged            = tuple(flagged),
+            interfaces         = interfaces,
+            errors             = errors,
+        )
+        self._snapshot    = snap
+        self.samples     += 1
+        self.history.add(
+            now,
+            packets_per_sec    = snap.packets_per_sec,
+            bytes_sent_per_sec = snap.bytes_sent_per_sec,
+            bytes_recv_per_sec = snap.bytes_recv_per_sec,
+            active_connections = snap.active_connections,
+            total_connections  = snap.total_connections,
+        )
+        self.last_seconds = time.perf_counter() - t0
+
+        if self.on_snapshot is not None:
+            self.on_snapshot(snap)
+        if flagged and self.emit is not None:
+            stamp = datetime.datetime.fromtimestamp(now).strftime("%H:%M:%S")
+            self.emit([
+                {"time": stamp, "ts": now, "type": t, "threat": threat_level(t), "dst_ip": remote, "source": "psutil"}
+                for t, remote in flagged
+            ])
+        return snap
+
+    def stats(self) -> dict:
+        snap = self._snapshot
+        return {
+            "running":     self._thread is not None and self._thread.is_alive(),
+            "interval":    self.interval,
+            "samples":     self.samples,
+            "sample_ms":   round(self.last_seconds * 1e3, 2),
+            "age_seconds": round(time.time() - snap.taken_at, 3) if snap.taken_at else None,
+            "connections": snap.total_connections,
+            "last_error":  self.last_error,
+        }
+
+
+def _interfaces() -> tuple:
+    ifaces = psutil.net_if_stats()
+    addrs  = psutil.net_if_addrs()
+    io     = psutil.net_io_counters(pernic=True)
+    rows   = []
+    for name, stats in ifaces.items():
+        ipv4   = next((a.address for a in addrs.get(name, []) if a.family.name == "AF_INET"), None)
+        nic_io = io.get(name)
+        rows.append({
+            "name":       name,
+            "ip":         ipv4 or "–",
+            "up":         stats.isup,
+            "speed_mbps": stats.speed,
+            "bytes_sent": nic_io.bytes_sent if nic_io else 0,
+            "bytes_recv": nic_io.bytes_recv if nic_io else 0,
+        })
+    return tuple(rows)
+
+
+sampler = NetworkSampler.from_env()
@@ -1,11 +1,24 @@
 """
-Explain router — returns real feature importances from trained sklearn models.
-Endpoints: GET /api/explain/global, GET /api/explain/local
+Explain router — global feature importances and per-row SHAP attributions.
+Endpoints: GET /api/explain/global, GET /api/explain/local, POST /api/explain/batch
 """
 from __future__ import annotations
 
+import asyncio
+import json
+import logging
+import time
+
 import numpy as np
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, File, HTTPException, Query, UploadFile
+from fastapi.responses import StreamingResponse
+
+import attribution
+import inference
+import ml_infer
+import scoring
+
+log = logging.getLogger("cyber-ids")
 
 router = APIRouter()
 
@@ -15,6 +28,17 @@ def _get_registry():
     return _registry
 
 
+def _require_explainer(model: str, state) -> None:
+    """400 for a slot whose classifier has no attributions, e.g. one served
+    from an exported TorchScript / ONNX model."""
+    if not attribution.explainable(state.clf):
+        raise HTTPException(
+            400,
+            f"Model '{model}' is served from an exported {ml_infer.backend_of(state.clf)} "
+            "model, which has no feature attributions.",
+        )
+
+
 @router.get("/api/explain/global")
 def explain_global(model: str = Query("hybrid", description="Model: cnn | lstm | hybrid")):
     """Return global feature importance for the chosen model."""
@@ -27,13 +51,12 @@ def explain_global(model: str = Query("hybrid", description="Model: cnn | lstm |
     if not state.trained or state.clf is None:
         raise HTTPException(503, "Model not ready yet.")
 
+    _require_explainer(model, state)
     clf = state.clf
     if hasattr(clf, "feature_importances_"):
         raw = clf.feature_importances_
-    elif hasattr(clf, "coef_"):
-        raw = np.abs(clf.coef_).mean(axis=0)
     else:
-        raw = np.ones(len(state.feature_cols))
+        raw = np.abs(clf.coef_).mean(axis=0)
 
     total = raw.sum() or 1.0
     importance = [
@@ -46,14 +69,19 @@ def explain_global(model: str = Query("hybrid", description="Model: cnn | lstm |
 
 
 @router.get("/api/explain/local")
-def explain_local(
+async def explain_local(
     model: str = Query("hybrid"),
     feature_values: str = Query(
         "",
         description="Comma-separated feature values matching the model's feature order",
     ),
+    top: int = Query(10, ge=1, le=100, description="Number of contributions to return"),
 ):
-    """Return SHAP-like explanation for a single row (approximate via coef/importance)."""
+    """Return exact SHAP contributions for a single row, for its predicted class.
+
+    Tree models use TreeSHAP, lstm the closed-form linear attribution (see
+    attribution.py); base_value + Σ contributions equals the model output.
+    """
     _registry = _get_registry()
     model = model.strip().lower()
     if model not in _registry:
@@ -62,20 +90,107 @@ def explain_local(
     state = _registry[model]
     if not state.trained or state.clf is None:
         raise HTTPException(503, "Model not ready yet.")
+    _require_explainer(model, state)
+
+    try:
+        values = [float(v) for v in feature_values.split(",") if v.strip()]
+    except ValueError:
+        raise HTTPException(400, "feature_values must be comma-separated numbers.")
+    if not np.isfinite(values).all():
+        raise HTTPException(400, "feature_values must be finite (no nan or inf).")
+    if len(values) != len(state.feature_cols):
+        raise HTTPException(
+            400,
+            f"Expected {len(state.feature_cols)} feature values in order: "
+            + ", ".join(state.feature_cols),
+        )
+
+    from main import friendly_label
+    try:
+        result = await inference.executor.run(
+            model, attribution.explain_rows_job, model, np.asarray([values])
+        )
+    except HTTPException:
+        raise
+    except Exception as exc:
+        raise HTTPException(400, f"Explanation error: {exc}")
+
+    phi   = result["phi"][0]
+    order = np.argsort(-np.abs(phi))[:top]
+    raw_label = str(state.label_encoder.inverse_transform([result["pred"][0]])[0])
+    return {
+        "model":       model,
+        "label":       friendly_label(raw_label),
+        "confidence":  round(float(result["proba"][0]), 4),
+        "output":      result["output"],
+        "base_value":  round(float(result["base"][0]), 6),
+        "explanation": [
+            {
+                "feature":      state.feature_cols[i],
+                "value":        values[i],
+                "contribution": round(float(phi[i]), 6),
+            }
+            for i in order
+        ],
+    }
+
+
+@router.post("/api/explain/batch")
+async def explain_batch(
+    file: UploadFile = File(...),
+    model: str = Query("hybrid", description="Model: cnn | lstm | hybrid"),
+    top_k: int = Query(5, ge=1, le=50, description="Contributions per flagged row"),
+):
+    """Explain every flagged (non-benign) row of an uploaded CSV.
 
-    clf = state.clf
-    if hasattr(clf, "feature_importances_"):
-        raw = clf.feature_importances_
-    elif hasattr(clf, "coef_"):
-        raw = np.abs(clf.coef_).mean(axis=0)
-    else:
-        raw = np.ones(len(state.feature_cols))
-
-    total = raw.sum() or 1.0
-    explanation = [
-        {"feature": col, "contribution": round(float(raw[i]) / total, 4)}
-        for i, col in enumerate(state.feature_cols)
-    ]
-    explanation.sort(key=lambda x: x["contribution"], reverse=True)
+    The file is split into EXPLAIN_CHUNK_ROWS-row chunks that are explained in
+    parallel on the explain executor (a process pool sharing the read-only
+    model bundle). The response is NDJSON: one line per flagged row, in file
+    order, then a final {"summary": ...} line.
+    """
+    _registry = _get_registry()
+    model = model.strip().lower()
+    if model not in _registry:
+        raise HTTPException(400, f"Unknown model '{model}'. Valid: cnn, lstm, hybrid")
 
-    return {"model": model, "explanation": explanation[:10]}
+    state = _registry[model]
+    if not state.trained or state.clf is None:
+        raise HTTPException(503, "Model not ready yet.")
+    _require_explainer(model, state)
+
+    try:
+        chunks = await asyncio.to_thread(
+            scoring.open_chunks, file.file, attribution.EXPLAIN_CHUNK_ROWS
+        )
+    except Exception as exc:
+        raise HTTPException(400, f"Failed to parse CSV: {exc}")
+    if chunks is None:
+        raise HTTPException(400, "Uploaded CSV is empty.")
+
+    from main import friendly_label
+    labels = [friendly_label(str(c)) for c in state.label_encoder.classes_]
+
+    async def ndjson():
+        t0 = time.perf_counter()
+        rows = flagged = 0
+        try:
+            async for chunk in attribution.explain_stream(model, chunks, labels, top_k):
+                rows    += chunk.rows
+                flagged += chunk.flagged
+                if chunk.payload:
+                    yield chunk.payload
+        except Exception as exc:
+            detail = exc.detail if isinstance(exc, HTTPException) else str(exc)
+            yield json.dumps({"error": f"Failed to explain CSV: {detail}"}) + "\n"
+            return
+        elapsed = time.perf_counter() - t0
+        log.info(f"explain-batch  model={model}  rows={rows}  flagged={flagged}  {elapsed:.2f}s")
+        yield json.dumps({"summary": {
+            "model":      model,
+            "total_rows": rows,
+            "flagged":    flagged,
+            "top_k":      top_k,
+            "seconds":    round(elapsed, 3),
+        }}) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
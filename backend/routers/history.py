@@ -1,15 +1,86 @@
-from fastapi import APIRouter
+"""
+History router — stored upload runs and their per-row results.
+Endpoints: GET /api/history, GET /api/runs, GET /api/runs/{run_id}
+
+All listings use keyset pagination: pass the returned `next_cursor` back as
+`cursor` to get the next page. Each page is an index range scan, so its cost
+does not grow with the size of the history.
+"""
+from __future__ import annotations
+
+import datetime
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+import db
 
 router = APIRouter()
 
+
+def parse_time(value: Optional[str], name: str) -> Optional[float]:
+    """Epoch seconds or ISO-8601 → epoch seconds."""
+    if value is None or not value.strip():
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.datetime.fromisoformat(value.strip()).timestamp()
+    except ValueError:
+        raise HTTPException(400, f"'{name}' must be epoch seconds or an ISO-8601 time.")
+
+
+def _list(cursor, limit, model, label, since, until, with_summary) -> dict:
+    runs, next_cursor = db.list_runs(
+        limit,
+        before       = cursor,
+        model        = model.strip().lower() if model else None,
+        label        = label,
+        since        = parse_time(since, "since"),
+        until        = parse_time(until, "until"),
+        with_summary = with_summary,
+    )
+    return {"runs": runs, "limit": limit, "next_cursor": next_cursor}
+
+
 @router.get("/api/history")
-def get_history(page: int = 1, limit: int = 20):
-    return {"runs": [], "page": page, "limit": limit}
+def get_history(
+    cursor: Optional[int] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(20, ge=1, le=200),
+    model: Optional[str] = Query(None, description="cnn | lstm | hybrid"),
+    label: Optional[str] = Query(None, description="Overall label, e.g. 'DDoS Attack'"),
+    since: Optional[str] = Query(None, description="Epoch seconds or ISO-8601, inclusive"),
+    until: Optional[str] = Query(None, description="Epoch seconds or ISO-8601, exclusive"),
+):
+    """Newest-first run history, including each run's stored summary."""
+    return _list(cursor, limit, model, label, since, until, with_summary=True)
+
 
 @router.get("/api/runs")
-def get_runs(page: int = 1, limit: int = 20):
-    return {"runs": [], "page": page, "limit": limit}
+def get_runs(
+    cursor: Optional[int] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(20, ge=1, le=200),
+    model: Optional[str] = Query(None, description="cnn | lstm | hybrid"),
+    label: Optional[str] = Query(None, description="Overall label, e.g. 'DDoS Attack'"),
+    since: Optional[str] = Query(None, description="Epoch seconds or ISO-8601, inclusive"),
+    until: Optional[str] = Query(None, description="Epoch seconds or ISO-8601, exclusive"),
+):
+    """Newest-first list of runs (without summaries)."""
+    return _list(cursor, limit, model, label, since, until, with_summary=False)
+
 
 @router.get("/api/runs/{run_id}")
-def get_run(run_id: int):
-    return {"run_id": run_id, "results": []}
+def get_run(
+    run_id: int,
+    cursor: int = Query(-1, description="next_cursor (row_id) from the previous page"),
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """One run with a page of its per-row results, ordered by row_id."""
+    run = db.get_run(run_id)
+    if run is None:
+        raise HTTPException(404, f"Run {run_id} not found.")
+    results, next_cursor = db.run_results(run_id, cursor, limit)
+    return {"run_id": run_id, "run": run, "results": results, "limit": limit,
+            "next_cursor": next_cursor}
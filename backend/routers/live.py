@@ -1,166 +1,193 @@
 """
-Live monitoring router — real system network stats via psutil.
+Live monitoring router — real system network stats, served from the shared
+net_sampler snapshot.
 """
 from __future__ import annotations
 
 import time
 import datetime
-import psutil
-from fastapi import APIRouter
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+import alert_store
+import db
+import flow_graph
+import live_push
+import net_sampler
 
 router = APIRouter()
 
 # ─── Uptime tracking ─────────────────────────────────────────────────────────
 _start_time = time.time()
 
-# ─── Rolling packet rate tracking ────────────────────────────────────────────
-_last_net_io = None
-_last_net_time = None
-
-# ─── Simple in-memory alerts log ────────────────────────────────────────────
-_alerts: list[dict] = []
-_max_alerts = 50
-
-def _classify_connection(conn) -> str | None:
-    """Return threat label for a connection, or None if benign."""
-    try:
-        raddr = conn.raddr
-        if not raddr:
-            return None
-        port = raddr.port
-        # Known risky ports
-        if port in (22, 23, 3389, 21, 445, 139):
-            return "Brute Force"
-        if port in (53,) and conn.type and conn.type.name == "SOCK_DGRAM":
-            return "Probe"
-    except Exception:
-        pass
-    return None
-
-
-def _get_packet_rate() -> float:
-    """Return estimated packets/sec since last call."""
-    global _last_net_io, _last_net_time
-    now = time.time()
-    try:
-        io = psutil.net_io_counters()
-    except Exception:
-        return 0.0
+# ─── Alerts ──────────────────────────────────────────────────────────────────
+# Detected alerts go through the shared AlertStore; repeats of a
+# (type, remote endpoint) inside its suppression window only bump a count.
 
-    if _last_net_io is None or _last_net_time is None:
-        _last_net_io = io
-        _last_net_time = now
-        return 0.0
+def record_alerts(alerts: list[dict]) -> None:
+    """Store detected alerts (network sampler, Zeek ingest); the ones that are
+    not suppressed are queued for the alerts table and pushed to subscribers."""
+    if not alerts:
+        return
+    fresh = alert_store.store.add_many(alerts)
+    if fresh:
+        _persist(fresh)
+        live_push.broadcaster.publish("alerts", {"alerts": fresh[::-1]})
 
-    elapsed = now - _last_net_time
-    if elapsed < 0.1:
-        return 0.0
 
-    sent_diff = io.packets_sent - _last_net_io.packets_sent
-    recv_diff = io.packets_recv - _last_net_io.packets_recv
-    rate = (sent_diff + recv_diff) / elapsed
-
-    _last_net_io = io
-    _last_net_time = now
-    return round(rate, 1)
+def _persist(alerts: list[dict]) -> None:
+    now = time.time()
+    db.writer.add_alerts([
+        (None, a["type"], a["threat"], a.get("confidence"),
+         datetime.datetime.fromtimestamp(a.get("ts", now)).isoformat(timespec="seconds"))
+        for a in alerts
+    ])
+    db.writer.add_rollups(db.rollup_rows("alert", (
+        (a.get("ts", now), a.get("model") or "live", a["type"], 1) for a in alerts
+    )))
 
 
 # ─── Endpoints ───────────────────────────────────────────────────────────────
+# All reads come from the shared snapshot (net_sampler), never from psutil.
 
-@router.get("/api/live/metrics")
-def live_metrics():
-    """Real-time network metrics from the host machine."""
-    # Packet rate
-    pkt_rate = _get_packet_rate()
-
-    # Active connections
-    try:
-        conns = psutil.net_connections(kind="inet")
-        active = [c for c in conns if c.status == "ESTABLISHED"]
-        active_count = len(active)
-    except Exception:
-        conns = []
-        active = []
-        active_count = 0
-
+def _metrics(snap: net_sampler.NetSnapshot) -> dict:
     # Uptime %
     uptime_seconds = time.time() - _start_time
     uptime_pct = min(100.0, round(uptime_seconds / max(uptime_seconds + 1, 1) * 100, 1))
 
-    # Detect suspicious connections and log alerts
-    now_str = datetime.datetime.now().strftime("%H:%M:%S")
-    for conn in conns:
-        threat = _classify_connection(conn)
-        if threat:
-            # Avoid duplicate alerts within same second
-            if not _alerts or _alerts[-1]["type"] != threat or _alerts[-1]["time"] != now_str:
-                level = "HIGH" if threat in ("Brute Force",) else "MED"
-                _alerts.append({"time": now_str, "type": threat, "threat": level})
-                if len(_alerts) > _max_alerts:
-                    _alerts.pop(0)
-
-    # Net IO totals
-    try:
-        io = psutil.net_io_counters()
-        bytes_sent = io.bytes_sent
-        bytes_recv = io.bytes_recv
-    except Exception:
-        bytes_sent = 0
-        bytes_recv = 0
-
     return {
-        "packets_per_sec": pkt_rate,
-        "active_connections": active_count,
-        "alerts_today": len(_alerts),
+        "packets_per_sec": snap.packets_per_sec,
+        "active_connections": snap.active_connections,
+        "alerts_today": len(alert_store.store),
         "uptime_pct": uptime_pct,
-        "bytes_sent": bytes_sent,
-        "bytes_recv": bytes_recv,
+        "bytes_sent": snap.bytes_sent,
+        "bytes_recv": snap.bytes_recv,
+        "bytes_sent_per_sec": snap.bytes_sent_per_sec,
+        "bytes_recv_per_sec": snap.bytes_recv_per_sec,
+        "sampled_at": snap.taken_at,
     }
 
 
+@router.get("/api/live/metrics")
+def live_metrics():
+    """Real-time network metrics from the host machine."""
+    return _metrics(net_sampler.sampler.snapshot())
+
+
 @router.get("/api/live/alerts")
-def live_alerts():
-    """Return recent alerts list (real detections from connections)."""
-    return {"alerts": list(reversed(_alerts[-20:]))}
+def live_alerts(
+    limit: int = Query(20, ge=1, le=1000),
+    threat: Optional[str] = Query(None, description="Severity: HIGH | MED"),
+    type: Optional[str] = Query(None, description="e.g. 'Brute Force'"),
+    source: Optional[str] = Query(None, description="psutil | zeek"),
+    since: Optional[float] = Query(None, description="Last seen at or after (epoch seconds)"),
+):
+    """Recent alerts, newest first. Each entry carries `count`, `first_seen` and
+    `last_seen` for repeats folded into it."""
+    return {"alerts": alert_store.store.query(limit, threat=threat, type=type, source=source, since=since)}
+
+
+@router.get("/api/live/alerts/summary")
+def live_alerts_summary():
+    """Entry and occurrence counts by severity, type and source."""
+    return {**alert_store.store.counts(), "stats": alert_store.store.stats()}
 
 
 @router.get("/api/live/connections")
 def live_connections():
     """Return real active TCP/UDP connections from this machine."""
-    try:
-        conns = psutil.net_connections(kind="inet")
-    except Exception:
-        return {"connections": []}
-
-    rows = []
-    for c in conns:
-        if not c.raddr:
-            continue
-        try:
-            threat = _classify_connection(c)
-            threat_level = "HIGH" if threat in ("Brute Force",) else ("MED" if threat else "LOW")
-            rows.append({
-                "src_ip": f"{c.laddr.ip}:{c.laddr.port}" if c.laddr else "-",
-                "dst_ip": f"{c.raddr.ip}:{c.raddr.port}",
-                "protocol": "TCP" if (c.type and "STREAM" in c.type.name) else "UDP",
-                "status": c.status or "NONE",
-                "threat": threat_level,
-            })
-        except Exception:
-            continue
-
-    return {"connections": rows[:50]}
+    return {"connections": list(net_sampler.sampler.snapshot().connections)}
 
 
 @router.get("/api/live/traffic-history")
-def live_traffic_history():
-    """Return the last 20 packet-rate samples (sampled on each call)."""
-    # We just return current snapshot; actual rolling history
-    # is maintained client-side by polling this endpoint repeatedly.
-    pkt_rate = _get_packet_rate()
-    return {"sample": pkt_rate}
+def live_traffic_history(
+    resolution: str = Query("1s", description="1s (last 10 min) | 1m (last 24 h)"),
+    seconds: Optional[float] = Query(None, gt=0, description="Window ending now; ignored if since is given"),
+    since: Optional[float] = Query(None, description="Epoch seconds, inclusive"),
+    until: Optional[float] = Query(None, description="Epoch seconds, exclusive"),
+    points: Optional[int] = Query(None, ge=1, le=5000, description="Average down to at most this many points"),
+):
+    """Server-side traffic history at the requested resolution.
+
+    Returns parallel arrays: `t` (bucket start, epoch seconds) and one list per
+    field in traffic_history.FIELDS. `sample` is the latest packets/sec.
+    """
+    history = net_sampler.sampler.history
+    if resolution not in history.tiers:
+        raise HTTPException(400, f"resolution must be one of {sorted(history.tiers)}")
+    if since is None and seconds is not None:
+        since = time.time() - seconds
+    window = history.window(resolution, since=since, until=until, max_points=points)
+    return {"sample": net_sampler.sampler.snapshot().packets_per_sec, **window}
+
+
+# ─── Push channel (SSE) ──────────────────────────────────────────────────────
+# The sampler calls publish_snapshot once per tick; each event is encoded once
+# and fanned out to every /api/live/stream subscriber.
+
+_connections: dict = {}   # key → row, as of the last published tick
+
+
+def _connection_key(row: dict) -> str:
+    return f"{row['protocol']} {row['src_ip']} {row['dst_ip']}"
+
+
+def publish_snapshot(snap: net_sampler.NetSnapshot) -> None:
+    """Push a sampler tick: metrics, then only the changed connection rows.
+    Connections not seen on the previous tick also go into the flow graph."""
+    global _connections
+    previous = _connections
+    _connections, upsert, remove = live_push.diff_rows(_connections, snap.connections, _connection_key)
+    flow_graph.graph.apply(_connection_flows(
+        [row for key, row in upsert.items() if key not in previous], {remote: threat for threat, remote in snap.flagged},
+    ))
+    live_push.broadcaster.publish("metrics", _metrics(snap))
+    if upsert or remove:
+        live_push.broadcaster.publish("connections", {"upsert": upsert, "remove": remove})
+
+
+def _connection_flows(rows: list[dict], flagged: dict) -> flow_graph.FlowBatch:
+    """New live connections as one flow each (no byte counts from psutil)."""
+    if not rows:
+        return flow_graph.FlowBatch()
+    local  = [r["src_ip"].rsplit(":", 1)[0] for r in rows]
+    remote = [r["dst_ip"].rsplit(":", 1) for r in rows]
+    return flow_graph.aggregate(
+        pd.DataFrame({
+            "src_ip":   local,
+            "dst_ip":   [ip for ip, _ in remote],
+            "dst_port": [int(port) for _, port in remote],
+        }),
+        np.array([flagged.get(r["dst_ip"]) for r in rows], dtype=object),
+        source="live",
+    )
+
+
+@router.get("/api/live/stream")
+async def live_stream():
+    """Server-Sent Events: `metrics` every tick, `connections` diffs
+    ({upsert: {key: row}, remove: [key]}) and `alerts` (newest first) as they
+    are detected. The first `connections` and `alerts` events carry reset=true."""
+    def initial() -> list[bytes]:
+        # Built once the subscriber is registered: diffs published meanwhile
+        # are queued behind this state, and re-applying them is harmless.
+        return [
+            live_push.encode("metrics", _metrics(net_sampler.sampler.snapshot())),
+            live_push.encode("connections", {"reset": True, "upsert": dict(_connections), "remove": []}),
+            live_push.encode("alerts", {"reset": True, "alerts": alert_store.store.query(20)}),
+        ]
+
+    return StreamingResponse(
+        live_push.broadcaster.stream(initial),
+        media_type = "text/event-stream",
+        headers    = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.get("/api/live/status")
 def live_status():
-    return {"status": "running", "mode": "real"}
+    return {"status": "running", "mode": "real", "push": live_push.broadcaster.stats()}
@@ -1,27 +1,36 @@
 """
-Metrics router — returns real cross-validated metrics from trained sklearn models.
+Metrics router — serves cross-validated metrics cached with each model and
+detection charts from the DB rollups.
 Endpoints: GET /api/metrics, GET /api/charts
 """
 from __future__ import annotations
 
-import numpy as np
-import pandas as pd
+import time
+from typing import Optional
+
 from fastapi import APIRouter, HTTPException, Query
-from sklearn.metrics import f1_score, precision_score, recall_score
-from sklearn.model_selection import cross_val_predict
+
+import db
+import ml_infer
+from routers.history import parse_time
 
 router = APIRouter()
 
 
-def _get_state():
-    from main import _registry, TRAIN_CSV, generate_training_data, extract_features
-    return _registry, TRAIN_CSV, generate_training_data, extract_features
+def _get_registry():
+    from main import _registry
+    return _registry
 
 
 @router.get("/api/metrics")
 def get_metrics(model: str = Query("hybrid", description="Model: cnn | lstm | hybrid")):
-    """Return real cross-validated accuracy / F1 / precision / recall for the chosen model."""
-    _registry, TRAIN_CSV, generate_training_data, extract_features = _get_state()
+    """Return cross-validated accuracy / F1 / precision / recall, per-class
+    metrics and the confusion matrix for the chosen model.
+
+    Computed once at training time (training.evaluate_cv) and stored in the
+    model bundle, so this is a dictionary lookup.
+    """
+    _registry = _get_registry()
     model = model.strip().lower()
     if model not in _registry:
         raise HTTPException(400, f"Unknown model '{model}'. Valid: cnn, lstm, hybrid")
@@ -30,46 +39,93 @@ def get_metrics(model: str = Query("hybrid", description="Model: cnn | lstm | hy
     if not state.trained or state.clf is None:
         raise HTTPException(503, "Model not ready yet.")
 
-    df_train = pd.read_csv(TRAIN_CSV) if TRAIN_CSV.exists() else generate_training_data()
-    labels = df_train["label"].values
-    X_tr, _ = extract_features(df_train, expected_cols=state.feature_cols)
-    X_sc = state.scaler.transform(X_tr)
-    y_tr = state.label_encoder.transform(labels)
-
-    preds = cross_val_predict(state.clf, X_sc, y_tr, cv=5)
-    acc  = float((preds == y_tr).mean())
-    f1   = float(f1_score(y_tr, preds, average="macro", zero_division=0))
-    prec = float(precision_score(y_tr, preds, average="macro", zero_division=0))
-    rec  = float(recall_score(y_tr, preds, average="macro", zero_division=0))
+    ev = state.evaluation
+    if not ev:
+        backend = ml_infer.backend_of(state.clf)
+        if backend != "sklearn":
+            raise HTTPException(
+                503, f"Model '{model}' is served from an exported {backend} model; "
+                     "it has no cross-validated evaluation."
+            )
+        raise HTTPException(503, "Model evaluation not available.")
 
     return {
         "model": model,
-        "accuracy":  round(acc  * 100, 2),
-        "f1":        round(f1   * 100, 2),
-        "precision": round(prec * 100, 2),
-        "recall":    round(rec  * 100, 2),
+        "accuracy":  round(ev["accuracy"]  * 100, 2),
+        "f1":        round(ev["f1"]        * 100, 2),
+        "precision": round(ev["precision"] * 100, 2),
+        "recall":    round(ev["recall"]    * 100, 2),
+        "cv_folds":  ev["cv_folds"],
+        "per_class": {
+            cls: {k: (round(v * 100, 2) if k != "support" else v) for k, v in m.items()}
+            for cls, m in ev["per_class"].items()
+        },
+        "classes":          ev["classes"],
+        "confusion_matrix": ev["confusion_matrix"],
     }
 
 
+# At most this many buckets per chart when the grain is chosen automatically.
+MAX_POINTS = 1500
+
+
+def _auto_grain(since: Optional[float], until: float) -> str:
+    span = until - since if since is not None else float("inf")
+    for grain, step in db.GRAINS.items():
+        if span / step <= MAX_POINTS:
+            return grain
+    return "day"
+
+
 @router.get("/api/charts")
 def get_charts(
-    from_: str = Query(None, alias="from"),
-    to: str    = Query(None),
-    model: str = Query("hybrid"),
+    from_: Optional[str] = Query(None, alias="from", description="Epoch seconds or ISO-8601; default: all history"),
+    to: Optional[str]    = Query(None, description="Epoch seconds or ISO-8601; default: now"),
+    model: str           = Query("hybrid", description="cnn | lstm | hybrid | all"),
+    grain: Optional[str] = Query(None, description="minute | hour | day; default: by window length"),
 ):
-    """Return available chart data for detections over time."""
-    _registry, TRAIN_CSV, generate_training_data, extract_features = _get_state()
-    state = _registry.get(model.strip().lower())
-    if not state or not state.trained:
-        return {"detections": [], "attacks": [], "performance": []}
-
-    classes = list(state.label_encoder.classes_)
-    performance = [
-        {"class": cls, "samples": 80}
-        for cls in classes
-    ]
+    """Detections over time from the minute/hour/day rollups.
+
+    `series` has one point per bucket ({t, counts: {label: n}}), `detections`
+    and `attacks` the per-label totals over the window, `alerts` the alert
+    totals. from/to are rounded to the grain. Reads only the rollups table.
+    """
+    from main import friendly_label
+    _registry = _get_registry()
+    model = model.strip().lower()
+    if model != "all" and model not in _registry:
+        raise HTTPException(400, f"Unknown model '{model}'. Valid: cnn, lstm, hybrid, all")
+    if grain is not None and grain not in db.GRAINS:
+        raise HTTPException(400, f"grain must be one of {list(db.GRAINS)}")
+
+    since = parse_time(from_, "from")
+    until = parse_time(to, "to") or time.time()
+    grain = grain or _auto_grain(since, until)
+    scope = None if model == "all" else model
+
+    series: dict[int, dict] = {}
+    totals: dict[str, int]  = {}
+    for bucket, label, count in db.chart_series(grain, "detection", scope, since, until):
+        series.setdefault(bucket, {})[label] = count
+        totals[label] = totals.get(label, 0) + count
+    alerts: dict[str, int] = {}
+    for _, label, count in db.chart_series(grain, "alert", scope, since, until):
+        alerts[label] = alerts.get(label, 0) + count
+
+    benign = friendly_label("benign")
+    ranked = sorted(totals.items(), key=lambda kv: -kv[1])
+    state  = _registry.get(model)
+    ev     = state.evaluation if state is not None and state.trained else None
     return {
-        "detections": [{"label": cls, "count": 80} for cls in classes],
-        "attacks":    [{"label": cls, "count": 80} for cls in classes if cls != "benign"],
-        "performance": performance,
+        "model":       model,
+        "grain":       grain,
+        "from":        since,
+        "to":          until,
+        "series":      [{"t": t, "counts": counts} for t, counts in series.items()],
+        "detections":  [{"label": label, "count": n} for label, n in ranked],
+        "attacks":     [{"label": label, "count": n} for label, n in ranked if label != benign],
+        "alerts":      [{"label": label, "count": n} for label, n in sorted(alerts.items(), key=lambda kv: -kv[1])],
+        "performance": [
+            {"class": cls, "samples": m["support"]} for cls, m in ev["per_class"].items()
+        ] if ev else [],
     }
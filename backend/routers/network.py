@@ -1,11 +1,45 @@
-from fastapi import APIRouter
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+import flow_graph
+import net_sampler
+from routers.history import parse_time
 
 router = APIRouter()
 
+@router.get("/api/network/summary")
+def network_summary():
+    """Return real network interface stats (from the shared sampler snapshot)."""
+    snap = net_sampler.sampler.snapshot()
+    out  = {
+        "interfaces": list(snap.interfaces),
+        "total_connections": snap.total_connections,
+        "established": snap.active_connections,
+    }
+    if snap.errors:
+        out["error"] = "; ".join(f"{k}: {v}" for k, v in snap.errors.items())
+    return out
+
 @router.get("/api/network/graph")
-def network_graph(from_: str = None, to: str = None):
-    return {"nodes": [], "edges": []}
+def network_graph(
+    from_: Optional[str] = Query(None, alias="from", description="Epoch seconds or ISO-8601, inclusive"),
+    to: Optional[str] = Query(None, description="Epoch seconds or ISO-8601, exclusive"),
+    limit: int = Query(500, ge=1, le=10000, description="Max edges, heaviest first"),
+):
+    """Hosts and host-to-host edges with traffic in the window, from the
+    incremental flow graph (uploads, Zeek ingest, live connections)."""
+    return flow_graph.graph.graph(parse_time(from_, "from"), parse_time(to, "to"), limit)
 
 @router.get("/api/network/node/{id}")
-def network_node(id: int):
-    return {"node": {"id": id, "top_ports": [], "last_alerts": []}}
+def network_node(
+    id: int,
+    from_: Optional[str] = Query(None, alias="from", description="Epoch seconds or ISO-8601, inclusive"),
+    to: Optional[str] = Query(None, description="Epoch seconds or ISO-8601, exclusive"),
+    top: int = Query(10, ge=1, le=100),
+):
+    """One host: totals, top destination ports, last alerts and busiest peers."""
+    node = flow_graph.graph.node(id, parse_time(from_, "from"), parse_time(to, "to"), top)
+    if node is None:
+        raise HTTPException(404, f"Node {id} not found (unknown or evicted).")
+    return {"node": node}
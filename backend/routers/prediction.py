@@ -1,16 +1,24 @@
 """
 Prediction router — uses the shared sklearn model registry from main.py.
-Endpoints: POST /api/upload-csv, POST /api/predict
+Endpoints: POST /api/upload-csv, POST /api/compare, POST /api/predict
 """
 from __future__ import annotations
 
-import io
+import asyncio
+import datetime
+import json
 import logging
 import time
 
 import numpy as np
-import pandas as pd
 from fastapi import APIRouter, File, HTTPException, Query, UploadFile
+from fastapi.responses import Response, StreamingResponse
+
+import batching
+import db
+import inference
+import model_registry
+import scoring
 
 log = logging.getLogger("cyber-ids")
 router = APIRouter()
@@ -26,8 +34,14 @@ def _get_registry():
 async def upload_csv(
     file: UploadFile = File(...),
     model: str = Query("hybrid", description="Model: cnn | lstm | hybrid"),
+    stream: bool = Query(False, description="Stream per-row results as NDJSON (lifts the upload limit)"),
 ):
-    """Upload a CSV file and run ML inference. Returns per-row results + summary."""
+    """Upload a CSV file and run ML inference. Returns per-row results + summary.
+
+    The file is parsed and scored in chunks of SCORE_CHUNK_ROWS rows. With
+    stream=true the response is NDJSON: one line per row, then a final
+    {"run_id", "summary"} line, so arbitrarily large files use constant memory.
+    """
     _registry, extract_features, friendly_label, risk_level = _get_registry()
 
     model = model.strip().lower()
@@ -38,74 +52,159 @@ async def upload_csv(
     if not state.trained:
         raise HTTPException(503, "Model not ready yet — please retry in a moment.")
 
-    # --- parse CSV ---
+    # --- parse CSV (first chunk eagerly, the rest lazily) ---
     try:
-        raw = await file.read()
-        df = pd.read_csv(io.BytesIO(raw))
+        chunks = await asyncio.to_thread(scoring.open_chunks, file.file)
     except Exception as exc:
         raise HTTPException(400, f"Failed to parse CSV: {exc}")
 
-    if df.empty:
+    if chunks is None:
         raise HTTPException(400, "Uploaded CSV is empty.")
 
-    if file.size and file.size > 20 * 1024 * 1024:
-        raise HTTPException(400, "File too large (max 20 MB).")
+    run_id = db.new_run_id()
+    acc    = scoring.RunAccumulator(state)
+    labels = [friendly_label(str(c)) for c in state.label_encoder.classes_]
+
+    def record(summary: dict) -> None:
+        db.writer.add_run(
+            run_id, model, datetime.datetime.now().isoformat(timespec="seconds"),
+            summary["overall_label"], acc.rows,
+            json.dumps({"benign": acc.benign, "attack": acc.attack}), json.dumps(summary),
+        )
+
+    def summarize() -> dict:
+        mean_proba = acc.mean_proba
+        top_idx = int(np.argmax(mean_proba))
+        top_raw = str(state.label_encoder.inverse_transform([top_idx])[0])
+        return {
+            "model": model,
+            "total_rows": acc.rows,
+            "benign": acc.benign,
+            "attack": acc.attack,
+            "overall_label": friendly_label(top_raw),
+            "overall_confidence": round(float(mean_proba[top_idx]), 4),
+            "overall_risk": risk_level(float(mean_proba[top_idx]), top_raw),
+            "latency": round(acc.latency, 4),
+            "demo_mode": False,
+        }
 
-    # --- features ---
+    # --- inference (chunks are scored and rendered on the inference executor) ---
+    if stream:
+        async def ndjson():
+            try:
+                async for chunk in scoring.score_stream(model, chunks, labels, "ndjson", run_id):
+                    acc.add(chunk)
+                    scoring.record_chunk(model, labels, chunk)
+                    yield chunk.payload
+            except Exception as exc:
+                yield json.dumps({"error": f"Failed to score CSV: {exc}"}) + "\n"
+                return
+            log.info(f"upload-csv  model={model}  rows={acc.rows}  latency={acc.latency:.4f}s  stream")
+            summary = summarize()
+            record(summary)
+            yield json.dumps({"run_id": run_id, "summary": summary}) + "\n"
+
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    parts: list[str] = []
     try:
-        X, _ = extract_features(df, expected_cols=state.feature_cols)
+        async for chunk in scoring.score_stream(model, chunks, labels, "json", run_id):
+            acc.add(chunk)
+            scoring.record_chunk(model, labels, chunk)
+            parts.append(chunk.payload)
+    except HTTPException:
+        raise
     except ValueError as exc:
         raise HTTPException(400, str(exc))
+    except Exception as exc:
+        raise HTTPException(400, f"Failed to parse CSV: {exc}")
+
+    summary = summarize()
+    record(summary)
+    log.info(f"upload-csv  model={model}  rows={acc.rows}  latency={summary['latency']}s")
+    # Rows arrive pre-rendered as JSON; splice them in rather than re-encoding.
+    head = json.dumps({"run_id": run_id, "summary": summary})[:-1]
+    body = head + ', "results": [' + ",".join(p for p in parts if p) + "]}"
+    return Response(content=body, media_type="application/json")
+
+
+@router.post("/api/compare")
+async def compare_models(
+    file: UploadFile = File(...),
+    models: str = Query("cnn,lstm,hybrid", description="Comma-separated models to compare"),
+    detail: str = Query("disagreements", pattern="^(none|disagreements|all)$",
+                        description="Rows to return: none | disagreements | all"),
+    max_rows: int = Query(1000, ge=0, le=100_000, description="Maximum rows returned"),
+):
+    """Score one CSV with several models in a single pass.
+
+    Each chunk is parsed, feature-extracted and scaled once, and the models
+    then run concurrently on the same matrix (scoring.compare_chunk), so a
+    three-way comparison costs about one upload plus the extra predicts.
+    Returns per-model verdicts and latency, agreement statistics (unanimous
+    rows, rows per number of agreeing models, pairwise agreement rates,
+    majority label counts) and the rows selected by `detail`.
+    """
+    _registry, extract_features, friendly_label, risk_level = _get_registry()
+
+    names = list(dict.fromkeys(m.strip().lower() for m in models.split(",") if m.strip()))
+    unknown = [m for m in names if m not in _registry]
+    if unknown or not names:
+        raise HTTPException(400, f"Unknown model(s) {unknown}. Valid: {', '.join(_registry)}")
+    states = [_registry[m] for m in names]
+    if not all(s.trained for s in states):
+        raise HTTPException(503, "Model not ready yet — please retry in a moment.")
+    classes = states[0].label_encoder.classes_
+    if any(not np.array_equal(s.label_encoder.classes_, classes) for s in states[1:]):
+        raise HTTPException(400, "Models were trained on different label sets and cannot be compared.")
 
-    # --- inference ---
     t0 = time.perf_counter()
-    X_scaled = state.scaler.transform(X)
-    proba = state.clf.predict_proba(X_scaled)          # (n_rows, n_classes)
-    preds_idx = proba.argmax(axis=1)                   # per-row class index
-    confs = proba.max(axis=1)                          # per-row confidence
-    latency = round(time.perf_counter() - t0, 4)
-
-    # --- labels ---
-    raw_labels = state.label_encoder.inverse_transform(preds_idx)
-
-    # --- summary ---
-    benign_count = int((raw_labels == "benign").sum())
-    attack_count = int(len(raw_labels) - benign_count)
-
-    # mean proba for overall verdict
-    mean_proba = proba.mean(axis=0)
-    top_idx = int(np.argmax(mean_proba))
-    top_raw = str(state.label_encoder.inverse_transform([top_idx])[0])
-
-    summary = {
-        "model": model,
-        "total_rows": len(df),
-        "benign": benign_count,
-        "attack": attack_count,
-        "overall_label": friendly_label(top_raw),
-        "overall_confidence": round(float(mean_proba[top_idx]), 4),
-        "overall_risk": risk_level(float(mean_proba[top_idx]), top_raw),
-        "latency": latency,
-        "demo_mode": False,
-    }
-
-    results = [
-        {
-            "row_id": i,
-            "prediction": int(preds_idx[i]),
-            "label": friendly_label(str(raw_labels[i])),
-            "confidence": round(float(confs[i]), 4),
-        }
-        for i in range(len(preds_idx))
-    ]
+    try:
+        chunks = await asyncio.to_thread(scoring.open_chunks, file.file)
+    except Exception as exc:
+        raise HTTPException(400, f"Failed to parse CSV: {exc}")
+    if chunks is None:
+        raise HTTPException(400, "Uploaded CSV is empty.")
 
-    log.info(f"upload-csv  model={model}  rows={len(df)}  latency={latency}s")
-    return {"run_id": int(time.time()), "summary": summary, "results": results}
+    labels = [friendly_label(str(c)) for c in classes]
+    acc    = scoring.CompareAccumulator(names, len(labels))
+    try:
+        offset = 0
+        while True:
+            df = await asyncio.to_thread(next, chunks, None)
+            if df is None:
+                break
+            chunk = await inference.executor.run(
+                "compare", scoring.compare_chunk_job,
+                names, df, offset, labels, detail, max_rows - len(acc.details),
+            )
+            offset += chunk.rows
+            acc.add(chunk)
+    except HTTPException:
+        raise
+    except ValueError as exc:
+        raise HTTPException(400, str(exc))
+    except Exception as exc:
+        raise HTTPException(400, f"Failed to parse CSV: {exc}")
+
+    def verdict(mean_proba: np.ndarray) -> tuple[str, float, str]:
+        top_idx = int(np.argmax(mean_proba))
+        top_raw = str(classes[top_idx])
+        return friendly_label(top_raw), round(float(mean_proba[top_idx]), 4), risk_level(float(mean_proba[top_idx]), top_raw)
+
+    summary = acc.summary(labels, verdict)
+    summary["latency"]["total"] = round(time.perf_counter() - t0, 4)
+    log.info(f"compare  models={','.join(names)}  rows={acc.rows}  "
+             f"unanimous={summary['agreement']['unanimous_rate']}  total={summary['latency']['total']}s")
+    return {**summary, "detail": detail, "rows": acc.details}
 
 
 @router.post("/api/predict")
 async def predict_features(features: dict):
-    """Predict from a JSON dict of feature_name→value (single row)."""
+    """Predict from a JSON dict of feature_name→value (single row).
+
+    With PREDICT_BATCHING=1, concurrent calls are micro-batched (see batching.py).
+    """
     _registry, extract_features, friendly_label, risk_level = _get_registry()
 
     state = _registry["hybrid"]
@@ -113,10 +212,13 @@ async def predict_features(features: dict):
         raise HTTPException(503, "Model not ready yet.")
 
     try:
-        df = pd.DataFrame([features])
-        X, _ = extract_features(df, expected_cols=state.feature_cols)
-        X_scaled = state.scaler.transform(X)
-        proba = state.clf.predict_proba(X_scaled)[0]
+        if batching.ENABLED:
+            proba = await batching.batcher("hybrid").submit(features)
+        else:
+            proba = (await inference.executor.run(
+                "hybrid", scoring.predict_rows_job, "hybrid", [features]
+            ))[0]
+        model_registry.shadow.offer("hybrid", [features])
         idx = int(np.argmax(proba))
         conf = float(proba[idx])
         raw_label = str(state.label_encoder.inverse_transform([idx])[0])
@@ -127,5 +229,7 @@ async def predict_features(features: dict):
             "risk": risk_level(conf, raw_label),
             "latency": 0.05,
         }
+    except HTTPException:
+        raise
     except Exception as exc:
         raise HTTPException(400, f"Prediction error: {exc}")
@@ -0,0 +1,104 @@
+"""
+Model registry router — hot reload, candidate promotion and shadow scoring.
+Endpoints: GET /api/models/registry, POST /api/models/reload,
+POST /api/models/promote, DELETE /api/models/candidate,
+GET /api/models/shadow, PUT /api/models/shadow
+"""
+from __future__ import annotations
+
+import logging
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+
+import model_registry
+import model_store
+
+log = logging.getLogger("cyber-ids")
+router = APIRouter()
+
+
+async def _auth(x_api_key: str = Header(default="")) -> None:
+    """Same API key check as POST /predict (lazy import, see _get_main)."""
+    from main import verify_api_key
+    await verify_api_key(x_api_key)
+
+
+def _get_main():
+    """Lazy import to avoid circular dependency with main.py."""
+    from main import MODELS_DIR, load_models
+    return MODELS_DIR, load_models
+
+
+@router.get("/api/models/registry")
+async def registry_status():
+    """Served and candidate versions, recently retired versions, the state of
+    the last background load and the bundles available to load."""
+    models_dir, _ = _get_main()
+    return {
+        **model_registry.registry.stats(),
+        "bundles": model_store.list_bundles(models_dir),
+    }
+
+
+@router.post("/api/models/reload", status_code=202)
+async def reload_models(
+    bundle: str | None = Query(None, description="Bundle directory in MODELS_DIR (default: current training data)"),
+    target: str = Query("production", pattern="^(production|candidate)$"),
+    _auth: None = Depends(_auth),
+):
+    """Load a model set in the background, then swap it in atomically
+    (target=production) or load it for shadow scoring (target=candidate).
+    Requests keep being served by the current version meanwhile; poll
+    GET /api/models/registry for the outcome."""
+    models_dir, load_models = _get_main()
+    if bundle is not None and (
+        "/" in bundle or "\\" in bundle or model_store.manifest_key(models_dir / bundle) is None
+    ):
+        raise HTTPException(404, f"Unknown model bundle '{bundle}'")
+
+    source = f"bundle:{bundle}" if bundle else "reload"
+    if not model_registry.registry.load_in_background(lambda: load_models(bundle), source, target):
+        raise HTTPException(409, "A model load is already in progress.")
+    log.info(f"Model reload started  source={source}  target={target}")
+    return {"status": "loading", "source": source, "target": target}
+
+
+@router.post("/api/models/promote")
+async def promote_candidate(_auth: None = Depends(_auth)):
+    """Serve the candidate version; its shadow statistics are returned."""
+    shadow = model_registry.shadow.stats()
+    try:
+        version = model_registry.registry.promote()
+    except LookupError as exc:
+        raise HTTPException(409, str(exc))
+    return {"serving": version.info(), "shadow": shadow}
+
+
+@router.delete("/api/models/candidate")
+async def drop_candidate(_auth: None = Depends(_auth)):
+    """Unload the candidate and stop shadow scoring."""
+    candidate = model_registry.registry.candidate
+    if candidate is None:
+        raise HTTPException(404, "No candidate version loaded")
+    model_registry.registry.set_candidate(None)
+    return {"dropped": candidate.version}
+
+
+@router.get("/api/models/shadow")
+async def shadow_stats():
+    """Production vs candidate latency and agreement on sampled traffic."""
+    candidate = model_registry.registry.candidate
+    return {
+        "production": model_registry.registry.current.version,
+        "candidate":  candidate.version if candidate is not None else None,
+        **model_registry.shadow.stats(),
+    }
+
+
+@router.put("/api/models/shadow")
+async def set_shadow_rate(
+    rate: float = Query(..., ge=0.0, le=1.0, description="Fraction of scored rows shadow-scored"),
+    _auth: None = Depends(_auth),
+):
+    model_registry.shadow.rate = rate
+    return model_registry.shadow.stats()
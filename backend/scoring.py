@@ -0,0 +1,506 @@
+"""
+Chunked scoring — bounded-memory CSV inference shared by /predict and
+/api/upload-csv.
+
+Uploads are parsed and scored in fixed-size row chunks on the inference
+executor, summaries are accumulated incrementally, and UploadLimitMiddleware
+rejects oversized bodies while they are still arriving instead of after
+parsing. /api/compare scores every chunk with several models at once,
+extracting and scaling its features only once (compare_chunk).
+"""
+from __future__ import annotations
+
+import asyncio
+import datetime
+import itertools
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import IO, AsyncIterator, Iterator
+
+import numpy as np
+import pandas as pd
+from starlette.exceptions import HTTPException
+
+import db
+import flow_graph
+import inference
+import model_registry
+import tree_compiler
+from features import NO_FEATURES_MSG
+
+# ─── Limits ──────────────────────────────────────────────────────────────────
+UPLOAD_LIMIT_MB        = int(os.getenv("UPLOAD_LIMIT_MB", "20"))
+STREAM_UPLOAD_LIMIT_MB = int(os.getenv("STREAM_UPLOAD_LIMIT_MB", "4096"))
+CHUNK_ROWS             = int(os.getenv("SCORE_CHUNK_ROWS", "50000"))
+
+UPLOAD_PATHS = ("/predict", "/api/upload-csv", "/api/compare", "/api/explain/batch")
+STREAM_PATHS = ("/api/explain/batch",)   # always streamed: get the streaming limit
+
+
+def _wants_stream(query_string: bytes) -> bool:
+    for part in query_string.decode("latin-1").split("&"):
+        key, _, value = part.partition("=")
+        if key == "stream" and value.lower() in ("1", "true", "yes", "on"):
+            return True
+    return False
+
+
+class UploadLimitMiddleware:
+    """ASGI middleware enforcing the upload byte limit on UPLOAD_PATHS.
+
+    Requests with `?stream=true`, and all STREAM_PATHS requests, get
+    STREAM_UPLOAD_LIMIT_MB; all others UPLOAD_LIMIT_MB. A declared
+    Content-Length over the limit is rejected before the body is read;
+    otherwise bytes are counted as they arrive and body parsing is aborted
+    with a 413 as soon as the limit is crossed.
+    """
+
+    def __init__(self, app, paths: tuple[str, ...] = UPLOAD_PATHS) -> None:
+        self.app   = app
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+
+        streamed = scope["path"] in STREAM_PATHS or _wants_stream(scope.get("query_string", b""))
+        limit_mb = STREAM_UPLOAD_LIMIT_MB if streamed else UPLOAD_LIMIT_MB
+        limit    = limit_mb * 1024 * 1024
+
+        headers = dict(scope.get("headers") or [])
+        length  = headers.get(b"content-length", b"")
+        if length.isdigit() and int(length) > limit:
+            return await self._reject(send, limit_mb)
+
+        received = 0
+        started  = False
+
+        async def counting_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise HTTPException(413, f"File too large (max {limit_mb} MB).")
+            return message
+
+        async def tracking_send(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, tracking_send)
+        except HTTPException as exc:
+            if exc.status_code != 413 or started:
+                raise
+            await self._reject(send, limit_mb)
+
+    @staticmethod
+    async def _reject(send, limit_mb: int) -> None:
+        body = json.dumps({"detail": f"File too large (max {limit_mb} MB)."}).encode()
+        await send({
+            "type":    "http.response.start",
+            "status":  413,
+            "headers": [(b"content-type", b"application/json"),
+                        (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+# ─── Chunked parsing ─────────────────────────────────────────────────────────
+def open_chunks(fileobj: IO[bytes], chunk_rows: int | None = None) -> Iterator[pd.DataFrame] | None:
+    """Return an iterator of DataFrame chunks, or None if the CSV has no rows.
+
+    The first chunk is parsed eagerly so malformed input raises here, before
+    any response has been started.
+    """
+    fileobj.seek(0)
+    reader = pd.read_csv(fileobj, chunksize=chunk_rows or CHUNK_ROWS)
+    first  = next(reader, None)
+    if first is None or first.empty:
+        return None
+    return itertools.chain([first], reader)
+
+
+def score_frame(state, df: pd.DataFrame) -> tuple[np.ndarray, float]:
+    """Return (proba, seconds spent scaling + predicting) for one chunk."""
+    X        = state.vectorizer.transform(df)
+    t0       = time.perf_counter()
+    X_scaled = state.scaler.transform(X)
+    proba    = tree_compiler.predict_proba(state, X_scaled)
+    return proba, time.perf_counter() - t0
+
+
+@dataclass
+class ChunkResult:
+    """Aggregates for one scored chunk, plus its rendered per-row output."""
+    rows:      int
+    benign:    int
+    sum_proba: np.ndarray
+    latency:   float
+    payload:   str = ""
+    results:   list = field(default_factory=list)   # db.INSERT_RESULT rows
+    alerts:    list = field(default_factory=list)   # db.INSERT_ALERT rows
+    flows:     flow_graph.FlowBatch | None = None    # for flow_graph.graph.apply()
+    counts:    np.ndarray | None = None              # rows predicted per class
+
+
+def score_chunk(
+    state,
+    df: pd.DataFrame,
+    offset: int,
+    display_labels: list[str],
+    output: str | None = None,
+    run_id: int | None = None,
+) -> ChunkResult:
+    """Score one chunk and render its rows.
+
+    output=None renders nothing, "json" renders comma-separated row objects
+    (for a JSON array), "ndjson" renders one newline-terminated object per row.
+    With a run_id, every row also becomes a result row for the DB, every
+    non-benign row an alert row, and the chunk's hosts are aggregated into a
+    FlowBatch for the flow graph.
+    Rendering happens here so it runs on the inference executor, not the loop.
+    """
+    proba, secs = score_frame(state, df)
+    return build_chunk(state, df, proba, secs, offset, display_labels, output, run_id)
+
+
+def build_chunk(
+    state,
+    df: pd.DataFrame,
+    proba: np.ndarray,
+    secs: float,
+    offset: int,
+    display_labels: list[str],
+    output: str | None = None,
+    run_id: int | None = None,
+) -> ChunkResult:
+    """The result-building half of score_chunk, for already scored rows."""
+    preds_idx   = proba.argmax(axis=1)
+    benign_idx  = np.flatnonzero(state.label_encoder.classes_ == "benign")
+    is_benign   = np.isin(preds_idx, benign_idx)
+
+    payload = ""
+    if output:
+        confs = proba.max(axis=1).round(4)
+        rows  = (
+            json.dumps({
+                "row_id": offset + i,
+                "prediction": int(p),
+                "label": display_labels[p],
+                "confidence": float(c),
+            })
+            for i, (p, c) in enumerate(zip(preds_idx.tolist(), confs.tolist()))
+        )
+        payload = ",".join(rows) if output == "json" else "".join(r + "\n" for r in rows)
+
+    results: list[tuple] = []
+    alerts:  list[tuple] = []
+    flows = None
+    if run_id is not None:
+        conf_all = proba.max(axis=1).round(4).tolist()
+        results  = [
+            (run_id, offset + i, p, display_labels[p], c)
+            for i, (p, c) in enumerate(zip(preds_idx.tolist(), conf_all))
+        ]
+        hit  = np.flatnonzero(~is_benign)
+        conf = proba[hit, preds_idx[hit]]
+        # Same thresholds as main.risk_level for non-benign labels.
+        risk = np.select([conf >= 0.90, conf >= 0.70], ["HIGH", "MEDIUM"], "LOW")
+        now  = datetime.datetime.now().isoformat(timespec="seconds")
+        alerts = [
+            (run_id, display_labels[p], r, round(c, 4), now)
+            for p, r, c in zip(preds_idx[hit].tolist(), risk.tolist(), conf.tolist())
+        ]
+        threat = np.where(is_benign, None, np.asarray(display_labels, dtype=object)[preds_idx])
+        flows  = flow_graph.aggregate(df, threat, source="upload")
+
+    return ChunkResult(
+        rows      = len(preds_idx),
+        benign    = int(is_benign.sum()),
+        sum_proba = proba.sum(axis=0),
+        latency   = secs,
+        payload   = payload,
+        results   = results,
+        alerts    = alerts,
+        flows     = flows,
+        counts    = np.bincount(preds_idx, minlength=proba.shape[1]),
+    )
+
+
+def record_chunk(model: str, display_labels: list[str], chunk: ChunkResult) -> None:
+    """Hand a recorded chunk to the DB writer (results, alerts and their
+    per-minute/hour/day rollups) and to the flow graph. Never blocks."""
+    db.writer.add_results(chunk.results)
+    db.writer.add_alerts(chunk.alerts)
+    if chunk.counts is not None:
+        now = time.time()
+        db.writer.add_rollups(db.rollup_rows("detection", (
+            (now, model, display_labels[i], int(n)) for i, n in enumerate(chunk.counts.tolist()) if n
+        )))
+        db.writer.add_rollups(db.rollup_rows("alert", (
+            (now, model, label, n) for label, n in Counter(a[1] for a in chunk.alerts).items()
+        )))
+    flow_graph.graph.apply(chunk.flows)
+
+
+def score_chunk_job(model: str, df: pd.DataFrame, offset: int, display_labels: list[str],
+                    output: str | None, run_id: int | None = None) -> ChunkResult:
+    """Executor job: score_chunk against the worker's copy of `model`."""
+    return score_chunk(inference.worker_state(model), df, offset, display_labels, output, run_id)
+
+
+def predict_rows_job(model: str, rows: list[dict]) -> np.ndarray:
+    """Executor job: class probabilities for a list of feature dicts.
+
+    Each row must carry a usable feature on its own, as it would if scored
+    alone, so a micro-batched row fails exactly like a direct one.
+    """
+    state = inference.worker_state(model)
+    if not all(state.vectorizer.has_features(row) for row in rows):
+        raise ValueError(NO_FEATURES_MSG)
+    X     = state.vectorizer.transform(pd.DataFrame(rows))
+    return tree_compiler.predict_proba(state, state.scaler.transform(X))
+
+
+async def score_stream(
+    model: str,
+    chunks: Iterator[pd.DataFrame],
+    display_labels: list[str],
+    output: str | None = None,
+    run_id: int | None = None,
+) -> AsyncIterator[ChunkResult]:
+    """Parse chunks on a worker thread and score them on the inference
+    executor, yielding results in order without blocking the event loop."""
+    offset = 0
+    while True:
+        df = await asyncio.to_thread(next, chunks, None)
+        if df is None:
+            return
+        chunk = await inference.executor.run(
+            model, score_chunk_job, model, df, offset, display_labels, output, run_id
+        )
+        model_registry.shadow.offer(model, df)
+        offset += chunk.rows
+        yield chunk
+
+
+class RunAccumulator:
+    """Running summary over scored chunks: row count, benign/attack counts,
+    summed class probabilities and inference time."""
+
+    def __init__(self, state) -> None:
+        self.rows      = 0
+        self.benign    = 0
+        self.latency   = 0.0
+        self.sum_proba = np.zeros(len(state.label_encoder.classes_))
+
+    def add(self, chunk: ChunkResult) -> None:
+        self.rows      += chunk.rows
+        self.benign    += chunk.benign
+        self.latency   += chunk.latency
+        self.sum_proba += chunk.sum_proba
+
+    @property
+    def attack(self) -> int:
+        return self.rows - self.benign
+
+    @property
+    def mean_proba(self) -> np.ndarray:
+        return self.sum_proba / max(self.rows, 1)
+
+
+# ─── Multi-model comparison ──────────────────────────────────────────────────
+_compare_pool: ThreadPoolExecutor | None = None   # per process; created on first compare
+
+
+def scaling_key(state) -> tuple:
+    """Models with equal keys share feature extraction and scaling. Bundles
+    are loaded per model, so compare fitted values rather than identity."""
+    return (
+        tuple(state.feature_cols),
+        np.asarray(state.scaler.mean_).tobytes(),
+        np.asarray(state.scaler.scale_).tobytes(),
+    )
+
+
+@dataclass
+class CompareChunk:
+    """Per-model and cross-model aggregates for one chunk scored by every
+    compared model."""
+    rows:       int
+    prepare:    float                  # seconds spent extracting + scaling features
+    latency:    dict                   # model → seconds in predict_proba
+    sum_proba:  dict                   # model → summed class probabilities
+    counts:     dict                   # model → rows predicted per class
+    benign:     dict                   # model → benign rows
+    votes:      np.ndarray             # rows where exactly k models agree with the majority, k = 0..n
+    pairwise:   dict                   # "a/b" → rows where a and b agree
+    majority:   np.ndarray             # rows per majority class
+    details:    list = field(default_factory=list)   # rendered rows, see compare_chunk
+
+
+def compare_chunk(
+    states: dict,
+    df: pd.DataFrame,
+    offset: int,
+    display_labels: list[str],
+    detail: str = "disagreements",
+    max_rows: int = 0,
+) -> CompareChunk:
+    """Score one chunk with every model in `states` (same label encoder).
+
+    Features are extracted and scaled once per scaling_key group, and the
+    classifiers then run concurrently on the shared matrix. The per-row
+    majority label is the most voted class, ties broken by summed
+    probability. detail="disagreements" renders up to `max_rows` rows where
+    the models disagree, "all" up to `max_rows` rows, "none" nothing.
+    """
+    global _compare_pool
+    names = list(states)
+
+    t0 = time.perf_counter()
+    scaled: dict[tuple, np.ndarray] = {}
+    for name in names:
+        key = scaling_key(states[name])
+        if key not in scaled:
+            state       = states[name]
+            scaled[key] = state.scaler.transform(state.vectorizer.transform(df))
+    prepare = time.perf_counter() - t0
+
+    def run(name: str) -> tuple[np.ndarray, float]:
+        t = time.perf_counter()
+        proba = tree_compiler.predict_proba(states[name], scaled[scaling_key(states[name])])
+        return proba, time.perf_counter() - t
+
+    if len(names) > 1:
+        if _compare_pool is None:
+            _compare_pool = ThreadPoolExecutor(max_workers=len(names), thread_name_prefix="compare")
+        outcomes = list(_compare_pool.map(run, names))
+    else:
+        outcomes = [run(n) for n in names]
+    probas = {n: p for n, (p, _) in zip(names, outcomes)}
+    preds  = {n: p.argmax(axis=1) for n, p in probas.items()}
+
+    n_rows, n_classes = next(iter(probas.values())).shape
+    rows_idx  = np.arange(n_rows)
+    vote      = np.zeros((n_rows, n_classes))
+    proba_sum = np.zeros((n_rows, n_classes))
+    for n in names:
+        vote[rows_idx, preds[n]] += 1
+        proba_sum += probas[n]
+    majority = (vote + proba_sum / (len(names) + 1)).argmax(axis=1)   # summed proba < 1 vote
+    agree    = vote[rows_idx, majority].astype(np.int64)
+
+    benign_idx = np.flatnonzero(states[names[0]].label_encoder.classes_ == "benign")
+    pairwise   = {
+        f"{a}/{b}": int((preds[a] == preds[b]).sum())
+        for i, a in enumerate(names) for b in names[i + 1:]
+    }
+
+    details: list[dict] = []
+    if detail != "none" and max_rows > 0:
+        pick = rows_idx if detail == "all" else np.flatnonzero(agree < len(names))
+        for i in pick[:max_rows].tolist():
+            details.append({
+                "row_id":      offset + i,
+                "majority":    display_labels[majority[i]],
+                "agree":       int(agree[i]),
+                "predictions": {
+                    n: {"label": display_labels[preds[n][i]], "confidence": round(float(probas[n][i, preds[n][i]]), 4)}
+                    for n in names
+                },
+            })
+
+    return CompareChunk(
+        rows      = n_rows,
+        prepare   = prepare,
+        latency   = {n: secs for n, (_, secs) in zip(names, outcomes)},
+        sum_proba = {n: p.sum(axis=0) for n, p in probas.items()},
+        counts    = {n: np.bincount(p, minlength=n_classes) for n, p in preds.items()},
+        benign    = {n: int(np.isin(p, benign_idx).sum()) for n, p in preds.items()},
+        votes     = np.bincount(agree, minlength=len(names) + 1),
+        pairwise  = pairwise,
+        majority  = np.bincount(majority, minlength=n_classes),
+        details   = details,
+    )
+
+
+def compare_chunk_job(models: list[str], df: pd.DataFrame, offset: int, display_labels: list[str],
+                      detail: str, max_rows: int) -> CompareChunk:
+    """Executor job: compare_chunk against the worker's copies of `models`."""
+    states = {m: inference.worker_state(m) for m in models}
+    return compare_chunk(states, df, offset, display_labels, detail, max_rows)
+
+
+class CompareAccumulator:
+    """Running totals over CompareChunks; summary() renders the response body
+    (without rows)."""
+
+    def __init__(self, models: list[str], n_classes: int) -> None:
+        self.models    = models
+        self.rows      = 0
+        self.prepare   = 0.0
+        self.latency   = dict.fromkeys(models, 0.0)
+        self.sum_proba = {m: np.zeros(n_classes) for m in models}
+        self.counts    = {m: np.zeros(n_classes, dtype=np.int64) for m in models}
+        self.benign    = dict.fromkeys(models, 0)
+        self.votes     = np.zeros(len(models) + 1, dtype=np.int64)
+        self.pairwise: Counter = Counter()
+        self.majority  = np.zeros(n_classes, dtype=np.int64)
+        self.details: list[dict] = []
+
+    def add(self, chunk: CompareChunk) -> None:
+        self.rows     += chunk.rows
+        self.prepare  += chunk.prepare
+        self.votes    += chunk.votes
+        self.majority += chunk.majority
+        self.pairwise.update(chunk.pairwise)
+        self.details.extend(chunk.details)
+        for m in self.models:
+            self.latency[m]   += chunk.latency[m]
+            self.sum_proba[m] += chunk.sum_proba[m]
+            self.counts[m]    += chunk.counts[m]
+            self.benign[m]    += chunk.benign[m]
+
+    def summary(self, display_labels: list[str], verdict) -> dict:
+        """`verdict(mean_proba)` → (label, confidence, risk) for one model."""
+        n    = max(self.rows, 1)
+        full = len(self.models)
+        models = {}
+        for m in self.models:
+            label, confidence, risk = verdict(self.sum_proba[m] / n)
+            models[m] = {
+                "overall_label":      label,
+                "overall_confidence": confidence,
+                "overall_risk":       risk,
+                "benign":             self.benign[m],
+                "attack":             self.rows - self.benign[m],
+                "label_counts":       dict(zip(display_labels, self.counts[m].tolist())),
+                "latency":            round(self.latency[m], 4),
+            }
+        unanimous = int(self.votes[full])
+        return {
+            "models":     self.models,
+            "total_rows": self.rows,
+            "verdicts":   models,
+            "agreement":  {
+                "unanimous":       unanimous,
+                "unanimous_rate":  round(unanimous / n, 4),
+                "disagreements":   self.rows - unanimous,
+                "by_votes":        {str(k): int(v) for k, v in enumerate(self.votes.tolist()) if k},
+                "pairwise":        {pair: round(c / n, 4) for pair, c in self.pairwise.items()},
+                "majority_counts": dict(zip(display_labels, self.majority.tolist())),
+            },
+            "latency": {
+                "features": round(self.prepare, 4),
+                **{m: round(self.latency[m], 4) for m in self.models},
+            },
+        }
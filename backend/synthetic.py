@@ -0,0 +1,299 @@
+"""
+Synthetic network flows — vectorized generator for training, load and
+scale tests.
+
+Every class is described by one row of CLASS_SPECS, and each column of
+each class is drawn as a whole NumPy array (no per-row Python), so
+generating millions of rows costs a few array operations per column.
+
+write_flows() streams a dataset of any size to CSV or Parquet in
+`chunk_rows` chunks. Memory is bounded by one chunk, and every chunk is
+seeded from the run seed and its chunk index, so output is reproducible.
+CSV bytes are built with array operations as well (_csv_bytes), which is
+an order of magnitude faster than DataFrame.to_csv. Parquet output needs
+pyarrow.
+
+  python -m synthetic data/flows.csv --rows 10000000 --mix benign=0.7,ddos=0.1,portscan=0.1,bruteforce=0.05,probe=0.05
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from pathlib import Path
+from typing import Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = (
+    "packets", "bytes", "duration_ms", "src_port", "dst_port",
+    "flag_syn", "flag_ack", "flag_fin", "flag_rst",
+    "pkt_rate", "byte_rate", "protocol", "label",
+)
+PROTOCOLS = ("TCP", "UDP", "ICMP")
+
+# Per class, per column: ("int", lo, hi) draws from [lo, hi), ("choice", values)
+# picks uniformly, a bare value is a constant. Rates are derived.
+CLASS_SPECS: dict[str, dict] = {
+    "benign": dict(
+        packets=("int", 2, 35), bytes=("int", 200, 6000), duration_ms=("int", 20, 800),
+        src_port=("int", 1024, 65535), dst_port=("choice", (80, 443, 8080, 3000, 5000)),
+        flag_syn=("int", 0, 2), flag_ack=1, flag_fin=("int", 0, 2), flag_rst=0,
+        protocol=("choice", PROTOCOLS),
+    ),
+    "ddos": dict(
+        packets=("int", 800, 8000), bytes=("int", 80_000, 800_000), duration_ms=("int", 1, 80),
+        src_port=("int", 1024, 65535), dst_port=("choice", (80, 443, 53)),
+        flag_syn=1, flag_ack=0, flag_fin=0, flag_rst=0,
+        protocol="TCP",
+    ),
+    "portscan": dict(
+        packets=1, bytes=("int", 40, 70), duration_ms=("int", 2, 25),
+        src_port=54321, dst_port=("int", 1, 1024),
+        flag_syn=1, flag_ack=0, flag_fin=0, flag_rst=1,
+        protocol="TCP",
+    ),
+    "bruteforce": dict(
+        packets=("int", 15, 60), bytes=("int", 1500, 9000), duration_ms=("int", 2000, 15000),
+        src_port=("int", 1024, 65535), dst_port=("choice", (22, 3389, 21, 23)),
+        flag_syn=1, flag_ack=1, flag_fin=0, flag_rst=0,
+        protocol="TCP",
+    ),
+    "probe": dict(   # ICMP sweeps and UDP service probes across the port range
+        packets=("int", 1, 4), bytes=("int", 28, 200), duration_ms=("int", 1, 50),
+        src_port=("int", 1024, 65535), dst_port=("int", 1, 65535),
+        flag_syn=0, flag_ack=0, flag_fin=0, flag_rst=0,
+        protocol=("choice", ("ICMP", "UDP")),
+    ),
+}
+LABELS = tuple(CLASS_SPECS)
+
+# The four classes the bundled models are trained on, in equal parts.
+DEFAULT_MIX = {"benign": 0.25, "ddos": 0.25, "portscan": 0.25, "bruteforce": 0.25}
+
+CHUNK_ROWS = 500_000
+
+
+# ─── Mix ─────────────────────────────────────────────────────────────────────
+def parse_mix(text: str) -> dict[str, float]:
+    """'benign=0.7,ddos=0.3' → {"benign": 0.7, "ddos": 0.3}."""
+    mix = {}
+    for part in text.split(","):
+        label, _, weight = part.partition("=")
+        mix[label.strip().lower()] = float(weight or 1)
+    return mix
+
+
+def class_counts(n_rows: int, mix: Optional[dict[str, float]] = None) -> dict[str, int]:
+    """Rows per class for `n_rows`: weights are normalised, and rounding
+    follows the largest remainder so the counts add up to exactly n_rows."""
+    mix     = mix or DEFAULT_MIX
+    unknown = set(mix) - set(CLASS_SPECS)
+    if unknown:
+        raise ValueError(f"Unknown class(es) {sorted(unknown)}; known: {', '.join(LABELS)}")
+    weights = np.array([max(float(w), 0.0) for w in mix.values()])
+    if weights.sum() <= 0:
+        raise ValueError("Class mix has no positive weight")
+    exact  = weights / weights.sum() * n_rows
+    counts = np.floor(exact).astype(np.int64)
+    counts[np.argsort(counts - exact)[: n_rows - counts.sum()]] += 1
+    return dict(zip(mix, counts.tolist()))
+
+
+# ─── Drawing ─────────────────────────────────────────────────────────────────
+def _column(rng: np.random.Generator, spec, n: int, dtype=np.int64) -> np.ndarray:
+    if isinstance(spec, tuple) and spec[0] == "int":
+        return rng.integers(spec[1], spec[2], n, dtype=dtype)
+    if isinstance(spec, tuple) and spec[0] == "choice":
+        return np.asarray(spec[1], dtype=dtype)[rng.integers(0, len(spec[1]), n)]
+    return np.full(n, spec, dtype=dtype)
+
+
+def _protocol_spec(spec):
+    """Protocol names in a spec → codes into PROTOCOLS."""
+    if isinstance(spec, tuple):
+        return ("choice", tuple(PROTOCOLS.index(p) for p in spec[1]))
+    return PROTOCOLS.index(spec)
+
+
+def draw(rng: np.random.Generator, counts: dict[str, int]) -> dict[str, np.ndarray]:
+    """Columns for `counts` rows per class, shuffled. `protocol` and `label`
+    are int8 codes into PROTOCOLS and LABELS."""
+    parts: dict[str, list] = {c: [] for c in COLUMNS if c not in ("pkt_rate", "byte_rate")}
+    for label, n in counts.items():
+        spec = CLASS_SPECS[label]
+        for col, out in parts.items():
+            if col == "label":
+                out.append(np.full(n, LABELS.index(label), dtype=np.int8))
+            elif col == "protocol":
+                out.append(_column(rng, _protocol_spec(spec[col]), n, np.int8))
+            else:
+                out.append(_column(rng, spec[col], n))
+
+    order = rng.permutation(sum(counts.values()))
+    cols  = {c: np.concatenate(p)[order] for c, p in parts.items()}
+    seconds = np.maximum(cols["duration_ms"] / 1000, 0.001)
+    cols["pkt_rate"]  = np.round(cols["packets"] / seconds, 4)
+    cols["byte_rate"] = np.round(cols["bytes"] / seconds, 4)
+    return cols
+
+
+def to_frame(cols: dict[str, np.ndarray]) -> pd.DataFrame:
+    data = dict(cols)
+    data["protocol"] = np.asarray(PROTOCOLS, dtype=object)[cols["protocol"]]
+    data["label"]    = np.asarray(LABELS, dtype=object)[cols["label"]]
+    return pd.DataFrame({c: data[c] for c in COLUMNS})
+
+
+def generate_flows(n_rows: int, mix: Optional[dict[str, float]] = None, seed: int = 0) -> pd.DataFrame:
+    """`n_rows` shuffled flows in one DataFrame (see write_flows for datasets
+    that should not be held in memory)."""
+    return to_frame(draw(np.random.default_rng(seed), class_counts(n_rows, mix)))
+
+
+def iter_chunks(
+    n_rows: int,
+    mix: Optional[dict[str, float]] = None,
+    seed: int = 0,
+    chunk_rows: int = CHUNK_ROWS,
+) -> Iterator[dict[str, np.ndarray]]:
+    """Column dicts (see draw) of at most `chunk_rows` rows, `n_rows` in total.
+    Class counts are exact per chunk, so the mix holds in every chunk."""
+    n_chunks = max(1, -(-n_rows // chunk_rows))
+    seeds    = np.random.SeedSequence(seed).spawn(n_chunks)
+    for i, chunk_seed in enumerate(seeds):
+        n = min(chunk_rows, n_rows - i * chunk_rows)
+        yield draw(np.random.default_rng(chunk_seed), class_counts(n, mix))
+
+
+# ─── Writing ─────────────────────────────────────────────────────────────────
+def _width(x: np.ndarray) -> int:
+    return len(str(int(x.max()))) if len(x) else 1
+
+
+def _put_int(x: np.ndarray, out: np.ndarray, valid: np.ndarray, pad: bool = False) -> None:
+    """Render non-negative ints right-aligned into `out` (width, n): row j
+    holds digit j of every value. `valid` marks digits that are not leading
+    zeros (all of them with pad=True)."""
+    width = out.shape[0]
+    x     = x.astype(np.uint32 if width <= 9 else np.uint64)
+    for j in range(width):
+        scale = x.dtype.type(10 ** (width - 1 - j))
+        np.add(x // scale % x.dtype.type(10), ord("0"), out=out[j], casting="unsafe")
+        if not pad and j < width - 1:
+            np.greater_equal(x, scale, out=valid[j])
+
+
+def _csv_bytes(cols: dict[str, np.ndarray]) -> bytes:
+    """CSV rows (no header) for a draw() chunk. Every field is rendered at a
+    fixed width into a (line width, rows) byte matrix, column-major so each
+    digit position is one contiguous array operation, with a mask of the
+    bytes that belong to the text rather than padding. One boolean gather
+    over the transpose yields the row-major byte stream."""
+    n      = len(cols["label"])
+    fields = []   # (width, kind, values)
+    for i, col in enumerate(COLUMNS):
+        if i:
+            fields.append((1, "text", ","))
+        if col in ("protocol", "label"):
+            names = PROTOCOLS if col == "protocol" else LABELS
+            fields.append((max(map(len, names)), "names", (names, cols[col])))
+        elif col in ("pkt_rate", "byte_rate"):
+            whole, frac = np.divmod(np.rint(cols[col] * 10_000).astype(np.int64), 10_000)
+            fields.append((_width(whole), "int", whole))
+            fields.append((1, "text", "."))
+            fields.append((4, "frac", frac))
+        else:
+            fields.append((_width(cols[col]), "int", cols[col]))
+    fields.append((1, "text", "\n"))
+
+    line  = sum(width for width, _, _ in fields)
+    out   = np.empty((line, n), dtype=np.uint8)
+    valid = np.ones((line, n), dtype=bool)
+    at    = 0
+    for width, kind, values in fields:
+        rows = slice(at, at + width)
+        if kind == "text":
+            out[rows] = ord(values)
+        elif kind in ("int", "frac"):
+            _put_int(values, out[rows], valid[rows], pad=kind == "frac")
+        else:
+            names, codes = values
+            chars = np.zeros((width, len(names)), dtype=np.uint8)
+            for k, name in enumerate(names):
+                chars[:len(name), k] = list(name.encode())
+            out[rows]   = chars[:, codes]
+            valid[rows] = (chars != 0)[:, codes]
+        at += width
+    return out.T[valid.T].tobytes()
+
+
+def write_flows(
+    path: Path,
+    n_rows: int,
+    mix: Optional[dict[str, float]] = None,
+    seed: int = 0,
+    chunk_rows: int = CHUNK_ROWS,
+    fmt: Optional[str] = None,
+) -> int:
+    """Write `n_rows` flows to `path` as CSV or Parquet (fmt, default from
+    the suffix) one chunk at a time; returns the bytes written."""
+    path = Path(path)
+    fmt  = (fmt or path.suffix.lstrip(".") or "csv").lower()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    chunks = iter_chunks(n_rows, mix, seed, chunk_rows)
+
+    if fmt == "csv":
+        with open(path, "wb") as fh:
+            fh.write((",".join(COLUMNS) + "\n").encode())
+            for cols in chunks:
+                fh.write(_csv_bytes(cols))
+    elif fmt == "parquet":
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as exc:
+            raise RuntimeError("Parquet output needs pyarrow (pip install pyarrow)") from exc
+        writer = None
+        try:
+            for cols in chunks:
+                arrays = {
+                    c: pa.DictionaryArray.from_arrays(cols[c], list(PROTOCOLS if c == "protocol" else LABELS))
+                    if c in ("protocol", "label") else pa.array(cols[c])
+                    for c in COLUMNS
+                }
+                table = pa.table(arrays)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+    else:
+        raise ValueError(f"Unknown output format {fmt!r} (csv | parquet)")
+    return path.stat().st_size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Write a synthetic network flow dataset.")
+    parser.add_argument("output", type=Path, help=".csv or .parquet file")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--mix", type=parse_mix, default=None,
+                        help=f"class=weight,... over {', '.join(LABELS)} (default: the four trained classes, equal)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--format", choices=("csv", "parquet"))
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    try:
+        size = write_flows(args.output, args.rows, args.mix, args.seed, args.chunk_rows, args.format)
+    except (RuntimeError, ValueError) as exc:
+        parser.error(str(exc))
+    secs = time.perf_counter() - t0
+    print(f"{args.rows:,} rows → {args.output} ({size / 1e6:.1f} MB) in {secs:.2f}s "
+          f"({args.rows / secs / 1e6:.2f}M rows/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Run ids must never collide, and a collision must not replace another run."""
+from __future__ import annotations
+
+import db
+
+
+def test_run_ids_unique_and_increasing(monkeypatch):
+    monkeypatch.setattr(db.time, "time", lambda: 1_700_000_000.0)   # one frozen millisecond
+    ids = [db.new_run_id() for _ in range(500)]
+    assert ids == sorted(set(ids))
+    assert ids[0] >= db.run_id_at(1_700_000_000.0)
+    assert max(ids) < 2 ** 53
+
+
+def test_run_ids_differ_between_workers(monkeypatch):
+    monkeypatch.setattr(db.time, "time", lambda: 1_700_000_000.0)
+    monkeypatch.setattr(db, "_last_ms", 0)
+    monkeypatch.setattr(db.os, "getpid", lambda: 1000)
+    first = db.new_run_id()
+    monkeypatch.setattr(db, "_last_ms", 0)                       # a second process, same ms
+    monkeypatch.setattr(db.os, "getpid", lambda: 1001)
+    assert db.new_run_id() != first
+
+
+def test_duplicate_run_fails_without_dropping_others(tmp_path):
+    path = str(tmp_path / "ids.db")
+    db.init_db(path)
+    writer = db.DBWriter(path)
+    run = ("hybrid", "2026-01-01T00:00:00", "benign", 1, "{}", "{}")
+    writer.add_run(1, *run)
+    writer.add_run(2, "cnn", *run[1:])
+    writer.add_run(1, "lstm", *run[1:])                           # collides with run 1
+    writer.start()
+    assert writer.flush()
+    writer.stop()
+
+    conn = db.connect(path)
+    rows = dict(conn.execute("SELECT id, model FROM runs").fetchall())
+    conn.close()
+    assert rows == {1: "hybrid", 2: "cnn"}
+    assert writer.dropped_rows == 1
+    assert writer.last_error.startswith("IntegrityError")
@@ -0,0 +1,24 @@
+"""A subscriber must not miss messages published while its initial state is built."""
+from __future__ import annotations
+
+import asyncio
+
+import live_push
+
+
+def test_messages_published_during_initial_are_delivered():
+    async def scenario() -> list[bytes]:
+        b = live_push.Broadcaster(keepalive=5)
+
+        def initial() -> list[bytes]:
+            b.publish("connections", {"upsert": {"k": 1}})   # a tick lands meanwhile
+            return [b"snapshot"]
+
+        stream = b.stream(initial)
+        got = [await stream.__anext__(), await asyncio.wait_for(stream.__anext__(), 1)]
+        await stream.aclose()
+        return got
+
+    first, second = asyncio.run(scenario())
+    assert first == b"snapshot"
+    assert b"event: connections" in second
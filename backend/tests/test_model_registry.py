@@ -0,0 +1,74 @@
+"""Requests pinned to a retired model version keep that version's worker pool."""
+from __future__ import annotations
+
+import asyncio
+import threading
+
+import inference
+import model_registry
+
+
+def _registry_with_releases() -> tuple[model_registry.ModelRegistry, list[int]]:
+    reg = model_registry.ModelRegistry()
+    released: list[int] = []
+    reg.on_release.append(released.append)
+    reg.publish(reg.new_version({}, "test"))
+    return reg, released
+
+
+def test_retired_version_released_after_last_pin():
+    reg, released = _registry_with_releases()
+    v1 = reg.pin()
+    other = reg.pin()
+    reg.publish(reg.new_version({}, "test"))
+    assert released == []                      # still pinned by two requests
+
+    reg.unpin(v1)
+    assert released == []
+    reg.unpin(other)
+    assert released == [v1.version]
+
+
+def test_unpinned_version_released_on_swap():
+    reg, released = _registry_with_releases()
+    v1 = reg.current
+    reg.unpin(reg.pin())                       # finished before the swap
+    assert released == []
+    reg.publish(reg.new_version({}, "test"))
+    assert released == [v1.version]
+
+
+def test_pinned_jobs_run_on_their_versions_pool():
+    ex = inference.InferenceExecutor(kind="process", workers=1)
+    ex.start(None, 1)                          # no bundle: thread-backed, same retention rules
+    old_pool = ex._pool
+    ex.start(None, 2)
+    assert ex.stats()["retired_versions"] == [1]
+
+    async def job_pool(version: int | None):
+        token = model_registry.pinned.set(model_registry.ModelVersion(version, {}, "test") if version else None)
+        try:
+            return await ex.run("hybrid", lambda: threading.current_thread())
+        finally:
+            model_registry.pinned.reset(token)
+
+    old_thread = asyncio.run(job_pool(1))
+    new_thread = asyncio.run(job_pool(2))
+    assert old_thread in old_pool._threads
+    assert new_thread in ex._pool._threads
+    assert asyncio.run(job_pool(None)) in ex._pool._threads
+
+    ex.release(1)
+    assert ex.stats()["retired_versions"] == []
+    assert old_pool._shutdown
+    ex.shutdown()
+
+
+def test_thread_executor_does_not_keep_pools():
+    ex = inference.InferenceExecutor(kind="thread", workers=1)
+    ex.start(None, 1)
+    old_pool = ex._pool
+    ex.start(None, 2)
+    assert ex.stats()["retired_versions"] == []
+    assert old_pool._shutdown
+    ex.shutdown()
@@ -0,0 +1,81 @@
+"""Compiled tree ensembles must reproduce sklearn's predict_proba."""
+from __future__ import annotations
+
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+
+import tree_compiler
+
+N_FEATURES = 6
+
+
+def _data(n_classes: int, n_rows: int = 600, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    X   = rng.normal(size=(n_rows, N_FEATURES))
+    # Coarse grid values repeat, so many rows sit exactly on split thresholds.
+    X[:, :2] = np.round(X[:, :2], 1)
+    score = X[:, 0] + X[:, 1] * X[:, 2] + 0.5 * rng.normal(size=n_rows)
+    y = np.digitize(score, np.quantile(score, np.linspace(0, 1, n_classes + 1)[1:-1]))
+    return X, y
+
+
+MODELS = {
+    "forest":   lambda: RandomForestClassifier(n_estimators=25, max_depth=8, random_state=0),
+    "boosting": lambda: GradientBoostingClassifier(n_estimators=30, max_depth=3, random_state=0),
+}
+
+
+@pytest.fixture(scope="module", params=[(m, k) for m in MODELS for k in (2, 3)],
+                ids=lambda p: f"{p[0]}-{p[1]}class")
+def fitted(request):
+    model, n_classes = request.param
+    X, y = _data(n_classes)
+    clf  = MODELS[model]().fit(X, y)
+    return clf, tree_compiler.compile_ensemble(clf), X
+
+
+def _on_thresholds(clf, n_rows: int, seed: int = 1) -> np.ndarray:
+    """Rows whose features equal split thresholds exactly, or the adjacent
+    float32 values, so every comparison is decided at the boundary."""
+    rng     = np.random.default_rng(seed)
+    trees   = [e.tree_ for e in np.ravel(clf.estimators_)]
+    splits  = [(f, t) for tree in trees for f, t in zip(tree.feature, tree.threshold) if f >= 0]
+    X       = rng.normal(size=(n_rows, N_FEATURES))
+    for row in X:
+        for f, thr in (splits[i] for i in rng.choice(len(splits), N_FEATURES * 2)):
+            nudge  = rng.choice([-1, 0, 0, 1])
+            row[f] = np.nextafter(np.float32(thr), np.float32(nudge * np.inf)) if nudge else thr
+    return X
+
+
+@pytest.mark.parametrize("n_rows", [1, 64])
+def test_matches_sklearn(fitted, n_rows):
+    clf, compiled, X = fitted
+    rows = X[:n_rows]
+    np.testing.assert_allclose(compiled.predict_proba(rows), clf.predict_proba(rows), rtol=1e-7, atol=1e-12)
+
+
+@pytest.mark.parametrize("n_rows", [1, 64])
+def test_matches_sklearn_on_thresholds(fitted, n_rows):
+    clf, compiled, _ = fitted
+    rows = _on_thresholds(clf, n_rows)
+    np.testing.assert_allclose(compiled.predict_proba(rows), clf.predict_proba(rows), rtol=1e-7, atol=1e-12)
+
+
+def test_dispatch_and_verification(fitted, monkeypatch):
+    clf, _, X = fitted
+    monkeypatch.setattr(tree_compiler, "COMPILED_MODELS", {"m"})
+    state = type("State", (), {"clf": clf})()
+
+    tree_compiler.attach(state, "m", X[:64])
+    assert state.compiled is not None
+    for n in (1, 64, tree_compiler.COMPILED_MAX_ROWS + 1):
+        np.testing.assert_allclose(tree_compiler.predict_proba(state, X[:n]), clf.predict_proba(X[:n]),
+                                   rtol=1e-7, atol=1e-12)
+
+    # A compiled evaluator that disagrees with sklearn is discarded.
+    monkeypatch.setattr(tree_compiler.CompiledEnsemble, "predict_proba",
+                        lambda self, rows: np.zeros_like(clf.predict_proba(rows)))
+    tree_compiler.attach(state, "m", X[:64])
+    assert state.compiled is None
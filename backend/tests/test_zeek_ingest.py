@@ -0,0 +1,95 @@
+"""ZeekTailer must skip malformed lines without losing the good rows around them."""
+from __future__ import annotations
+
+import time
+
+import zeek_ingest
+
+HEADER = (
+    "#separator \\x09\n"
+    "#set_separator\t,\n"
+    "#empty_field\t(empty)\n"
+    "#unset_field\t-\n"
+    "#path\tconn\n"
+    "#fields\tts\tuid\tid.orig_p\torig_pkts\tproto\n"
+    "#types\ttime\tstring\tport\tcount\tenum\n"
+)
+
+
+def _row(i: int, pkts: str | None = None) -> str:
+    return f"{1700000000 + i}.5\tC{i}\t{40000 + i}\t{pkts or i}\ttcp\n"
+
+
+def _poll(tmp_path, body: str) -> tuple[zeek_ingest.ZeekTailer, list]:
+    path = tmp_path / "conn.log"
+    path.write_text(HEADER + body)
+    tailer = zeek_ingest.ZeekTailer(path, batch_rows=100)
+    with tailer:
+        return tailer, list(tailer.poll())
+
+
+def test_bad_typed_value_is_skipped(tmp_path):
+    body = _row(1) + _row(2, pkts="lots") + _row(3) + _row(4, pkts="-")
+    tailer, batches = _poll(tmp_path, body)
+
+    assert len(batches) == 1
+    df = batches[0]
+    assert df["uid"].tolist() == ["C1", "C3", "C4"]
+    assert df["orig_pkts"].dtype == "float64"
+    assert df["orig_pkts"].isna().tolist() == [False, False, True]
+    assert tailer.bad_lines == 1
+    assert tailer.stats()["rows_read"] == 3
+
+
+def test_wrong_field_count_is_skipped(tmp_path):
+    body = _row(1) + "1700000002.5\tC2\t40002\n" + _row(3) + "garbage\tC4\t1\t2\ttcp\textra\n" + _row(5)
+    body += "1700000006.5\tC6\t40006\t6\n" + _row(7)        # only the string field missing
+    tailer, batches = _poll(tmp_path, body)
+
+    assert batches[0]["uid"].tolist() == ["C1", "C3", "C5", "C7"]
+    assert tailer.bad_lines == 3
+
+
+def test_bad_line_does_not_stall_later_polls(tmp_path):
+    path = tmp_path / "conn.log"
+    path.write_text(HEADER + _row(1) + _row(2, pkts="x"))
+    with zeek_ingest.ZeekTailer(path) as tailer:
+        first = list(tailer.poll())
+        with path.open("a") as fh:
+            fh.write(_row(3))
+        second = list(tailer.poll())
+
+    assert [b["uid"].tolist() for b in first]  == [["C1"]]
+    assert [b["uid"].tolist() for b in second] == [["C3"]]
+    assert tailer.bad_lines == 1
+
+
+def test_ingestor_survives_tailer_error(tmp_path, monkeypatch):
+    path = tmp_path / "conn.log"
+    path.write_text(HEADER + _row(1))
+    seen: list[list[str]] = []
+    ingestor = zeek_ingest.ZeekIngestor(path, "hybrid", get_state=None, emit=lambda _: None,
+                                        interval=0.01, from_start=True)
+    monkeypatch.setattr(ingestor, "process", lambda batch: seen.append(batch["uid"].tolist()) or [])
+
+    poll  = zeek_ingest.ZeekTailer.poll
+    calls = iter([ValueError("boom")])
+
+    def flaky(self):
+        exc = next(calls, None)
+        if exc is not None:
+            raise exc
+        yield from poll(self)
+
+    monkeypatch.setattr(zeek_ingest.ZeekTailer, "poll", flaky)
+    ingestor.start()
+    try:
+        deadline = time.monotonic() + 5
+        while not seen and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert seen == [["C1"]]
+        stats = ingestor.stats()
+        assert stats["running"]
+        assert stats["last_error"] == "ValueError: boom"
+    finally:
+        ingestor.stop()
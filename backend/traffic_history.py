@@ -0,0 +1,144 @@
+"""
+Traffic history — fixed-size, array-backed ring buffers of host traffic
+rates at several resolutions, filled by net_sampler on every tick.
+
+Each tier averages the samples that fall into one `step`-second bucket and
+keeps the newest `capacity` buckets (defaults: 1 s for 10 minutes, 1 min
+for 24 hours). Memory is fixed at startup; adding a sample is O(1) and a
+window read is one slice of preallocated arrays, so serving
+/api/live/traffic-history never touches psutil and is independent of how
+many clients poll it.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Optional
+
+import numpy as np
+
+FIELDS = (
+    "packets_per_sec",
+    "bytes_sent_per_sec",
+    "bytes_recv_per_sec",
+    "active_connections",
+    "total_connections",
+)
+
+# (name, step seconds, capacity in buckets)
+DEFAULT_TIERS = (
+    ("1s", 1,  600),     # 10 minutes
+    ("1m", 60, 1440),    # 24 hours
+)
+
+
+class RingBuffer:
+    """`capacity` rows of (timestamp, values[n_fields]), oldest overwritten first."""
+
+    def __init__(self, capacity: int, n_fields: int) -> None:
+        self.capacity = capacity
+        self.t        = np.zeros(capacity, dtype=np.float64)
+        self.values   = np.zeros((capacity, n_fields), dtype=np.float64)
+        self.head     = 0   # next slot to write
+        self.size     = 0
+
+    def push(self, t: float, row: np.ndarray) -> None:
+        self.t[self.head]      = t
+        self.values[self.head] = row
+        self.head = (self.head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def ordered(self) -> tuple[np.ndarray, np.ndarray]:
+        """Copies of the stored rows, oldest first."""
+        idx = (np.arange(self.head - self.size, self.head)) % self.capacity
+        return self.t[idx], self.values[idx]
+
+
+class Tier:
+    """One resolution: averages samples per `step`-second bucket into a ring."""
+
+    def __init__(self, name: str, step: float, capacity: int, n_fields: int) -> None:
+        self.name   = name
+        self.step   = step
+        self.ring   = RingBuffer(capacity, n_fields)
+        self._bucket: Optional[int] = None
+        self._sum   = np.zeros(n_fields, dtype=np.float64)
+        self._n     = 0
+
+    def add(self, t: float, row: np.ndarray) -> None:
+        bucket = int(t // self.step)
+        if self._bucket is not None and bucket != self._bucket:
+            self._flush()
+        self._bucket = bucket
+        self._sum   += row
+        self._n     += 1
+
+    def _flush(self) -> None:
+        if self._n:
+            self.ring.push(self._bucket * self.step, self._sum / self._n)
+        self._sum[:] = 0.0
+        self._n      = 0
+
+    def series(self) -> tuple[np.ndarray, np.ndarray]:
+        """Completed buckets plus the in-progress one (mean so far), oldest first."""
+        t, v = self.ring.ordered()
+        if self._n:
+            t = np.append(t, self._bucket * self.step)
+            v = np.vstack([v, self._sum / self._n])
+        return t, v
+
+
+class TrafficHistory:
+    """Multi-resolution traffic history. add() from one writer, window() from any thread."""
+
+    def __init__(self, tiers=DEFAULT_TIERS, fields=FIELDS) -> None:
+        self.fields = tuple(fields)
+        self.tiers  = {name: Tier(name, step, cap, len(self.fields)) for name, step, cap in tiers}
+        self._lock  = threading.Lock()
+
+    def add(self, t: float, **values: float) -> None:
+        row = np.array([values.get(f, 0.0) for f in self.fields], dtype=np.float64)
+        with self._lock:
+            for tier in self.tiers.values():
+                tier.add(t, row)
+
+    def window(
+        self,
+        resolution: str = "1s",
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        max_points: Optional[int] = None,
+    ) -> dict:
+        """Buckets with since <= t < until at `resolution`, optionally averaged
+        down to at most `max_points` points. Raises KeyError for an unknown
+        resolution."""
+        tier = self.tiers[resolution]
+        with self._lock:
+            t, v = tier.series()
+
+        keep = np.ones(len(t), dtype=bool)
+        if since is not None:
+            keep &= t >= since
+        if until is not None:
+            keep &= t < until
+        t, v = t[keep], v[keep]
+
+        if max_points and len(t) > max_points:
+            t, v = _downsample(t, v, max_points)
+
+        out = {"resolution": resolution, "step": tier.step, "t": t.tolist()}
+        for i, name in enumerate(self.fields):
+            out[name] = np.round(v[:, i], 2).tolist()
+        return out
+
+    def stats(self) -> dict:
+        return {
+            name: {"step": tier.step, "stored": tier.ring.size, "capacity": tier.ring.capacity}
+            for name, tier in self.tiers.items()
+        }
+
+
+def _downsample(t: np.ndarray, v: np.ndarray, points: int) -> tuple[np.ndarray, np.ndarray]:
+    """Average consecutive rows into `points` groups; each keeps its first timestamp."""
+    edges  = np.linspace(0, len(t), points + 1).astype(np.int64)[:-1]
+    counts = np.diff(np.append(edges, len(t)))
+    return t[edges], np.add.reduceat(v, edges, axis=0) / counts[:, None]
@@ -0,0 +1,132 @@
+"""
+Parallel training — fits several classifiers concurrently in a process pool.
+
+The caller fits the shared StandardScaler / LabelEncoder once and passes the
+scaled matrix in. It is written to a temporary .npy file that every job
+memory-maps, so large training sets are not pickled once per model. Each job
+also cross-validates its model, so evaluation is computed once per model
+version and stored alongside it.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from sklearn.metrics import confusion_matrix, precision_recall_fscore_support
+from sklearn.model_selection import cross_val_predict
+
+log = logging.getLogger("cyber-ids")
+
+
+def _train_workers() -> int:
+    """Process count from TRAIN_WORKERS, defaulting to the CPU count."""
+    env = os.getenv("TRAIN_WORKERS", "")
+    return int(env) if env.strip().isdigit() else (os.cpu_count() or 1)
+
+
+def evaluate_cv(clf: Any, X: np.ndarray, y: np.ndarray, class_names: list[str], cv: int = 5) -> dict | None:
+    """Cross-validated metrics for an (unfitted) classifier, or None when the
+    smallest class is too small to split."""
+    folds = min(cv, int(np.bincount(y).min()) if len(y) else 0)
+    if folds < 2:
+        return None
+
+    preds = cross_val_predict(clf, X, y, cv=folds)
+    labels = np.arange(len(class_names))
+    prec, rec, f1, support = precision_recall_fscore_support(
+        y, preds, labels=labels, zero_division=0
+    )
+    return {
+        "cv_folds":  folds,
+        "accuracy":  float((preds == y).mean()),
+        "f1":        float(f1.mean()),
+        "precision": float(prec.mean()),
+        "recall":    float(rec.mean()),
+        "per_class": {
+            name: {
+                "precision": float(prec[i]),
+                "recall":    float(rec[i]),
+                "f1":        float(f1[i]),
+                "support":   int(support[i]),
+            }
+            for i, name in enumerate(class_names)
+        },
+        "classes":          list(class_names),
+        "confusion_matrix": confusion_matrix(y, preds, labels=labels).tolist(),
+    }
+
+
+def _fit_one(
+    name: str, clf: Any, x_path: str, y_path: str, class_names: list[str] | None,
+) -> tuple[str, Any, float, dict | None]:
+    """Pool job: cross-validate (optional) and fit one classifier on the
+    memory-mapped training set."""
+    X  = np.load(x_path, mmap_mode="r")
+    y  = np.load(y_path, mmap_mode="r")
+    evaluation = evaluate_cv(clf, X, y, class_names) if class_names else None
+    t0 = time.perf_counter()
+    clf.fit(X, y)
+    return name, clf, time.perf_counter() - t0, evaluation
+
+
+def fit_parallel(
+    clf_defs: dict[str, Any],
+    X: np.ndarray,
+    y: np.ndarray,
+    workers: int | None = None,
+    class_names: list[str] | None = None,
+) -> dict[str, tuple[Any, float, dict | None]]:
+    """Fit every classifier in `clf_defs`; return {name: (clf, fit_seconds, evaluation)}.
+
+    `evaluation` is the evaluate_cv() result when `class_names` is given,
+    otherwise None. Models run in separate processes; cores not taken by a
+    model process go to estimators that define `n_jobs`. `n_jobs` is restored
+    to its defined value after fitting, so serving-time parallelism is
+    unchanged. With one worker, or if the pool cannot start, models are
+    fitted sequentially in-process.
+    """
+    workers = max(1, workers if workers is not None else _train_workers())
+    procs   = min(workers, len(clf_defs))
+    spare   = max(1, workers - procs + 1)
+
+    serving_jobs: dict[str, Any] = {}
+    for name, clf in clf_defs.items():
+        n_jobs = clf.get_params().get("n_jobs")
+        if n_jobs is not None:
+            serving_jobs[name] = n_jobs
+            clf.set_params(n_jobs=spare)
+
+    with tempfile.TemporaryDirectory(prefix="cyberids-train-") as tmp:
+        x_path = str(Path(tmp) / "X.npy")
+        y_path = str(Path(tmp) / "y.npy")
+        np.save(x_path, np.ascontiguousarray(X))
+        np.save(y_path, np.ascontiguousarray(y))
+
+        fitted: dict[str, tuple[Any, float, dict | None]] = {}
+        if procs > 1:
+            try:
+                with ProcessPoolExecutor(max_workers=procs) as pool:
+                    futures = [pool.submit(_fit_one, name, clf, x_path, y_path, class_names)
+                               for name, clf in clf_defs.items()]
+                    for fut in futures:
+                        name, clf, secs, evaluation = fut.result()
+                        fitted[name] = (clf, secs, evaluation)
+            except (OSError, RuntimeError) as exc:
+                log.warning(f"Parallel training unavailable ({exc}); fitting sequentially")
+                fitted.clear()
+
+        for name, clf in clf_defs.items():
+            if name not in fitted:
+                _, clf, secs, evaluation = _fit_one(name, clf, x_path, y_path, class_names)
+                fitted[name] = (clf, secs, evaluation)
+
+    for name, n_jobs in serving_jobs.items():
+        fitted[name][0].set_params(n_jobs=n_jobs)
+
+    return {name: fitted[name] for name in clf_defs}
@@ -0,0 +1,184 @@
+"""
+Tree ensemble compiler — array-based evaluation of fitted sklearn forests.
+
+compile_ensemble() flattens every tree of a RandomForestClassifier or
+GradientBoostingClassifier into one set of contiguous node arrays (feature,
+threshold, children, leaf values). CompiledEnsemble.predict_proba() then
+walks all trees for a whole batch at once with vectorized gathers, one
+step per tree level, instead of sklearn's per-estimator dispatch. That
+removes the fixed per-call overhead that dominates single-row and small
+micro-batch scoring; larger batches still go to sklearn.
+
+Leaves point to themselves with an infinite threshold, so the walk needs no
+leaf test: max_depth steps always land every (tree, row) pair on its leaf.
+"""
+from __future__ import annotations
+
+import logging
+import os
+
+import numpy as np
+from scipy.special import expit, softmax
+from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+
+log = logging.getLogger("cyber-ids")
+
+COMPILED_MODELS = {
+    m.strip() for m in os.getenv("COMPILED_MODELS", "hybrid,cnn").split(",") if m.strip()
+}
+
+# Above this many rows sklearn's per-tree C loop is faster than the gathers.
+COMPILED_MAX_ROWS = int(os.getenv("COMPILED_MAX_ROWS", "64"))
+
+_BLOCK_ROWS = 4096   # bounds the (trees × rows) work arrays
+
+
+class CompiledEnsemble:
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        children: np.ndarray,
+        value: np.ndarray,
+        roots: np.ndarray,
+        depth: int,
+        output_trees: list[slice],
+        init: np.ndarray,
+        link: str,
+    ) -> None:
+        self.feature      = feature       # (n_nodes,) split feature; 0 at leaves
+        self.threshold    = threshold     # (n_nodes,) float64; +inf at leaves
+        self.children     = children      # (n_nodes * 2,) [left, right] global ids; self at leaves
+        self.value        = value         # (n_outputs, n_nodes) pre-scaled leaf contributions
+        self.roots        = roots         # (n_trees,) root node of each tree
+        self.depth        = depth
+        self.output_trees = output_trees  # trees that contribute to each output
+        self.init         = init          # (n_outputs,) raw score before any tree
+        self.link         = link          # "identity" | "softmax" | "sigmoid"
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Leaf index of every tree for every row: shape (n_trees, n_rows)."""
+        n    = X.shape[0]
+        Xt   = np.ascontiguousarray(X.T).ravel()          # feature-major
+        cols = np.arange(n, dtype=np.int64)
+        idx  = np.repeat(self.roots[:, None], n, axis=1)
+        for _ in range(self.depth):
+            go_right = Xt[self.feature[idx] * n + cols] > self.threshold[idx]
+            idx      = self.children[2 * idx + go_right]
+        return idx
+
+    def raw_predict(self, X: np.ndarray) -> np.ndarray:
+        # sklearn evaluates trees on float32 inputs; match it exactly.
+        X   = np.asarray(X, dtype=np.float32)
+        out = np.empty((X.shape[0], len(self.output_trees)))
+        for start in range(0, X.shape[0], _BLOCK_ROWS):
+            block  = X[start:start + _BLOCK_ROWS]
+            leaves = self.apply(block)
+            for k, trees in enumerate(self.output_trees):
+                out[start:start + len(block), k] = self.value[k][leaves[trees]].sum(axis=0)
+        return out + self.init
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        raw = self.raw_predict(X)
+        if self.link == "softmax":
+            return softmax(raw, axis=1)
+        if self.link == "sigmoid":
+            p = expit(raw[:, 0])
+            return np.column_stack([1.0 - p, p])
+        return raw
+
+
+def _flatten(trees: list, values: list[np.ndarray]) -> tuple:
+    """Concatenate sklearn Tree objects; `values[i]` is tree i's per-node
+    contribution matrix (n_outputs, n_nodes_i), already scaled."""
+    feature, threshold, children, roots = [], [], [], []
+    offset = 0
+    for tree in trees:
+        n    = tree.node_count
+        own  = np.arange(offset, offset + n)
+        leaf = tree.children_left == -1
+        feature.append(np.where(leaf, 0, tree.feature))
+        threshold.append(np.where(leaf, np.inf, tree.threshold))
+        children.append(np.column_stack([
+            np.where(leaf, own, tree.children_left + offset),
+            np.where(leaf, own, tree.children_right + offset),
+        ]).ravel())
+        roots.append(offset)
+        offset += n
+    return (
+        np.concatenate(feature).astype(np.int64),
+        np.concatenate(threshold).astype(np.float64),
+        np.concatenate(children).astype(np.int64),
+        np.ascontiguousarray(np.concatenate(values, axis=1)),
+        np.asarray(roots, dtype=np.int64),
+        max(t.max_depth for t in trees),
+    )
+
+
+def compile_ensemble(clf) -> CompiledEnsemble | None:
+    """Compile a fitted forest / boosting classifier, or None if unsupported."""
+    if isinstance(clf, RandomForestClassifier):
+        trees  = [e.tree_ for e in clf.estimators_]
+        values = []
+        for t in trees:
+            v   = t.value[:, 0, :]
+            tot = v.sum(axis=1, keepdims=True)
+            values.append((v / np.where(tot == 0, 1.0, tot)).T / len(trees))
+        *arrays, depth = _flatten(trees, values)
+        every = slice(0, len(trees))
+        return CompiledEnsemble(*arrays, depth=depth,
+                                output_trees=[every] * len(clf.classes_),
+                                init=np.zeros(len(clf.classes_)), link="identity")
+
+    if isinstance(clf, GradientBoostingClassifier):
+        n_stages, n_outputs = clf.estimators_.shape
+        trees, values = [], []
+        for k in range(n_outputs):            # group trees by output
+            for est in clf.estimators_[:, k]:
+                v = np.zeros((n_outputs, est.tree_.node_count))
+                v[k] = clf.learning_rate * est.tree_.value[:, 0, 0]
+                trees.append(est.tree_)
+                values.append(v)
+        *arrays, depth = _flatten(trees, values)
+        compiled = CompiledEnsemble(
+            *arrays, depth=depth,
+            output_trees=[slice(k * n_stages, (k + 1) * n_stages) for k in range(n_outputs)],
+            init=np.zeros(n_outputs),
+            link="softmax" if n_outputs > 1 else "sigmoid",
+        )
+        # Recover the init estimator's constant raw score through public API.
+        probe = np.zeros((1, clf.n_features_in_), dtype=np.float32)
+        compiled.init = (np.asarray(clf.decision_function(probe)).reshape(1, -1)
+                         - compiled.raw_predict(probe))[0]
+        return compiled
+
+    return None
+
+
+def attach(state, name: str, X_check: np.ndarray | None = None) -> None:
+    """Set `state.compiled` when `name` is in COMPILED_MODELS.
+
+    When `X_check` is given, compiled probabilities are verified against
+    sklearn on it and the compiled path is discarded on any mismatch.
+    """
+    state.compiled = None
+    if name not in COMPILED_MODELS or state.clf is None:
+        return
+    compiled = compile_ensemble(state.clf)
+    if compiled is None:
+        return
+    if X_check is not None and len(X_check):
+        expected = state.clf.predict_proba(X_check)
+        if not np.allclose(compiled.predict_proba(X_check), expected, rtol=1e-6, atol=1e-9):
+            log.warning(f"Compiled {name} disagrees with sklearn; using sklearn predict_proba")
+            return
+    state.compiled = compiled
+
+
+def predict_proba(state, X: np.ndarray) -> np.ndarray:
+    """Class probabilities via the compiled ensemble for small batches (up to
+    COMPILED_MAX_ROWS rows) when one is attached, else sklearn."""
+    compiled = getattr(state, "compiled", None)
+    if compiled is not None and len(X) <= COMPILED_MAX_ROWS:
+        return compiled.predict_proba(X)
+    return state.clf.predict_proba(X)
@@ -1,13 +1,536 @@
+"""
+Zeek log tailer — incremental reader for Zeek TSV logs (conn.log etc.).
+
+ZeekTailer keeps an open file handle and a byte offset. Each poll() reads
+only the bytes appended since the previous poll, parses the complete lines
+among them (a trailing partial line waits for the next poll) and yields
+DataFrames of at most `batch_rows` rows, typed from the log's #fields and
+#types headers. Work per poll depends on the new data only, never on the
+size of the file. Malformed lines (wrong field count, a value its column
+type rejects) are skipped and counted rather than failing the whole read.
+
+Rotation (the path now names a different inode) drains the old file to EOF
+and then follows the new one from its start; truncation (the file shrank
+below our offset) restarts from byte 0. Either way the header is re-read.
+
+conn_to_features() maps conn.log columns onto the model's flow features, and
+ZeekIngestor runs tail → convert → score → alert on a background thread
+(enabled by ZEEK_CONN_LOG, see main.lifespan).
+"""
+from __future__ import annotations
+
+import csv
+import datetime
+import io
+import logging
 import os
+import re
+import threading
 import time
+from typing import Any, Callable, Iterator
+
+import numpy as np
 import pandas as pd
 
+import flow_graph
+import model_registry
+import scoring
+
+log = logging.getLogger("cyber-ids")
+
+READ_BYTES = 8 * 1024 * 1024   # max bytes consumed per read() call
+
+# Zeek type → pandas dtype used while parsing; containers stay strings.
+# Integers parse as float64: the C parser converts those natively and an
+# unset field becomes NaN, where nullable Int64 goes through to_numeric and
+# is several times slower.
+_DTYPES = {
+    "time":     "float64",
+    "interval": "float64",
+    "double":   "float64",
+    "count":    "float64",
+    "int":      "float64",
+    "port":     "float64",
+    "bool":     "object",
+}
+
+_HEADER = re.compile(rb"^#.*$", re.MULTILINE)
+
+
+def _count_lines(data: bytes) -> int:
+    """Non-blank lines in `data` (read_csv skips blank ones)."""
+    lines = data.splitlines()
+    return len(lines) - lines.count(b"")
+
+
+class ZeekHeader:
+    """The #-directives of one Zeek log file."""
+
+    def __init__(self) -> None:
+        self.separator     = "\t"
+        self.set_separator = ","
+        self.empty_field   = "(empty)"
+        self.unset_field   = "-"
+        self.fields: list[str] = []
+        self.types:  list[str] = []
+
+    def update(self, line: str) -> None:
+        if line.startswith("#separator "):
+            # Space-delimited and escaped, e.g. "#separator \x09".
+            self.separator = line.split(" ", 1)[1].encode().decode("unicode_escape")
+            return
+        key, *parts = line[1:].split(self.separator)
+        if key == "fields":
+            self.fields = parts
+        elif key == "types":
+            self.types = parts
+        elif key == "set_separator" and parts:
+            self.set_separator = parts[0]
+        elif key == "empty_field" and parts:
+            self.empty_field = parts[0]
+        elif key == "unset_field" and parts:
+            self.unset_field = parts[0]
+
+    def dtypes(self) -> dict[str, str]:
+        return {f: _DTYPES.get(t, "object") for f, t in zip(self.fields, self.types)}
+
+
+class ZeekTailer:
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        batch_rows: int = 10_000,
+        from_start: bool = True,
+        read_bytes: int = READ_BYTES,
+    ) -> None:
+        self.path       = os.fspath(path)
+        self.batch_rows = max(1, batch_rows)
+        self.read_bytes = max(4096, read_bytes)
+
+        self._fh: io.BufferedReader | None = None
+        self._inode: int | None = None
+        self._offset  = 0
+        self._partial = b""           # bytes of an incomplete trailing line
+        self._header  = ZeekHeader()
+        self._skip_to_end = not from_start
+        self._ready: list[pd.DataFrame] = []
+        self._ready_rows = 0
+
+        self.rows_read   = 0
+        self.bytes_read  = 0
+        self.rotations   = 0
+        self.truncations = 0
+        self.bad_lines   = 0
+
+    # ── file tracking ────────────────────────────────────────
+    def _open(self) -> bool:
+        try:
+            fh = open(self.path, "rb")
+        except FileNotFoundError:
+            return False
+        self._fh = fh
+        inode    = os.fstat(fh.fileno()).st_ino
+        if inode == self._inode:
+            return True                   # same file reopened: resume at our offset
+        self._inode   = inode
+        self._offset  = 0
+        self._partial = b""
+        self._header  = ZeekHeader()
+        if self._skip_to_end:
+            # Start at the end but still learn the schema from the header.
+            self._read_header()
+            self._offset = os.fstat(fh.fileno()).st_size
+            self._skip_to_end = False
+        return True
+
+    def _read_header(self) -> None:
+        self._fh.seek(0)
+        while True:
+            line = self._fh.readline()
+            if not line.startswith(b"#"):
+                break
+            self._header.update(line.rstrip(b"\n").decode("utf-8", "replace"))
+
+    def close(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    def __enter__(self) -> "ZeekTailer":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ── polling ──────────────────────────────────────────────
+    def poll(self) -> Iterator[pd.DataFrame]:
+        """Yield everything appended since the last poll, in batches."""
+        if self._fh is None and not self._open():
+            return
+        while True:
+            yield from self._drain()
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                break                      # rotated away, successor not created yet
+            if st.st_ino != self._inode:
+                # Lines the writer appended just before rotating.
+                yield from self._drain()
+                self.rotations += 1
+                self.close()
+                if not self._open():
+                    break
+                continue
+            if st.st_size < self._offset:
+                self.truncations += 1
+                self._offset  = 0
+                self._partial = b""
+                self._header  = ZeekHeader()
+                continue
+            break
+        yield from self._flush(final=True)
+
+    def follow(self, interval: float = 2.0,
+               stop: Callable[[], bool] | None = None) -> Iterator[pd.DataFrame]:
+        """poll() forever (or until `stop()` is true), sleeping between polls."""
+        try:
+            while stop is None or not stop():
+                yield from self.poll()
+                time.sleep(interval)
+        finally:
+            self.close()
+
+    def _drain(self) -> Iterator[pd.DataFrame]:
+        """Read the current handle from our offset to EOF."""
+        self._fh.seek(self._offset)
+        while True:
+            chunk = self._fh.read(self.read_bytes)
+            if not chunk:
+                return
+            self._offset    += len(chunk)
+            self.bytes_read += len(chunk)
+            data = self._partial + chunk
+            cut  = data.rfind(b"\n") + 1
+            self._partial = data[cut:]
+            if cut:
+                self._parse(data[:cut])
+                yield from self._flush()
+
+    # ── parsing ──────────────────────────────────────────────
+    def _parse(self, data: bytes) -> None:
+        """Parse complete lines, applying header directives where they occur."""
+        if not data.startswith(b"#") and b"\n#" not in data:
+            self._parse_rows(data)
+            return
+        start = 0
+        for m in _HEADER.finditer(data):
+            self._parse_rows(data[start:m.start()])
+            self._header.update(m.group().decode("utf-8", "replace"))
+            start = m.end() + 1
+        self._parse_rows(data[start:])
+
+    def _parse_rows(self, data: bytes) -> None:
+        if not data.strip() or not self._header.fields:
+            return
+        h      = self._header
+        dtypes = h.dtypes()
+        lines  = _count_lines(data)
+        # Every well-formed line has len(fields) - 1 separators; anything else
+        # (or a value its column type rejects) takes the slow path.
+        df = None
+        if data.count(h.separator.encode()) == lines * (len(h.fields) - 1):
+            try:
+                df = self._read(data, dtypes)
+            except ValueError:
+                pass
+        if df is None:
+            df = self._read_checked(data, dtypes)
+        bad = lines - len(df)
+        if bad > 0:
+            self.bad_lines += bad
+            log.warning(f"Zeek tail: skipped {bad} malformed line(s) in {self.path}")
+        for field, zeek_type in zip(h.fields, h.types):
+            if zeek_type == "bool":
+                df[field] = df[field].map({"T": True, "F": False}).astype("boolean")
+            elif dtypes[field] == "object":
+                df[field] = df[field].replace(h.empty_field, "")
+        self._ready.append(df)
+        self._ready_rows += len(df)
+        self.rows_read   += len(df)
+
+    def _read(self, data: bytes, dtypes: dict[str, str], **kwargs) -> pd.DataFrame:
+        h = self._header
+        kwargs.setdefault("na_values", {f: [h.unset_field] for f in h.fields})
+        return pd.read_csv(
+            io.BytesIO(data),
+            sep=h.separator,
+            names=h.fields,
+            dtype=dtypes,
+            keep_default_na=False,
+            quoting=csv.QUOTE_NONE,
+            on_bad_lines="skip",
+            engine="c",
+            **kwargs,
+        )
+
+    def _read_checked(self, data: bytes, dtypes: dict[str, str]) -> pd.DataFrame:
+        """Slow path for a block holding malformed lines.
+
+        Lines with too many fields are skipped by the parser; short lines come
+        back padded with empty strings (Zeek itself never writes an empty
+        field) and are dropped, as are rows with a value that does not convert
+        to its numeric column type.
+        """
+        h   = self._header
+        df  = self._read(data, {f: "object" for f in dtypes}, na_filter=False)
+        bad = (df == "").any(axis=1).to_numpy(copy=True)
+        df  = df.replace(h.unset_field, np.nan)
+        for field, dtype in dtypes.items():
+            if dtype == "float64":
+                raw       = df[field]
+                df[field] = pd.to_numeric(raw, errors="coerce")
+                bad      |= (df[field].isna() & raw.notna()).to_numpy()
+        return df[~bad].reset_index(drop=True) if bad.any() else df
+
+    def _flush(self, final: bool = False) -> Iterator[pd.DataFrame]:
+        """Emit full batches; with `final`, also the remainder."""
+        while self._ready_rows >= self.batch_rows or (final and self._ready_rows):
+            df = self._ready[0] if len(self._ready) == 1 else pd.concat(self._ready, ignore_index=True)
+            batch, rest = df.iloc[:self.batch_rows], df.iloc[self.batch_rows:]
+            self._ready      = [rest] if len(rest) else []
+            self._ready_rows = len(rest)
+            yield batch.reset_index(drop=True)
+
+    def stats(self) -> dict:
+        return {
+            "path":        self.path,
+            "offset":      self._offset,
+            "rows_read":   self.rows_read,
+            "bytes_read":  self.bytes_read,
+            "rotations":   self.rotations,
+            "truncations": self.truncations,
+            "bad_lines":   self.bad_lines,
+        }
+
+
 def tail_zeek_log(path, interval=2):
-    last_size = 0
-    while True:
-        size = os.path.getsize(path)
-        if size > last_size:
-            df = pd.read_csv(path, skiprows=last_size)
-            yield df
-            last_size = size
-        time.sleep(interval)
+    """Follow a Zeek log, yielding DataFrames of newly appended rows."""
+    yield from ZeekTailer(path).follow(interval)
+
+
+# ─── conn.log → model features ───────────────────────────────────────────────
+CONN_REQUIRED = ("ts", "id.orig_h", "id.orig_p", "id.resp_h", "id.resp_p", "proto",
+                 "duration", "orig_pkts", "resp_pkts", "history", "conn_state")
+
+# conn_state values that mean the connection was reset or rejected.
+_RST_STATES = ["REJ", "RSTO", "RSTR", "RSTOS0", "RSTRH"]
+
+
+def _num(df: pd.DataFrame, col: str) -> np.ndarray:
+    if col not in df.columns:
+        return np.full(len(df), np.nan)
+    return pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=np.float64)
+
+
+def conn_to_features(df: pd.DataFrame) -> pd.DataFrame:
+    """Map Zeek conn.log rows onto the training flow schema.
+
+    packets / bytes sum both directions (payload bytes, falling back to IP
+    bytes when Zeek left them unset), rates use the same 1 ms duration floor
+    as the training data, and flag_* come from the history string (either
+    direction) plus reset/reject connection states.
+    """
+    missing = [c for c in CONN_REQUIRED if c not in df.columns]
+    if missing:
+        raise ValueError(f"Not a conn.log batch; missing fields: {', '.join(missing)}")
+
+    packets  = np.nan_to_num(_num(df, "orig_pkts")) + np.nan_to_num(_num(df, "resp_pkts"))
+    payload  = _num(df, "orig_bytes"), _num(df, "resp_bytes")
+    ip_bytes = np.nan_to_num(_num(df, "orig_ip_bytes")) + np.nan_to_num(_num(df, "resp_ip_bytes"))
+    n_bytes  = np.where(np.isnan(payload[0]) & np.isnan(payload[1]), ip_bytes,
+                        np.nan_to_num(payload[0]) + np.nan_to_num(payload[1]))
+    dur_s    = np.nan_to_num(_num(df, "duration"))
+    span     = np.maximum(dur_s, 0.001)
+
+    history = df["history"].fillna("").astype(str)
+    state   = df["conn_state"].fillna("").astype(str)
+    flag    = lambda letters: history.str.contains(f"[{letters}]", regex=True).to_numpy()
+
+    return pd.DataFrame({
+        "timestamp":   _num(df, "ts"),
+        "uid":         df["uid"].to_numpy() if "uid" in df.columns else None,
+        "src_ip":      df["id.orig_h"].to_numpy(),
+        "dst_ip":      df["id.resp_h"].to_numpy(),
+        "packets":     packets,
+        "bytes":       n_bytes,
+        "duration_ms": dur_s * 1000,
+        "src_port":    _num(df, "id.orig_p"),
+        "dst_port":    _num(df, "id.resp_p"),
+        "flag_syn":    flag("Ss").astype(np.int8),
+        "flag_ack":    flag("Aa").astype(np.int8),
+        "flag_fin":    flag("Ff").astype(np.int8),
+        "flag_rst":    (flag("Rr") | state.isin(_RST_STATES).to_numpy()).astype(np.int8),
+        "pkt_rate":    packets / span,
+        "byte_rate":   n_bytes / span,
+        "protocol":    df["proto"].fillna("").astype(str).str.upper().to_numpy(),
+    })
+
+
+# ─── Background ingestion ────────────────────────────────────────────────────
+class ZeekIngestor:
+    """Tail a conn.log on a daemon thread, score every batch and emit alerts.
+
+    `get_state(model)` returns the ModelState to score with (looked up per
+    batch, so retrained models are picked up); `emit(alerts)` receives the
+    alert dicts for each batch's non-benign rows at or above `min_confidence`,
+    and `observe(flows)`, if given, the batch aggregated for the flow graph.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        model: str,
+        get_state: Callable[[str], Any],
+        emit: Callable[[list[dict]], None],
+        batch_rows: int = 10_000,
+        interval: float = 1.0,
+        min_confidence: float = 0.5,
+        from_start: bool = False,
+        display: Callable[[str], str] = str,
+        observe: Callable[[flow_graph.FlowBatch], None] | None = None,
+    ) -> None:
+        self.model          = model
+        self.observe        = observe
+        self.get_state      = get_state
+        self.emit           = emit
+        self.display        = display
+        self.interval       = interval
+        self.min_confidence = min_confidence
+        self.tailer         = ZeekTailer(path, batch_rows=batch_rows, from_start=from_start)
+
+        self._stop   = threading.Event()
+        self._thread: threading.Thread | None = None
+
+        self.batches      = 0
+        self.rows         = 0
+        self.alerts       = 0
+        self.busy_seconds = 0.0
+        self.last_ts: float | None = None   # newest Zeek ts scored
+        self.last_batch_at: float | None = None
+        self.last_error: str | None = None
+        self._rate: float = 0.0              # EWMA rows/s while busy
+
+    @classmethod
+    def from_env(cls, get_state, emit, display=str, observe=None) -> "ZeekIngestor | None":
+        """Configured from ZEEK_* variables; None unless ZEEK_CONN_LOG is set."""
+        path = os.getenv("ZEEK_CONN_LOG", "").strip()
+        if not path:
+            return None
+        return cls(
+            path,
+            model          = os.getenv("ZEEK_MODEL", "hybrid").strip().lower(),
+            get_state      = get_state,
+            emit           = emit,
+            batch_rows     = int(os.getenv("ZEEK_BATCH_ROWS", "10000")),
+            interval       = float(os.getenv("ZEEK_POLL_INTERVAL", "1.0")),
+            min_confidence = float(os.getenv("ZEEK_ALERT_MIN_CONFIDENCE", "0.5")),
+            from_start     = os.getenv("ZEEK_FROM_START", "0").strip().lower() in ("1", "true", "yes", "on"),
+            display        = display,
+            observe        = observe,
+        )
+
+    # ── lifecycle ────────────────────────────────────────────
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="zeek-ingest", daemon=True)
+        self._thread.start()
+        log.info(f"Zeek ingest: tailing {self.tailer.path} with model={self.model}")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                for batch in self.tailer.follow(self.interval, stop=self._stop.is_set):
+                    try:
+                        self.emit(self.process(batch))
+                    except Exception as exc:      # drop the batch, keep tailing
+                        self._error(exc)
+            except Exception as exc:              # unreadable log or parse failure: retry from our offset
+                self._error(exc)
+                self._stop.wait(self.interval)
+
+    def _error(self, exc: Exception) -> None:
+        self.last_error = f"{type(exc).__name__}: {exc}"
+        log.warning(f"Zeek ingest error: {self.last_error}")
+
+    # ── per batch ────────────────────────────────────────────
+    def process(self, batch: pd.DataFrame) -> list[dict]:
+        """Convert and score one conn.log batch; return its alerts."""
+        t0    = time.perf_counter()
+        state = self.get_state(self.model)
+        feats = conn_to_features(batch)
+        proba, _ = scoring.score_frame(state, feats)
+        model_registry.shadow.offer(self.model, feats)
+
+        pred   = proba.argmax(axis=1)
+        conf   = proba[np.arange(len(pred)), pred]
+        labels = state.label_encoder.classes_[pred]
+        hits   = np.flatnonzero((labels != "benign") & (conf >= self.min_confidence))
+
+        ts, ports = feats["timestamp"].to_numpy(), feats["dst_port"].to_numpy()
+        src, dst, uid = feats["src_ip"].to_numpy(), feats["dst_ip"].to_numpy(), feats["uid"].to_numpy()
+        alerts = [
+            {
+                "time":       datetime.datetime.fromtimestamp(ts[i]).strftime("%H:%M:%S"),
+                "ts":         float(ts[i]),
+                "type":       self.display(str(labels[i])),
+                "threat":     "HIGH" if conf[i] >= 0.8 else "MED",
+                "confidence": round(float(conf[i]), 4),
+                "src_ip":     str(src[i]),
+                "dst_ip":     str(dst[i]),
+                "dst_port":   None if np.isnan(ports[i]) else int(ports[i]),
+                "uid":        uid[i],
+                "source":     "zeek",
+                "model":      self.model,
+            }
+            for i in hits.tolist()
+        ]
+        if self.observe is not None:
+            threat = np.full(len(feats), None, dtype=object)
+            threat[hits] = [self.display(str(l)) for l in labels[hits]]
+            self.observe(flow_graph.aggregate(feats, threat, source="zeek"))
+
+        secs = time.perf_counter() - t0
+        self.batches      += 1
+        self.rows         += len(batch)
+        self.alerts       += len(alerts)
+        self.busy_seconds += secs
+        self.last_batch_at = time.time()
+        if len(feats):
+            self.last_ts = float(np.nanmax(feats["timestamp"].to_numpy()))
+        rate = len(batch) / secs if secs > 0 else 0.0
+        self._rate = rate if self.batches == 1 else 0.8 * self._rate + 0.2 * rate
+        return alerts
+
+    def stats(self) -> dict:
+        tail = self.tailer.stats()
+        try:
+            behind = max(0, os.path.getsize(self.tailer.path) - tail["offset"])
+        except OSError:
+            behind = None
+        return {
+            **tail,
+            "model":          self.model,
+            "running":        self._thread is not None and self._thread.is_alive(),
+            "batches":        self.batches,
+            "rows":           self.rows,
+            "alerts":         self.alerts,
+            "rows_per_sec":   round(self._rate, 1),
+            "lag_seconds":    round(max(0.0, time.time() - self.last_ts), 3) if self.last_ts else None,
+            "bytes_behind":   behind,
+            "last_error":     self.last_error,
+        }
@@ -1,12 +1,12 @@
 "use client";
 
-import { useEffect, useRef, useState } from "react";
+import { useEffect, useState } from "react";
 import { AppShell } from "@/components/AppShell";
 import { CyberBackground } from "@/components/CyberBackground";
 import { Activity, Wifi, AlertTriangle, ShieldCheck, Clock, ArrowUp } from "lucide-react";
 
 const API = process.env.NEXT_PUBLIC_API_URL?.replace(/\/$/, "") ?? "http://localhost:8000";
-const POLL_MS = 1000; // poll every 1 second
+const SAMPLE_MS = 1000; // server sampler cadence (NET_SAMPLE_INTERVAL)
 const HISTORY_LEN = 30; // keep 30 data points for sparkline
 
 /* ─── Styles ─────────────────────────────────────────────────────────────── */
@@ -69,43 +69,42 @@ export default function LivePage() {
     const [history, setHistory] = useState<number[]>(Array(HISTORY_LEN).fill(0));
     const [error, setError] = useState<string | null>(null);
     const [connected, setConnected] = useState(false);
-    const timerRef = useRef<ReturnType<typeof setInterval> | null>(null);
 
-    const fetchAll = async () => {
-        try {
-            const [mRes, aRes, cRes] = await Promise.all([
-                fetch(`${API}/api/live/metrics`),
-                fetch(`${API}/api/live/alerts`),
-                fetch(`${API}/api/live/connections`),
-            ]);
-
-            if (!mRes.ok || !aRes.ok || !cRes.ok) throw new Error("API error");
-
-            const m: Metrics = await mRes.json();
-            const a: { alerts: Alert[] } = await aRes.json();
-            const c: { connections: Connection[] } = await cRes.json();
+    useEffect(() => {
+        // One server-pushed stream replaces polling three endpoints.
+        const es = new EventSource(`${API}/api/live/stream`);
+        const rows = new Map<string, Connection>();
 
+        es.addEventListener("metrics", (e) => {
+            const m: Metrics = JSON.parse((e as MessageEvent).data);
             setMetrics(m);
-            setAlerts(a.alerts);
-            setConnections(c.connections);
             setConnected(true);
             setError(null);
 
             // Update rolling history for sparkline
-            setHistory(prev => {
-                const next = [...prev.slice(1), m.packets_per_sec];
-                return next;
-            });
-        } catch (e) {
+            setHistory(prev => [...prev.slice(1), m.packets_per_sec]);
+        });
+
+        es.addEventListener("connections", (e) => {
+            const d: { reset?: boolean; upsert: Record<string, Connection>; remove: string[] } =
+                JSON.parse((e as MessageEvent).data);
+            if (d.reset) rows.clear();
+            d.remove.forEach(k => rows.delete(k));
+            Object.entries(d.upsert).forEach(([k, row]) => rows.set(k, row));
+            setConnections(Array.from(rows.values()));
+        });
+
+        es.addEventListener("alerts", (e) => {
+            const d: { reset?: boolean; alerts: Alert[] } = JSON.parse((e as MessageEvent).data);
+            setAlerts(prev => [...d.alerts, ...(d.reset ? [] : prev)].slice(0, 20));
+        });
+
+        // EventSource reconnects by itself and receives a fresh full state.
+        es.onerror = () => {
             setConnected(false);
             setError("تعذّر الاتصال بالخادم — تأكد من تشغيل Backend على المنفذ 8000");
-        }
-    };
-
-    useEffect(() => {
-        fetchAll();
-        timerRef.current = setInterval(fetchAll, POLL_MS);
-        return () => { if (timerRef.current) clearInterval(timerRef.current); };
+        };
+        return () => es.close();
     }, []);
 
     const METRIC_CARDS = metrics ? [
@@ -169,7 +168,7 @@ export default function LivePage() {
                         boxShadow: connected ? "0 0 6px #4ade80" : "0 0 6px #f87171"
                     }} />
                     <span style={{ fontSize: 11, color: "rgba(255,255,255,0.4)" }}>
-                        {connected ? `متصل • يتحدث كل ${POLL_MS / 1000}ث` : "غير متصل"}
+                        {connected ? `متصل • يتحدث كل ${SAMPLE_MS / 1000}ث` : "غير متصل"}
                     </span>
                 </div>
 
@@ -250,7 +249,7 @@ export default function LivePage() {
                                 display: "flex", justifyContent: "space-between",
                                 marginTop: 6, fontSize: 10, color: "rgba(255,255,255,0.25)"
                             }}>
-                                <span>{HISTORY_LEN * POLL_MS / 1000}ث مضت</span>
+                                <span>{HISTORY_LEN * SAMPLE_MS / 1000}ث مضت</span>
                                 <span>الآن</span>
                             </div>
                         </div>